@@ -1,4 +1,5 @@
-from flask import Flask, jsonify, url_for
+from flask import Flask, jsonify, url_for, request
+import click
 from dotenv import load_dotenv
 import os
 from models import db
@@ -17,19 +18,130 @@ app = Flask(__name__) # location
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv("SQLALCHEMY_DATABASE_URI")
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS')
 
+# Connection pool per worker process: DB_POOL_SIZE kept open, up to DB_MAX_OVERFLOW more under load,
+# DB_POOL_TIMEOUT seconds waiting for a free one before erroring. Connections are tested before use
+# (DB_POOL_PRE_PING) and replaced after DB_POOL_RECYCLE seconds - keep it below MySQL's wait_timeout.
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+from utils.db_pool import engine_options
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+# Read replicas: DB_REPLICA_URIS="uri1,uri2" - GET requests read from them ('round_robin' or
+# 'least_connections'); writes, and every request of a client for DB_PRIMARY_PIN_SECONDS after
+# it wrote, use the primary
+app.config['DB_REPLICA_STRATEGY'] = os.getenv('DB_REPLICA_STRATEGY', 'round_robin')
+app.config['DB_PRIMARY_PIN_SECONDS'] = int(os.getenv('DB_PRIMARY_PIN_SECONDS', 5))
+app.config['SQLALCHEMY_BINDS'] = {
+    f'replica_{index}': {'url': uri, **engine_options(app.config, uri)}
+    for index, uri in enumerate(uri.strip() for uri in os.getenv('DB_REPLICA_URIS', '').split(',') if uri.strip())
+}
+
 # Set up JWT secret key
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
+# token_required: 'stateless' trusts the token claims (user loaded only when a route needs it),
+# 'database' loads the full user on every request
+app.config['AUTH_MODE'] = os.getenv('AUTH_MODE', 'stateless')
+# Seconds a user's token version is cached per worker - bounds how long a revoked
+# token keeps working on the other workers
+app.config['AUTH_PRINCIPAL_CACHE_TTL'] = int(os.getenv('AUTH_PRINCIPAL_CACHE_TTL', 30))
+
+# JWT signing keys for rotation: JWT_KEYS="kid1:secret1,kid2:secret2", new tokens are
+# signed with JWT_ACTIVE_KID (default: the first key). Without JWT_KEYS, SECRET_KEY signs.
+app.config['JWT_KEYS'] = os.getenv('JWT_KEYS', '')
+app.config['JWT_ACTIVE_KID'] = os.getenv('JWT_ACTIVE_KID')
+# Recently verified tokens remembered per worker (skips signature checks for repeat tokens)
+app.config['JWT_VERIFY_CACHE_SIZE'] = int(os.getenv('JWT_VERIFY_CACHE_SIZE', 4096))
+
+# Login rate limits (token buckets): BURST attempts at once, refilling at PER_MINUTE a minute.
+# Per client IP for every attempt, per email for failed attempts. Behind a proxy, wrap the
+# app in werkzeug's ProxyFix so the client IP is the real one.
+# RATE_LIMIT_BACKEND: 'memory' (per worker), 'redis' (shared, needs RATE_LIMIT_REDIS_URL) or 'none'
+app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+app.config['RATE_LIMIT_REDIS_URL'] = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+app.config['LOGIN_IP_BURST'] = int(os.getenv('LOGIN_IP_BURST', 20))
+app.config['LOGIN_IP_PER_MINUTE'] = int(os.getenv('LOGIN_IP_PER_MINUTE', 10))
+app.config['LOGIN_EMAIL_BURST'] = int(os.getenv('LOGIN_EMAIL_BURST', 5))
+app.config['LOGIN_EMAIL_PER_MINUTE'] = int(os.getenv('LOGIN_EMAIL_PER_MINUTE', 1))
+
+# Password hashing runs in a process pool of PASSWORD_HASH_WORKERS (0 = inline on the request thread).
+# Past PASSWORD_HASH_MAX_PENDING queued + running hashes, requests get 503 with Retry-After.
+app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+app.config['PASSWORD_HASH_RETRY_AFTER'] = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 1))
+# werkzeug method for new hashes - older hashes are upgraded on the next successful login
+app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+
+# Batch order import limits (POST /orders/batch)
+app.config['ORDER_BATCH_MAX_SIZE'] = int(os.getenv('ORDER_BATCH_MAX_SIZE', 5000))
+app.config['ORDER_BATCH_CHUNK_SIZE'] = int(os.getenv('ORDER_BATCH_CHUNK_SIZE', 500))
+
+# Rows fetched per server-side cursor batch for the /export endpoints
+app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+# Rows per INSERT batch for book imports (POST /books/import, flask import-books)
+app.config['BOOK_IMPORT_CHUNK_SIZE'] = int(os.getenv('BOOK_IMPORT_CHUNK_SIZE', 500))
+
+# Book text search: 'auto' uses the database's full-text index, 'like' forces ILIKE scans
+app.config['BOOK_SEARCH_BACKEND'] = os.getenv('BOOK_SEARCH_BACKEND', 'auto')
+
+# Memory budget for the in-process /books/suggest index (books past it are not suggested)
+app.config['BOOK_SUGGEST_MAX_BYTES'] = int(os.getenv('BOOK_SUGGEST_MAX_BYTES', 32 * 1024 * 1024))
+# Each worker reloads its index this often, picking up books written through other workers (0 = never)
+app.config['BOOK_SUGGEST_REFRESH_SECONDS'] = int(os.getenv('BOOK_SUGGEST_REFRESH_SECONDS', 300))
+
+# Response cache for the read-heavy book endpoints
+# CACHE_BACKEND: 'memory' (per worker LRU), 'redis' (shared, needs CACHE_REDIS_URL) or 'none'.
+# Use 'redis' when running more than one worker: a write only invalidates the memory cache of
+# the worker that handled it, the others serve their copy for up to CACHE_MEMORY_MAX_TTL seconds.
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+app.config['CACHE_MEMORY_MAX_TTL'] = int(os.getenv('CACHE_MEMORY_MAX_TTL', 5))
+# TTLs in seconds - writes invalidate immediately (every worker with redis, this worker with memory),
+# the TTL only bounds staleness from outside changes
+app.config['CACHE_TTL_FEATURED_BOOKS'] = int(os.getenv('CACHE_TTL_FEATURED_BOOKS', 300))
+app.config['CACHE_TTL_BOOK'] = int(os.getenv('CACHE_TTL_BOOK', 300))
+app.config['CACHE_TTL_BOOK_SEARCH'] = int(os.getenv('CACHE_TTL_BOOK_SEARCH', 60))
+
+# JSON encoding for responses: 'auto' uses orjson when it is installed, 'orjson' requires it,
+# 'stdlib' forces the json module. Output is the same either way.
+app.config['JSON_BACKEND'] = os.getenv('JSON_BACKEND', 'auto')
+
+# Per-request SQL counts/time (Server-Timing header, "sql" logger). A statement run more than
+# SQL_REPEAT_THRESHOLD times in one request is flagged as a likely N+1; SQL_REPEAT_FAIL (always on
+# with app.testing) turns that into an error.
+app.config['SQL_INSTRUMENTATION'] = os.getenv('SQL_INSTRUMENTATION', 'true').lower() == 'true'
+app.config['SQL_REPEAT_THRESHOLD'] = int(os.getenv('SQL_REPEAT_THRESHOLD', 10))
+app.config['SQL_REPEAT_FAIL'] = os.getenv('SQL_REPEAT_FAIL', 'false').lower() == 'true'
+
 # Add a test route
 @app.route('/test', methods=['GET'])
 def test_route():
     return jsonify({"message": "Test route is working!"}), 200
 
 # Initialize database and extensions
+from utils.json_provider import FastJSONProvider
+app.json = FastJSONProvider(app)
 db.init_app(app)
+# Pre-fork servers: children open their own connections instead of sharing the master's
+from utils.db_pool import dispose_engines_after_fork, pool_stats, pool_metrics
+with app.app_context():
+    dispose_engines_after_fork(db.engines.values())
+from utils.db_routing import replica_router
+replica_router.init_app(app, db)
 from schemas import ma
 ma.init_app(app)
 migrate = Migrate(app, db)
+from utils.response_cache import response_cache
+response_cache.init_app(app)
+from utils.rate_limit import rate_limiter
+rate_limiter.init_app(app)
+from utils.sql_instrumentation import sql_instrumentation
+sql_instrumentation.init_app(app)
 
 # Import and register blueprints
 from routes.user_routes import user_bp
@@ -47,6 +159,13 @@ app.register_blueprint(address_bp)
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(review_bp)
 
+# Debug routes may only be read in production: their DELETEs reset the login rate limiter
+# and other counters or rebuild in-memory indexes, so they need app.debug (FLASK_DEBUG=1)
+@app.before_request
+def protect_debug_routes():
+    if request.path.startswith('/debug/') and request.method not in ('GET', 'HEAD', 'OPTIONS') and not app.debug:
+        return jsonify({"error": "Debug routes are read-only unless the app runs in debug mode"}), 403
+
 # Debug route to list all registered routes
 @app.route('/debug/routes')
 def list_routes():
@@ -59,11 +178,111 @@ def list_routes():
         })
     return jsonify(routes)
 
+# Debug route to check the table registry (DELETE clears it after a migration)
+@app.route('/debug/tables', methods=['GET', 'DELETE'])
+def table_registry_stats():
+    from utils.db_helpers import table_registry
+    if request.method == 'DELETE':
+        table_registry.invalidate()
+    return jsonify(table_registry.stats())
+
+# Debug route to check the response cache counters (DELETE empties the cache)
+@app.route('/debug/cache', methods=['GET', 'DELETE'])
+def response_cache_stats():
+    if request.method == 'DELETE':
+        response_cache.clear()
+    return jsonify(response_cache.stats())
+
+# Debug route to check the cached include_fields schema variants (DELETE empties the cache)
+@app.route('/debug/schemas', methods=['GET', 'DELETE'])
+def schema_variant_stats():
+    from schemas.variants import schema_variants
+    if request.method == 'DELETE':
+        schema_variants.clear()
+    return jsonify(schema_variants.stats())
+
+# Debug route to check connection pool usage and checkout wait times (DELETE resets the counters)
+@app.route('/debug/db-pool', methods=['GET', 'DELETE'])
+def db_pool_stats():
+    if request.method == 'DELETE':
+        pool_metrics.reset()
+    return jsonify(pool_stats(db.engines))
+
+# Debug route to check read-replica routing (requests per bind, pinned clients)
+@app.route('/debug/db-routing', methods=['GET'])
+def db_routing_stats():
+    return jsonify(replica_router.stats())
+
+# Debug route to check per-request SQL counts and flagged N+1 requests (DELETE resets the counters)
+@app.route('/debug/sql', methods=['GET', 'DELETE'])
+def sql_stats():
+    if request.method == 'DELETE':
+        sql_instrumentation.reset()
+    return jsonify(sql_instrumentation.stats())
+
+# Debug route to check the login rate limiter (DELETE empties every bucket)
+@app.route('/debug/rate-limit', methods=['GET', 'DELETE'])
+def rate_limit_stats():
+    if request.method == 'DELETE':
+        rate_limiter.reset()
+    return jsonify(rate_limiter.stats())
+
+# Debug route to check password hashing queue wait vs hash time (DELETE resets the counters)
+@app.route('/debug/hashing', methods=['GET', 'DELETE'])
+def password_hashing_stats():
+    from utils.password_hashing import get_password_hasher
+    hasher = get_password_hasher()
+    if request.method == 'DELETE':
+        hasher.reset_metrics()
+    return jsonify(hasher.stats())
+
+# Debug route to check the /books/suggest index (DELETE rebuilds it from the database)
+@app.route('/debug/suggest', methods=['GET', 'DELETE'])
+def suggest_index_stats():
+    from utils.book_suggest import suggest_index
+    if request.method == 'DELETE':
+        suggest_index.rebuild()
+    return jsonify(suggest_index.stats())
+
+# CLI command to rebuild seller rating totals from the reviews table
+# Usage: flask reconcile-ratings
+@app.cli.command('reconcile-ratings')
+def reconcile_ratings_command():
+    from utils.rating_helpers import reconcile_ratings
+    updated = reconcile_ratings()
+    print(f"Reconciled ratings for {updated} users")
+
+# CLI command to bulk import book listings from a JSON lines or CSV file
+# Usage: flask import-books books.csv --seller-id 3
+@app.cli.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'data_format', type=click.Choice(['jsonl', 'csv']), help='Defaults to the file extension')
+@click.option('--seller-id', type=int, help='Seller for rows without a seller_id')
+@click.option('--chunk-size', type=int, default=None, help='Rows per INSERT batch')
+def import_books_command(path, data_format, seller_id, chunk_size):
+    from utils.book_import import import_books, read_csv, read_jsonl
+    if not data_format:
+        data_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    reader = read_csv if data_format == 'csv' else read_jsonl
+    with open(path, 'rb') as stream:
+        summary = import_books(
+            reader(stream),
+            seller_id=seller_id,
+            chunk_size=chunk_size or app.config['BOOK_IMPORT_CHUNK_SIZE']
+        )
+    print(f"Imported {summary['imported']} books, {summary['failed']} failed")
+    for error in summary['errors']:
+        print(f"  line {error['line']}: {error['errors']}")
+
 # Run the app
 if __name__ == "__main__":
     with app.app_context():
         #db.drop_all()
         db.create_all()
+        
+        # Load the /books/suggest index before the first request
+        from utils.book_suggest import suggest_index
+        suggest_index.rebuild()
     
     # Print routes for debugging
     print("Registered routes:")
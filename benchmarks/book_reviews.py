@@ -0,0 +1,57 @@
+"""
+GET /books/<id>/reviews: statements and latency per page size.
+
+The buyers of a page are loaded with one IN query; "per-review lookup" replays the
+previous handler shape (one users query per review) on the same data for comparison.
+
+    python benchmarks/book_reviews.py [reviews]
+"""
+import sys
+from common import setup_app, create_users, count_queries, latency_ms
+
+def main(review_count):
+    app = setup_app(CACHE_BACKEND='none', SQL_INSTRUMENTATION='false')
+    from sqlalchemy import insert, select
+    from models import db
+    from utils.db_helpers import get_table, rows_to_list
+
+    seller_id = create_users(app, 1)[0]
+    buyer_ids = create_users(app, review_count, is_seller=False)
+    with app.app_context():
+        books_table = get_table('books')
+        reviews_table = get_table('reviews')
+        users_table = get_table('users')
+        book_id = db.session.execute(
+            insert(books_table).values(title='Bench', author='Bench', price=10, seller_id=seller_id)
+        ).inserted_primary_key[0]
+        db.session.execute(insert(reviews_table), [
+            {'buyer_id': buyer_id, 'seller_id': seller_id, 'book_id': book_id, 'rating': 1 + buyer_id % 5}
+            for buyer_id in buyer_ids
+        ])
+        db.session.commit()
+
+    def per_review_lookup(limit):
+        with app.app_context():
+            reviews = rows_to_list(db.session.execute(
+                select(reviews_table).where(reviews_table.c.book_id == book_id).order_by(reviews_table.c.id).limit(limit)
+            ).fetchall(), reviews_table)
+            for review in reviews:
+                review['buyer'] = dict(db.session.execute(
+                    select(users_table.c.id, users_table.c.name).where(users_table.c.id == review['buyer_id'])
+                ).first()._mapping)
+
+    client = app.test_client()
+    print(f"{review_count} reviews on one book")
+    for limit in (10, 50, 100):
+        url = f'/books/{book_id}/reviews?limit={limit}'
+        with count_queries(app) as queries:
+            assert client.get(url).status_code == 200
+        with count_queries(app) as old_queries:
+            per_review_lookup(limit)
+        print(
+            f"limit={limit:>3}: {queries[0]} statements, {latency_ms(lambda: client.get(url), 50):.2f} ms/request"
+            f" | per-review lookup: {old_queries[0]} statements, {latency_ms(lambda: per_review_lookup(limit), 50):.2f} ms"
+        )
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,74 @@
+"""
+Shared setup for the benchmark scripts: the app on a throwaway SQLite file.
+
+app.py reads its settings from the environment at import time, so call
+setup_app() before importing anything from the app. Extra settings (pool sizes,
+backends) can be passed as keyword arguments and are exported as env vars.
+
+Run the scripts from the repository root, e.g. python benchmarks/book_reviews.py
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup_app(**settings):
+    """Import the app against a fresh SQLite database and create the tables"""
+    sys.path.insert(0, ROOT)
+    db_dir = tempfile.mkdtemp(prefix='bookstore-bench-')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    # Hash inline - not what is being measured
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    for name, value in settings.items():
+        os.environ[name] = str(value)
+
+    from app import app
+    from models import db
+    with app.app_context():
+        db.create_all()
+    return app
+
+def create_users(app, count, is_seller=True):
+    """Insert count users directly (no password hashing per user) and return their ids"""
+    from models import db, User
+    with app.app_context():
+        users = [
+            User(name=f'User{i}', last_name='Bench', phone_number='1234567890',
+                 email=f'bench{i}-{time.monotonic_ns()}@example.com', is_seller=is_seller, password='x')
+            for i in range(count)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+@contextmanager
+def count_queries(app):
+    """Count the statements run on the app's primary engine inside the block: with count_queries(app) as n: ... n[0]"""
+    from sqlalchemy import event
+    from models import db
+    with app.app_context():
+        engine = db.engine
+    counter = [0]
+
+    def on_execute(*args):
+        counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+
+def per_second(function, number):
+    """Calls of function per second over number calls"""
+    started = time.perf_counter()
+    for _ in range(number):
+        function()
+    return number / (time.perf_counter() - started)
+
+def latency_ms(function, number):
+    """Mean milliseconds per call of function over number calls"""
+    return 1000.0 / per_second(function, number)
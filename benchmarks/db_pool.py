@@ -0,0 +1,67 @@
+"""
+GET /books under concurrent load for one connection pool size: throughput, latency
+percentiles and how long checkouts waited for a connection.
+
+The pool is configured at import time, so run once per size, e.g.
+
+    python benchmarks/db_pool.py 2 0
+    python benchmarks/db_pool.py 8 8 [threads] [requests per thread]
+"""
+import sys
+import threading
+import time
+from common import setup_app, create_users
+
+def main(pool_size, max_overflow, thread_count, request_count):
+    app = setup_app(
+        DB_POOL_SIZE=pool_size, DB_MAX_OVERFLOW=max_overflow, DB_POOL_TIMEOUT=5,
+        CACHE_BACKEND='none', SQL_INSTRUMENTATION='false'
+    )
+    from sqlalchemy import insert
+    from models import db
+    from utils.db_helpers import get_table
+    from utils.db_pool import pool_metrics, pool_stats
+
+    seller_id = create_users(app, 1)[0]
+    with app.app_context():
+        db.session.execute(insert(get_table('books')), [
+            {'title': f'Book {i}', 'author': 'Author', 'price': 10, 'seller_id': seller_id} for i in range(200)
+        ])
+        db.session.commit()
+    pool_metrics.reset()
+
+    latencies, errors = [], []
+
+    def worker():
+        client = app.test_client()
+        for _ in range(request_count):
+            started = time.perf_counter()
+            response = client.get('/books?limit=20')
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    with app.app_context():
+        stats = pool_stats(db.engines)
+    print(
+        f"pool {pool_size}+{max_overflow}, {thread_count} threads x {request_count} requests: "
+        f"{len(latencies) / elapsed:.0f} req/s, p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms, {len(errors)} errors"
+    )
+    print(
+        f"checkouts {stats['checkouts']}, waited {stats['waited']}, wait_max {stats['wait_max'] * 1000:.1f} ms, "
+        f"timeouts {stats['timeouts']}, checked out after the run {stats['pools']['default'].get('checked_out')}"
+    )
+
+if __name__ == '__main__':
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*arguments, *(2, 0, 16, 50)[len(arguments):])
@@ -0,0 +1,43 @@
+"""
+JSON responses per backend: Flask's default provider against FastJSONProvider with the
+stdlib and (when installed) orjson backends, on listing-shaped rows.
+
+    python benchmarks/json_provider.py [rows]
+"""
+import json
+import sys
+from datetime import datetime
+from decimal import Decimal
+from common import setup_app, latency_ms
+
+def main(row_count):
+    app = setup_app()
+    from flask.json.provider import DefaultJSONProvider
+    from utils.json_provider import FastJSONProvider, orjson
+
+    rows = [{
+        'id': i, 'title': 'Some book title', 'author': 'Author Name', 'price': 12.5,
+        'total_amount': Decimal('33.10'), 'order_date': datetime(2024, 1, 2, 3, 4, 5),
+        'created_at': datetime(2024, 1, 2, 3, 4, 5), 'status': 'Pending', 'description': None,
+        'publication_year': 2001
+    } for i in range(row_count)]
+    without_dates = [
+        {key: value for key, value in row.items() if key not in ('order_date', 'created_at')} for row in rows
+    ]
+
+    providers = [('Flask default', DefaultJSONProvider(app))]
+    for backend in ('stdlib', 'orjson') if orjson is not None else ('stdlib',):
+        app.config['JSON_BACKEND'] = backend
+        providers.append((f'FastJSONProvider({backend})', FastJSONProvider(app)))
+
+    print(f"{row_count} rows")
+    with app.app_context():
+        expected = json.loads(providers[0][1].response({'rows': rows}).get_data())
+        for label, provider in providers:
+            assert json.loads(provider.response({'rows': rows}).get_data()) == expected, label
+            with_dates = row_count / latency_ms(lambda: provider.response({'rows': rows}), 5) * 1000
+            plain = row_count / latency_ms(lambda: provider.response({'rows': without_dates}), 5) * 1000
+            print(f"{label:<26} {with_dates:>10,.0f} rows/s | without datetimes: {plain:>10,.0f} rows/s")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
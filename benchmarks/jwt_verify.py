@@ -0,0 +1,36 @@
+"""
+JWT verification throughput: plain jwt.decode against TokenVerifier.
+
+"cached hit" verifies the same token over and over, as a busy client does; "every
+call a miss" cycles through more tokens than the verifier keeps, so each call
+checks the signature.
+
+    python benchmarks/jwt_verify.py [verifications]
+"""
+import sys
+from common import setup_app, per_second
+
+def main(number):
+    app = setup_app()
+    import jwt
+    from utils.auth_helpers import TokenVerifier, create_token, get_token_verifier
+
+    with app.app_context():
+        token = create_token(1, True, 0)
+        verifier = get_token_verifier()
+        key = verifier.keyring.verification_key(token)
+        tokens = [create_token(user_id, True, 0) for user_id in range(2000)]
+        missing = TokenVerifier(verifier.keyring, 100)
+        calls = iter(range(number))
+
+        base = per_second(lambda: jwt.decode(token, key, algorithms=["HS256"]), number)
+        hit = per_second(lambda: verifier.verify(token), number)
+        miss = per_second(lambda: missing.verify(tokens[next(calls) % len(tokens)]), number)
+
+    print(f"{number} verifications")
+    print(f"jwt.decode:            {base:>10,.0f}/s")
+    print(f"cached hit:            {hit:>10,.0f}/s ({hit / base:.1f}x)")
+    print(f"every call a miss:     {miss:>10,.0f}/s")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
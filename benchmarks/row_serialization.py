@@ -0,0 +1,45 @@
+"""
+Row serialization: rows_to_list against the per-column getattr loop it replaced, and
+GET /books with and without a ?fields= projection.
+
+    python benchmarks/row_serialization.py [books]
+"""
+import sys
+from common import setup_app, create_users, latency_ms
+
+def main(book_count):
+    app = setup_app(CACHE_BACKEND='none', SQL_INSTRUMENTATION='false')
+    from sqlalchemy import insert, select
+    from models import db
+    from utils.db_helpers import get_table, rows_to_list
+
+    seller_ids = create_users(app, 1000)
+    with app.app_context():
+        books_table = get_table('books')
+        users_table = get_table('users')
+        db.session.execute(insert(books_table), [
+            {'title': f'Book {i}', 'author': f'Author {i % 100}', 'price': 10 + i % 50, 'seller_id': seller_ids[0]}
+            for i in range(book_count)
+        ])
+        db.session.commit()
+        books = db.session.execute(select(books_table)).fetchall()
+        users = db.session.execute(select(users_table)).fetchall()
+
+    def getattr_per_column(rows, table):
+        return [{column.name: getattr(row, column.name) for column in table.columns} for row in rows]
+
+    print(f"{book_count} book rows, {len(users)} user rows")
+    for label, function, rows in (
+        ('getattr per column', lambda: getattr_per_column(books, books_table), books),
+        ('rows_to_list', lambda: rows_to_list(books, books_table), books),
+        ('rows_to_list, users (hidden columns dropped)', lambda: rows_to_list(users, users_table), users),
+    ):
+        print(f"{label:<46} {len(rows) / latency_ms(function, 10) * 1000:>10,.0f} rows/s")
+
+    client = app.test_client()
+    for url in (f'/books?limit={book_count}&count=false', f'/books?limit={book_count}&count=false&fields=title,price'):
+        assert client.get(url).status_code == 200
+        print(f"GET {url}: {latency_ms(lambda: client.get(url), 10):.1f} ms")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,37 @@
+"""
+Schema construction against the schema_variants cache, and GET /user/<id>?include=
+latency per include combination.
+
+    python benchmarks/schema_variants.py [requests]
+"""
+import io
+import sys
+from contextlib import redirect_stdout
+from common import setup_app, create_users, latency_ms
+
+INCLUDES = ['', 'addresses', 'orders', 'addresses,orders']
+
+def main(request_count):
+    app = setup_app(CACHE_BACKEND='none', SQL_INSTRUMENTATION='false')
+    from schemas.user_schema import UserSchema
+    from schemas.variants import schema_variants
+
+    user_id = create_users(app, 1)[0]
+    with app.app_context():
+        build = latency_ms(lambda: UserSchema(include_fields=['addresses', 'orders']), 2000)
+        cached = latency_ms(lambda: schema_variants.get(UserSchema, ['addresses', 'orders']), 2000)
+    print(f"UserSchema(include_fields=...): {build * 1000:.1f} us | cached lookup: {cached * 1000:.2f} us")
+
+    client = app.test_client()
+    for include in INCLUDES:
+        url = f'/user/{user_id}?include={include}'
+        # The route prints its own debug lines
+        with redirect_stdout(io.StringIO()):
+            assert client.get(url).status_code == 200
+            latency = latency_ms(lambda: client.get(url), request_count)
+        print(f"include={include or '-':<17} {latency:.2f} ms/request")
+    stats = schema_variants.stats()
+    print(f"{stats['entries']} variants cached, {stats['misses']} misses, {stats['hits']} hits")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,35 @@
+"""Add rating aggregates to users
+
+Revision ID: 3f1c2a7b9d4e
+Revises: 9cfa65662de0
+Create Date: 2026-10-17 10:12:41.508337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7b9d4e'
+down_revision = '9cfa65662de0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill the totals from the existing reviews
+    op.execute(
+        "UPDATE users SET "
+        "rating_sum = COALESCE((SELECT SUM(reviews.rating) FROM reviews WHERE reviews.seller_id = users.id), 0), "
+        "rating_count = (SELECT COUNT(*) FROM reviews WHERE reviews.seller_id = users.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
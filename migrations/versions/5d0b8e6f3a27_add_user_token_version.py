@@ -0,0 +1,26 @@
+"""Add token_version to users
+
+Revision ID: 5d0b8e6f3a27
+Revises: e2f7a3c95d10
+Create Date: 2026-10-17 18:05:33.640118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0b8e6f3a27'
+down_revision = 'e2f7a3c95d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
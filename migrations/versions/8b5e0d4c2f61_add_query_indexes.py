@@ -0,0 +1,89 @@
+"""Add indexes for listing and search queries
+
+Revision ID: 8b5e0d4c2f61
+Revises: 3f1c2a7b9d4e
+Create Date: 2026-10-17 14:03:27.114902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5e0d4c2f61'
+down_revision = '3f1c2a7b9d4e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_status_id', ['status', 'id'], unique=False)
+        batch_op.create_index('ix_books_seller_id', ['seller_id'], unique=False)
+        batch_op.create_index('ix_books_genre', ['genre'], unique=False)
+        batch_op.create_index('ix_books_price', ['price'], unique=False)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_user_id_order_date', ['user_id', 'order_date'], unique=False)
+        batch_op.create_index('ix_orders_status', ['status'], unique=False)
+
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.create_index('ix_reviews_seller_id_buyer_id', ['seller_id', 'buyer_id'], unique=False)
+        batch_op.create_index('ix_reviews_buyer_id', ['buyer_id'], unique=False)
+        batch_op.create_index('ix_reviews_book_id', ['book_id'], unique=False)
+
+    with op.batch_alter_table('addresses', schema=None) as batch_op:
+        batch_op.create_index('ix_addresses_user_id_is_default', ['user_id', 'is_default'], unique=False)
+
+    # order_book gets a (order_id, book_id) primary key. Older orders may hold the same
+    # book twice, so copy the distinct pairs into a new table and swap it in.
+    op.create_table('order_book_new',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.PrimaryKeyConstraint('order_id', 'book_id')
+    )
+    op.execute(
+        "INSERT INTO order_book_new (order_id, book_id) "
+        "SELECT DISTINCT order_id, book_id FROM order_book "
+        "WHERE order_id IS NOT NULL AND book_id IS NOT NULL"
+    )
+    op.drop_table('order_book')
+    op.rename_table('order_book_new', 'order_book')
+    with op.batch_alter_table('order_book', schema=None) as batch_op:
+        batch_op.create_index('ix_order_book_book_id', ['book_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_book', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_book_book_id')
+
+    # Back to the original junction table without a primary key
+    op.create_table('order_book_old',
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('book_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], )
+    )
+    op.execute("INSERT INTO order_book_old (order_id, book_id) SELECT order_id, book_id FROM order_book")
+    op.drop_table('order_book')
+    op.rename_table('order_book_old', 'order_book')
+
+    with op.batch_alter_table('addresses', schema=None) as batch_op:
+        batch_op.drop_index('ix_addresses_user_id_is_default')
+
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_reviews_book_id')
+        batch_op.drop_index('ix_reviews_buyer_id')
+        batch_op.drop_index('ix_reviews_seller_id_buyer_id')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_status')
+        batch_op.drop_index('ix_orders_user_id_order_date')
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_price')
+        batch_op.drop_index('ix_books_genre')
+        batch_op.drop_index('ix_books_seller_id')
+        batch_op.drop_index('ix_books_status_id')
@@ -0,0 +1,28 @@
+"""Add batch_ref to orders
+
+Revision ID: a6d2c8f14b93
+Revises: 5d0b8e6f3a27
+Create Date: 2026-10-17 23:41:12.308457
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2c8f14b93'
+down_revision = '5d0b8e6f3a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('batch_ref', sa.String(length=40), nullable=True))
+        batch_op.create_index('ix_orders_batch_ref', ['batch_ref'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_batch_ref')
+        batch_op.drop_column('batch_ref')
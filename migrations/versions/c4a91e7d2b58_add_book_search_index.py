@@ -0,0 +1,69 @@
+"""Add full-text search index for books
+
+Revision ID: c4a91e7d2b58
+Revises: 8b5e0d4c2f61
+Create Date: 2026-10-17 15:26:09.581340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a91e7d2b58'
+down_revision = '8b5e0d4c2f61'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+    "INSERT INTO books_fts(rowid, title, author, description, genre) "
+    "VALUES (new.id, new.title, new.author, new.description, new.genre); END",
+    "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, description, genre) "
+    "VALUES ('delete', old.id, old.title, old.author, old.description, old.genre); END",
+    "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, description, genre ON books BEGIN "
+    "INSERT INTO books_fts(books_fts, rowid, title, author, description, genre) "
+    "VALUES ('delete', old.id, old.title, old.author, old.description, old.genre); "
+    "INSERT INTO books_fts(rowid, title, author, description, genre) "
+    "VALUES (new.id, new.title, new.author, new.description, new.genre); END",
+]
+
+POSTGRES_TSVECTOR = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(genre, ''))"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # External-content FTS5 table over books, kept in sync by triggers
+        op.execute(
+            "CREATE VIRTUAL TABLE books_fts USING fts5("
+            "title, author, description, genre, content='books', content_rowid='id')"
+        )
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+        # Index the books that already exist
+        op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+    elif dialect in ('mysql', 'mariadb'):
+        op.create_index('ft_books_search', 'books', ['title', 'author', 'description', 'genre'], mysql_prefix='FULLTEXT')
+    elif dialect == 'postgresql':
+        op.execute(f"CREATE INDEX ix_books_search_tsv ON books USING GIN ({POSTGRES_TSVECTOR})")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+        op.execute("DROP TABLE IF EXISTS books_fts")
+    elif dialect in ('mysql', 'mariadb'):
+        op.drop_index('ft_books_search', table_name='books')
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_books_search_tsv")
@@ -0,0 +1,37 @@
+"""Add version and updated_at to books, users, orders and addresses
+
+Revision ID: e2f7a3c95d10
+Revises: c4a91e7d2b58
+Create Date: 2026-10-17 16:48:52.207135
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7a3c95d10'
+down_revision = 'c4a91e7d2b58'
+branch_labels = None
+depends_on = None
+
+
+VERSIONED_TABLES = ('books', 'users', 'orders', 'addresses')
+
+
+def upgrade():
+    for table_name in VERSIONED_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+        # Existing rows start at version 1, last modified now
+        op.execute(f"UPDATE {table_name} SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    # Plain ALTER TABLE ... DROP COLUMN (SQLite 3.35+) - a batch table rebuild
+    # would drop the books_fts triggers on books
+    for table_name in reversed(VERSIONED_TABLES):
+        op.drop_column(table_name, 'updated_at')
+        op.drop_column(table_name, 'version')
@@ -1,9 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from .base import Base
+from utils.db_routing import RoutingSession
 
 # Initialize database
 # SQLAlchemy is initialized with the app to manage database connections.
-db = SQLAlchemy(model_class = Base)
+# RoutingSession sends reads to a replica when DB_REPLICA_URIS is set (see utils/db_routing.py)
+db = SQLAlchemy(model_class = Base, session_options={"class_": RoutingSession})
 
 # Import all models AFTER db initialization
 from .user_model import User
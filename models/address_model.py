@@ -1,7 +1,7 @@
-from sqlalchemy import Integer, String, ForeignKey, Boolean
+from sqlalchemy import Integer, String, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Optional
-from .base import Base
+from .base import Base, RowVersionMixin
 from .user_model import User
 from enum import Enum
 from sqlalchemy import Enum as SQLAlchemyEnum
@@ -14,7 +14,7 @@ class AddressType(str, Enum):
     WORK = "Work"
     OTHER = "Other"
 
-class Address(Base):
+class Address(RowVersionMixin, Base):
     """
     Address model for user shipping addresses.
     
@@ -46,6 +46,11 @@ class Address(Base):
     # One user can have Many addresses, but each address belongs to One user
     user: Mapped[Optional["User"]] = relationship(back_populates="addresses", lazy="noload")
     
+    __table_args__ = (
+        # (user_id, is_default) serves a user's address list and default address lookup
+        Index('ix_addresses_user_id_is_default', 'user_id', 'is_default'),
+    )
+    
 #? Method to set this address as default and unset others
 # # Method to set this address as default and unset others
 # def set_as_default(self, session: Session):
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, ForeignKey
+from sqlalchemy import Table, Column, ForeignKey, Index
 from .base import Base
 
 # Junction table for Order-Book many-to-many relationship.
@@ -10,10 +10,13 @@ from .base import Base
 # Purpose:
     # Allows tracking which books belong to which orders,
     # enabling one order to contain multiple books and one book to appear in multiple orders.
+# (order_id, book_id) is the primary key - a book appears at most once per order.
+# book_id gets its own index for lookups from the book side.
 order_book = Table(
     "order_book",
     Base.metadata,
-    Column("order_id", ForeignKey("orders.id")),
-    Column("book_id", ForeignKey("books.id"))
+    Column("order_id", ForeignKey("orders.id"), primary_key=True),
+    Column("book_id", ForeignKey("books.id"), primary_key=True),
+    Index("ix_order_book_book_id", "book_id")
 )
 
@@ -1,10 +1,26 @@
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import Integer, DateTime, literal_column
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.sql import func
+from typing import Optional
+from datetime import datetime
 
 # Base model for sonsit model behaviour
 class Base(DeclarativeBase):
 
     pass
 
+# Row version for single-resource endpoints (ETag / Last-Modified, see get_by_id)
+class RowVersionMixin:
+    """
+    Adds version and updated_at, bumped by every UPDATE - ORM flushes as well as
+    Core update() statements, through onupdate.
+    """
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1",
+        onupdate=literal_column("version") + 1
+    )
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=func.now(), onupdate=func.now())
+
 # User -> Books (One-to-Many)
 # User -> Orders (One-to-Many)
 # User -> Addresses (One-to-Many)
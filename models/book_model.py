@@ -1,15 +1,15 @@
-from sqlalchemy import Integer, String, ForeignKey, Enum, CheckConstraint
+from sqlalchemy import Integer, String, ForeignKey, Enum, CheckConstraint, Index, DDL, event
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import List, Optional
 from datetime import datetime
-from .base import Base 
+from .base import Base, RowVersionMixin
 from .user_model import User
 # Remove circular imports
 # from .order_model import Order
 # from .review_model import Review
 
 # (Many-to-Many with Orders, One-to-Many with User)
-class Book(Base):
+class Book(RowVersionMixin, Base):
     """
     Book model representing books listed for sale.
     
@@ -67,6 +67,12 @@ class Book(Base):
             'publication_year >= 1800 AND publication_year <= 2100',
             name='check_publication_year'
         ),
+        # Indexes matched to the listing/search queries
+        # (status, id) serves /books/featured: newest Available books
+        Index('ix_books_status_id', 'status', 'id'),
+        Index('ix_books_seller_id', 'seller_id'),
+        Index('ix_books_genre', 'genre'),
+        Index('ix_books_price', 'price'),
     )
 
     # Methods
@@ -87,3 +93,50 @@ class Book(Base):
         Returns True if status is 'Available'
         """
         return self.status == "Available"
+
+# Full-text search index over title, author, description and genre (see utils/book_search.py)
+# Created together with the books table by db.create_all(); existing databases get it
+# from the add_book_search_index migration. Each dialect keeps the index in sync itself:
+#   - SQLite: FTS5 external-content table, updated by triggers on insert/update/delete
+#   - MySQL: InnoDB FULLTEXT index
+#   - PostgreSQL: GIN index on a tsvector expression
+BOOK_SEARCH_COLUMNS = ("title", "author", "description", "genre")
+
+# PostgreSQL queries must use this exact expression for the GIN index to be picked
+BOOK_SEARCH_TSVECTOR = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(genre, ''))"
+)
+
+BOOK_SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE books_fts USING fts5("
+        "title, author, description, genre, content='books', content_rowid='id')",
+        "CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts(rowid, title, author, description, genre) "
+        "VALUES (new.id, new.title, new.author, new.description, new.genre); END",
+        "CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, description, genre) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description, old.genre); END",
+        # Only text changes touch the index - status/price updates skip it
+        "CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, description, genre ON books BEGIN "
+        "INSERT INTO books_fts(books_fts, rowid, title, author, description, genre) "
+        "VALUES ('delete', old.id, old.title, old.author, old.description, old.genre); "
+        "INSERT INTO books_fts(rowid, title, author, description, genre) "
+        "VALUES (new.id, new.title, new.author, new.description, new.genre); END",
+    ],
+    "mysql": [
+        "CREATE FULLTEXT INDEX ft_books_search ON books (title, author, description, genre)",
+    ],
+    "mariadb": [
+        "CREATE FULLTEXT INDEX ft_books_search ON books (title, author, description, genre)",
+    ],
+    "postgresql": [
+        f"CREATE INDEX ix_books_search_tsv ON books USING GIN ({BOOK_SEARCH_TSVECTOR})",
+    ],
+}
+
+for dialect_name, statements in BOOK_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect=dialect_name))
+event.listen(Book.__table__, "after_drop", DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect="sqlite"))
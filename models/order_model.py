@@ -1,15 +1,15 @@
-from sqlalchemy import Integer, String, ForeignKey, DateTime, Enum, CheckConstraint
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Enum, CheckConstraint, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import List, Optional
 from datetime import datetime
 from sqlalchemy.sql import func
-from .base import Base
+from .base import Base, RowVersionMixin
 from .user_model import User
 from .address_model import Address
 from decimal import Decimal
 
 # Order Model (Many-to-One with User, Many-to-Many with Books)
-class Order(Base):
+class Order(RowVersionMixin, Base):
     """
     Order model representing book purchases.
     
@@ -45,6 +45,9 @@ class Order(Base):
         default="Unpaid"
     )
     tracking_number: Mapped[Optional[str]] = mapped_column(String(100), unique=True)
+    # "<token>-<position>" for orders created in bulk: read back to get their ids, since
+    # an executemany INSERT can't return them on every database (internal, never dumped)
+    batch_ref: Mapped[Optional[str]] = mapped_column(String(40))
     
     # Relationships -> Many-to-One with User
     # onupdate='SET NULL' keeps order record even if user is deleted
@@ -78,6 +81,10 @@ class Order(Base):
     __table_args__ = (
         # Ensure total_amount is not negative
         CheckConstraint('total_amount >= 0', name='check_positive_amount'),
+        # (user_id, order_date) serves a user's order history sorted by date
+        Index('ix_orders_user_id_order_date', 'user_id', 'order_date'),
+        Index('ix_orders_status', 'status'),
+        Index('ix_orders_batch_ref', 'batch_ref'),
     )
 
     # Method to update order status
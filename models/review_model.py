@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, ForeignKey, DateTime
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import Optional
 from datetime import datetime
@@ -88,4 +88,11 @@ class Review(Base):
     order: Mapped["Order"] = relationship(
         foreign_keys=[order_id],
         lazy="noload"
-    )
\ No newline at end of file
+    )
+
+    __table_args__ = (
+        # (seller_id, buyer_id) serves the duplicate-review check and seller lookups
+        Index('ix_reviews_seller_id_buyer_id', 'seller_id', 'buyer_id'),
+        Index('ix_reviews_buyer_id', 'buyer_id'),
+        Index('ix_reviews_book_id', 'book_id'),
+    )
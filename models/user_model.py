@@ -1,12 +1,12 @@
 from sqlalchemy import String, DateTime, Boolean
 from sqlalchemy.orm import relationship, Mapped, mapped_column
-from werkzeug.security import generate_password_hash, check_password_hash
 from typing import List, Optional
 from datetime import datetime
 from sqlalchemy.sql import func
-from .base import Base
+from .base import Base, RowVersionMixin
+from utils.password_hashing import hash_password, verify_password
 
-class User(Base):
+class User(RowVersionMixin, Base):
     """
     User model representing both buyers and sellers in the system.
     
@@ -26,9 +26,14 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=func.now())
     password: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Carried in every JWT (tv claim) - bumping it revokes all tokens issued so far
+    token_version: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     # Seller profile fields 
     is_seller: Mapped[bool] = mapped_column(Boolean, default=False)
     rating: Mapped[Optional[float]] = mapped_column(nullable=True)
+    # Running totals behind rating - kept up to date with atomic increments on every review write
+    rating_sum: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    rating_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     total_sales: Mapped[int] = mapped_column(nullable=False, default=0)
 
     # Relationships:
@@ -72,7 +77,8 @@ class User(Base):
         If no password provided, sets it to None
         """
         if password:
-            self.password = generate_password_hash(password)
+            # Hashed in the bounded worker pool - may raise HashingBusy
+            self.password = hash_password(password)
         else:
             self.password = None  # set to None if no password
         
@@ -84,6 +90,6 @@ class User(Base):
         """
         if password is None:
             return False
-        return check_password_hash(self.password, password)
+        return verify_password(self.password, password)
 
 
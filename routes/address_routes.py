@@ -4,8 +4,8 @@ from sqlalchemy import select, insert, update, delete, Table, MetaData
 from schemas.address_schema import address_schema, addresses_schema
 from models import db, Address
 from utils.db_helpers import (
-    get_table, row_to_dict, rows_to_list, paginate_results,
-    handle_error, execute_query, get_by_id, create_record
+    get_table, row_to_dict, rows_to_list, paginate_query, wants_total, select_columns,
+    handle_error, execute_query, get_by_id, create_record, ROW_VERSION_COLUMNS
 )
 
 address_bp = Blueprint('address', __name__)
@@ -35,23 +35,19 @@ def get_addresses():
         addresses_table = get_table('addresses')
         
         # Build the query
-        query = select(addresses_table)
+        query = select(*select_columns(addresses_table)).order_by(addresses_table.c.id)
         
-        # Execute query
-        addresses = execute_query(query)
-        
-        # Convert to list of dictionaries
-        address_list = rows_to_list(addresses, addresses_table)
-        
-        # Paginate results
-        paginated_addresses = paginate_results(address_list, page, limit)
+        # Fetch only the requested page (plus the total count)
+        addresses, total = paginate_query(query, page, limit, wants_total())
         
         return jsonify({
             "page": page,
-            "total": len(address_list),
-            "addresses": paginated_addresses
+            "total": total,
+            "addresses": rows_to_list(addresses, addresses_table)
         }), 200
         
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as e:
         return handle_error(e, "getting addresses")
 
@@ -66,21 +62,17 @@ def get_user_addresses(user_id):
         addresses_table = get_table('addresses')
         
         # Build the query to get addresses for a specific user
-        query = select(addresses_table).where(addresses_table.c.user_id == user_id)
-        
-        # Execute query
-        addresses = execute_query(query)
-        
-        # Convert to list of dictionaries
-        address_list = rows_to_list(addresses, addresses_table)
+        query = select(addresses_table).where(
+            addresses_table.c.user_id == user_id
+        ).order_by(addresses_table.c.id)
         
-        # Paginate results
-        paginated_addresses = paginate_results(address_list, page, limit)
+        # Fetch only the requested page (plus the total count)
+        addresses, total = paginate_query(query, page, limit, wants_total())
         
         return jsonify({
             "page": page,
-            "total": len(address_list),
-            "addresses": paginated_addresses
+            "total": total,
+            "addresses": rows_to_list(addresses, addresses_table)
         }), 200
         
     except Exception as e:
@@ -105,7 +97,8 @@ def update_address(id):
         # Prepare update data from request
         update_data = {}
         for key, value in request.json.items():
-            if hasattr(addresses_table.c, key):
+            # version/updated_at are bumped by the UPDATE itself
+            if key not in ROW_VERSION_COLUMNS and hasattr(addresses_table.c, key):
                 update_data[key] = value
         
         # Update the address
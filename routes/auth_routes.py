@@ -1,5 +1,4 @@
 from flask import request, jsonify, Blueprint, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
 from models import db
 from models.user_model import User
 from schemas.user_schema import user_schema
@@ -10,7 +9,14 @@ from functools import wraps
 from utils.db_helpers import (
     get_table, row_to_dict, handle_error, execute_query
 )
-from sqlalchemy import select
+from utils.auth_helpers import (
+    Principal, principal_cache, create_token, decode_token, revoke_tokens
+)
+from utils.rate_limit import rate_limiter, rate_limited_response
+from utils.password_hashing import (
+    HashingBusy, get_password_hasher, hash_password, hashing_busy_response
+)
+from sqlalchemy import select, update
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -33,12 +39,23 @@ def token_required(f):
         
         try:
             # Decode the token
-            data = jwt.decode(
-                token, 
-                current_app.config['SECRET_KEY'], 
-                algorithms=["HS256"]
-            )
-            current_user = db.session.get(User, data['user_id'])
+            data = decode_token(token)
+            
+            # Password reset links are not login tokens
+            if data.get('purpose'):
+                raise jwt.InvalidTokenError('Wrong token type')
+            
+            if current_app.config['AUTH_MODE'] == 'database':
+                # Load the full user on every request
+                current_user = db.session.get(User, data['user_id'])
+                if current_user is None or current_user.token_version != data.get('tv', 0):
+                    raise jwt.InvalidTokenError('Token has been revoked')
+            else:
+                # Stateless: trust the claims, only check the token version (cached per user)
+                state = principal_cache.get(data['user_id'])
+                if state is None or state[0] != data.get('tv', 0):
+                    raise jwt.InvalidTokenError('Token has been revoked')
+                current_user = Principal(data['user_id'], data.get('is_seller'), data.get('tv', 0))
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired'}), 401
         except (jwt.InvalidTokenError, Exception) as e:
@@ -69,7 +86,7 @@ def register():
             name=data['name'],
             last_name=data['last_name'],
             email=data['email'],
-            password=generate_password_hash(data['password']) if 'password' in data else None,
+            password=hash_password(data['password']) if 'password' in data else None,
             role=data.get('role', 'buyer')  # Default role is buyer
         )
         
@@ -83,6 +100,8 @@ def register():
         
     except ValidationError as err:
         return jsonify(err.messages), 400
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         db.session.rollback()
         return handle_error(e, "registering user")
@@ -95,30 +114,50 @@ def login():
         if not auth or not auth.get('email') or not auth.get('password'):
             return jsonify({'message': 'Missing email or password'}), 401
         
-        # Get users table
-        users_table = get_table('users')
+        email = auth['email'].strip().lower()
         
-        # Query user by email
-        user_query = select(users_table).where(users_table.c.email == auth.get('email'))
-        user_row = execute_query(user_query, single_result=True)
+        # Rate limits come first - refused attempts cost no query and no hash.
+        # Every attempt spends an IP token; the email bucket is only checked here
+        # and spent on failures, so a user's own logins don't lock them out
+        allowed, retry_after = rate_limiter.take('LOGIN_IP', request.remote_addr)
+        if allowed:
+            allowed, retry_after = rate_limiter.take('LOGIN_EMAIL', email, cost=0)
+        if not allowed:
+            return rate_limited_response(retry_after)
         
-        if not user_row:
-            return jsonify({'message': 'User not found'}), 404
+        # One query for the credential check and the response: just the user's own
+        # columns the schema dumps, plus password and token_version
+        users_table = get_table('users')
+        login_columns = [
+            users_table.c[name] for name in ('password', 'token_version', *user_schema.dump_fields)
+            if name in users_table.c
+        ]
+        user = db.session.execute(
+            select(*login_columns).where(users_table.c.email == auth['email'])
+        ).first()
         
-        # Convert to User object for password verification
-        user = db.session.get(User, user_row.id)
+        if not user:
+            rate_limiter.take('LOGIN_EMAIL', email)
+            return jsonify({'message': 'User not found'}), 404
             
         if not user.password:  # Guest user without password
             return jsonify({'message': 'Account requires password setup'}), 403
-            
-        if not check_password_hash(user.password, auth.get('password')):
+        
+        hasher = get_password_hasher()
+        if not hasher.verify(user.password, auth['password']):
+            rate_limiter.take('LOGIN_EMAIL', email)
             return jsonify({'message': 'Incorrect password'}), 401
+        
+        # Upgrade hashes made with older parameters (e.g. pbkdf2) while we have the plaintext
+        new_hash = hasher.rehash(user.password, auth['password'])
+        if new_hash:
+            db.session.execute(
+                update(users_table).where(users_table.c.id == user.id).values(password=new_hash)
+            )
+            db.session.commit()
             
         # Generate JWT token
-        token = jwt.encode({
-            'user_id': user.id,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, current_app.config['SECRET_KEY'], algorithm="HS256")
+        token = create_token(user.id, user.is_seller, user.token_version)
         
         return jsonify({
             'message': 'Login successful',
@@ -126,18 +165,23 @@ def login():
             'user': user_schema.dump(user)
         }), 200
         
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
+        db.session.rollback()
         return handle_error(e, "logging in")
 
 @auth_bp.route('/refresh', methods=['POST'])
 @token_required
 def refresh_token(current_user):
     try:
-        # Generate new JWT token
-        token = jwt.encode({
-            'user_id': current_user.id,
-            'exp': datetime.utcnow() + timedelta(hours=24)
-        }, current_app.config['SECRET_KEY'], algorithm="HS256")
+        # Generate new JWT token - claims come from the database so role changes show up
+        state = principal_cache.get(current_user.id)
+        # Deleted or revoked since token_required checked the token
+        if state is None or state[0] != current_user.token_version:
+            return jsonify({'message': 'Token is invalid', 'error': 'Token has been revoked'}), 401
+        token_version, is_seller = state
+        token = create_token(current_user.id, is_seller, token_version)
         
         return jsonify({
             'message': 'Token refreshed',
@@ -151,7 +195,9 @@ def refresh_token(current_user):
 @token_required
 def get_me(current_user):
     try:
-        return jsonify(user_schema.dump(current_user)), 200
+        # The one handler that needs the whole user row
+        user = current_user.user if isinstance(current_user, Principal) else current_user
+        return jsonify(user_schema.dump(user)), 200
     except Exception as e:
         return jsonify({'message': 'Failed to get user info', 'error': str(e)}), 500
 
@@ -163,17 +209,15 @@ def request_password_reset():
         if not data or not data.get('email'):
             return jsonify({'message': 'Email is required'}), 400
             
-        user = User.query.filter_by(email=data.get('email')).first()
+        user = db.session.execute(select(User).where(User.email == data.get('email'))).scalar_one_or_none()
         
         if not user:
             # For security reasons, don't reveal if user exists
             return jsonify({'message': 'If your email is registered, you will receive a reset link'}), 200
             
-        # Generate reset token
-        reset_token = jwt.encode({
-            'user_id': user.id,
-            'exp': datetime.utcnow() + timedelta(hours=1)
-        }, current_app.config['SECRET_KEY'], algorithm="HS256")
+        # Generate reset token - bound to the current token_version, so it stops
+        # working once the password has been changed
+        reset_token = create_token(user.id, user.is_seller, user.token_version, hours=1, purpose='reset')
         
         # In a real app, send email with reset link
         # For now, just return the token in response
@@ -197,11 +241,9 @@ def reset_password(token):
             
         try:
             # Decode the token
-            payload = jwt.decode(
-                token, 
-                current_app.config['SECRET_KEY'], 
-                algorithms=["HS256"]
-            )
+            payload = decode_token(token)
+            if payload.get('purpose') != 'reset':
+                raise jwt.InvalidTokenError('Wrong token type')
             user_id = payload['user_id']
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Reset link has expired'}), 401
@@ -212,13 +254,21 @@ def reset_password(token):
         
         if not user:
             return jsonify({'message': 'User not found'}), 404
+        
+        if user.token_version != payload.get('tv', 0):
+            return jsonify({'message': 'Invalid reset link'}), 401
             
-        # Update password
-        user.password = generate_password_hash(data['password'])
+        # Update password and log out every existing session
+        user.password = hash_password(data['password'])
+        revoke_tokens(user.id)
         db.session.commit()
+        principal_cache.invalidate(user.id)
         
         return jsonify({'message': 'Password reset successful'}), 200
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Password reset failed', 'error': str(e)}), 500 
\ No newline at end of file
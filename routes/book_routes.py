@@ -11,9 +11,13 @@ import os
 import uuid
 from sqlalchemy import Table, Column, MetaData, insert
 from utils.db_helpers import (
-    get_table, row_to_dict, rows_to_list, paginate_results, 
-    handle_error, execute_query, get_by_id, create_record
+    get_table, row_to_dict, rows_to_list, paginate_query, paginate_keyset, count_rows, wants_total, stream_export, 
+    select_columns, handle_error, execute_query, get_by_id, create_record, ROW_VERSION_COLUMNS
 )
+from utils.book_import import import_books, read_csv, read_jsonl
+from utils.book_search import apply_book_search
+from utils.book_suggest import suggest_index
+from utils.response_cache import response_cache, invalidate_books
 
 book_bp = Blueprint('book', __name__)
 
@@ -57,7 +61,14 @@ def create_book():  # Removed current_user parameter
             insert_data['image_url'] = book_data['image_url']
             
         # Create the book using our helper function
-        return create_record('books', insert_data)
+        response = create_record('books', insert_data)
+        
+        # create_record fills in the new id on success - add it to the suggestions
+        if insert_data.get('id'):
+            suggest_index.upsert(insert_data['id'], insert_data['title'], insert_data['author'], insert_data['status'])
+            invalidate_books(insert_data['id'])
+        
+        return response
             
     except ValidationError as err:
         print(f"Validation error: {err.messages}")
@@ -65,6 +76,47 @@ def create_book():  # Removed current_user parameter
     except Exception as e:
         return handle_error(e, "creating book")
 
+@book_bp.route('/books/import', methods=['POST'])
+# @token_required  # Temporarily commented out for development
+def bulk_import_books():
+    try:
+        # Body is JSON lines (one book per line) or CSV with a header row
+        # ?format= wins over the Content-Type header
+        data_format = request.args.get('format', type=str)
+        if not data_format:
+            data_format = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+        if data_format not in ('csv', 'jsonl'):
+            return jsonify({"error": "format must be csv or jsonl"}), 400
+        
+        # Default seller for rows that don't carry their own seller_id
+        seller_id = request.args.get('seller_id', type=int)
+        chunk_size = max(request.args.get('chunk_size', current_app.config['BOOK_IMPORT_CHUNK_SIZE'], type=int), 1)
+        
+        # Add each committed chunk to the suggestions; without the new ids (MySQL) the
+        # index is reloaded on its next lookup instead
+        def index_imported(books):
+            if books is None:
+                suggest_index.mark_stale()
+            else:
+                suggest_index.add_many(books)
+        
+        # Read the body as a stream so memory stays flat whatever the upload size
+        reader = read_csv if data_format == 'csv' else read_jsonl
+        summary = import_books(
+            reader(request.stream), seller_id=seller_id, chunk_size=chunk_size, on_insert=index_imported
+        )
+        
+        if summary["imported"]:
+            invalidate_books()
+        
+        return jsonify({
+            "message": "Import finished",
+            **summary
+        }), 200 if not summary["failed"] else 207
+        
+    except Exception as e:
+        return handle_error(e, "importing books")
+
 @book_bp.route('/books', methods=['GET'])
 def get_books():
     try:
@@ -76,170 +128,227 @@ def get_books():
         # Get books table
         books_table = get_table('books')
         
-        # Build the query using SQLAlchemy Core
-        query = select(books_table)
+        # Build the query using SQLAlchemy Core - only the ?fields= columns, if given
+        query = select(*select_columns(books_table))
         
-        # Add search functionality if requested
+        # Add search functionality if requested (full-text index, see utils/book_search.py)
+        relevance = None
         if search:
-            query = query.where(
-                or_(
-                    books_table.c.title.ilike(f'%{search}%'),
-                    books_table.c.author.ilike(f'%{search}%'),
-                    books_table.c.genre.ilike(f'%{search}%')
-                )
-            )
-        
-        # Execute the query and get results
-        books = execute_query(query)
+            query, relevance = apply_book_search(query, books_table, search)
         
-        # Convert to a list of dictionaries
-        book_list = rows_to_list(books, books_table)
+        # Best matches first like /books/search (id keeps pages from overlapping);
+        # without a search, or with the ILIKE fallback, in id order
+        if relevance is not None:
+            query = query.order_by(desc(relevance), books_table.c.id)
+        else:
+            query = query.order_by(books_table.c.id)
         
-        # Paginate results
-        paginated_books = paginate_results(book_list, page, limit)
+        # Fetch only the requested page (plus the total count)
+        books, total = paginate_query(query, page, limit, wants_total())
         
         return jsonify({
             "page": page,
-            "total": len(book_list),
-            "books": paginated_books
+            "total": total,
+            "books": rows_to_list(books, books_table)
         }), 200
         
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as e:
         return handle_error(e, "listing books")
 
+def build_book_search_query(books_table):
+    """
+    Build the filtered and sorted select() behind /books/search from the request args.
+    Returns (query, sort_column, descending) - also used by the books export.
+    sort_column is None when results are ranked by relevance.
+    """
+    search_term = request.args.get('q', type=str)
+    
+    # Filtering parameters
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    genre = request.args.get('genre', type=str)
+    condition = request.args.get('condition', type=str)
+    author = request.args.get('author', type=str)
+    min_year = request.args.get('min_year', type=int)
+    max_year = request.args.get('max_year', type=int)
+    status = request.args.get('status', type=str)
+    
+    # Sorting parameters - text searches default to best match first
+    sort_by = request.args.get('sort_by', 'relevance' if search_term else 'id')  # Default to id instead of created_at
+    sort_order = request.args.get('sort_order', 'desc')
+    
+    # Build the query using SQLAlchemy Core - only the ?fields= columns, if given,
+    # plus the sort key cursors are built from
+    sort_key = books_table.c[sort_by] if sort_by in books_table.c else books_table.c.id
+    query = select(*select_columns(books_table, sort_key))
+    
+    # Apply text search (full-text index, see utils/book_search.py)
+    relevance = None
+    if search_term:
+        query, relevance = apply_book_search(query, books_table, search_term)
+    
+    # Apply filters
+    if min_price is not None:
+        query = query.where(books_table.c.price >= min_price)
+        
+    if max_price is not None:
+        query = query.where(books_table.c.price <= max_price)
+        
+    if genre:
+        query = query.where(books_table.c.genre.ilike(f'%{genre}%'))
+        
+    if condition:
+        query = query.where(books_table.c.condition == condition)
+        
+    if author:
+        query = query.where(books_table.c.author.ilike(f'%{author}%'))
+        
+    if min_year is not None:
+        query = query.where(books_table.c.publication_year >= min_year)
+        
+    if max_year is not None:
+        query = query.where(books_table.c.publication_year <= max_year)
+        
+    if status:
+        query = query.where(books_table.c.status == status)
+    
+    # Rank by relevance, newest first among equal scores
+    if sort_by == 'relevance' and relevance is not None:
+        query = query.order_by(desc(relevance), desc(books_table.c.id))
+        return query, None, True
+    
+    # Apply sorting - check if the sort column exists in the table
+    if hasattr(books_table.c, sort_by):
+        sort_column = getattr(books_table.c, sort_by)
+    else:
+        # Fallback to id if the requested sort column doesn't exist
+        sort_column = books_table.c.id
+        
+    descending = sort_order == 'desc'
+    if descending:
+        query = query.order_by(desc(sort_column))
+    else:
+        query = query.order_by(sort_column)
+    
+    return query, sort_column, descending
+
 @book_bp.route('/books/search', methods=['GET'])
+@response_cache.cached('CACHE_TTL_BOOK_SEARCH', tags=lambda: ['books'])
 def search_books():
     try:
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
-        search_term = request.args.get('q', type=str)
-        
-        # Filtering parameters
-        min_price = request.args.get('min_price', type=float)
-        max_price = request.args.get('max_price', type=float)
-        genre = request.args.get('genre', type=str)
-        condition = request.args.get('condition', type=str)
-        author = request.args.get('author', type=str)
-        min_year = request.args.get('min_year', type=int)
-        max_year = request.args.get('max_year', type=int)
-        status = request.args.get('status', type=str)
-        
-        # Sorting parameters
-        sort_by = request.args.get('sort_by', 'id')  # Default to id instead of created_at
-        sort_order = request.args.get('sort_order', 'desc')
+        
+        # Opt-in keyset pagination - pass ?cursor= for the first page, then next_cursor/prev_cursor
+        cursor = request.args.get('cursor', type=str)
         
         # Get books table
         books_table = get_table('books')
         
-        # Build the query using SQLAlchemy Core
-        query = select(books_table)
-        
-        # Apply text search
-        if search_term:
-            search_filter = or_(
-                books_table.c.title.ilike(f'%{search_term}%'),
-                books_table.c.author.ilike(f'%{search_term}%'),
-                books_table.c.description.ilike(f'%{search_term}%'),
-                books_table.c.genre.ilike(f'%{search_term}%')
-            )
-            query = query.where(search_filter)
-        
-        # Apply filters
-        if min_price is not None:
-            query = query.where(books_table.c.price >= min_price)
-            
-        if max_price is not None:
-            query = query.where(books_table.c.price <= max_price)
-            
-        if genre:
-            query = query.where(books_table.c.genre.ilike(f'%{genre}%'))
-            
-        if condition:
-            query = query.where(books_table.c.condition == condition)
-            
-        if author:
-            query = query.where(books_table.c.author.ilike(f'%{author}%'))
-            
-        if min_year is not None:
-            query = query.where(books_table.c.publication_year >= min_year)
-            
-        if max_year is not None:
-            query = query.where(books_table.c.publication_year <= max_year)
+        # Filters and sorting from the query string
+        query, sort_column, descending = build_book_search_query(books_table)
+        
+        if cursor is not None:
+            # Relevance scores are not stable enough to seek on
+            if sort_column is None:
+                return jsonify({"error": "Cursor pagination needs a sort_by column, not relevance"}), 400
+            # Seeking needs a total order, NULL sort keys would drop rows
+            if sort_column.nullable:
+                return jsonify({"error": f"Cursor pagination is not supported when sorting by {sort_column.name}"}), 400
+            try:
+                books, next_cursor, prev_cursor = paginate_keyset(
+                    query, sort_column, books_table.c.id, descending, limit, cursor
+                )
+            except ValueError as err:
+                return jsonify({"error": str(err)}), 400
             
-        if status:
-            query = query.where(books_table.c.status == status)
+            return jsonify({
+                "limit": limit,
+                "total": count_rows(query) if wants_total() else None,
+                "books": rows_to_list(books, books_table),
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
+            }), 200
         
-        # Apply sorting - check if the sort column exists in the table
-        if hasattr(books_table.c, sort_by):
-            sort_column = getattr(books_table.c, sort_by)
-        else:
-            # Fallback to id if the requested sort column doesn't exist
-            sort_column = books_table.c.id
-            
-        if sort_order == 'desc':
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(sort_column)
+        # Fetch only the requested page (plus the total count)
+        books, total = paginate_query(query, page, limit, wants_total())
         
-        # Execute query 
-        books = execute_query(query)
+        return jsonify({
+            "page": page,
+            "total": total,
+            "books": rows_to_list(books, books_table)
+        }), 200
         
-        # Convert to a list of dictionaries
-        book_list = rows_to_list(books, books_table)
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as e:
+        return handle_error(e, "searching books")
+
+@book_bp.route('/books/suggest', methods=['GET'])
+def suggest_books():
+    try:
+        # Typeahead for the search box - served from memory, no database query
+        prefix = request.args.get('q', '', type=str)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
         
-        # Apply pagination
-        paginated_books = paginate_results(book_list, page, limit)
+        suggest_index.ensure_loaded()
         
         return jsonify({
-            "page": page,
-            "total": len(book_list),
-            "books": paginated_books
+            "q": prefix,
+            "suggestions": suggest_index.suggest(prefix, limit)
         }), 200
         
     except Exception as e:
-        return handle_error(e, "searching books")
+        return handle_error(e, "suggesting books")
+
+@book_bp.route('/books/export', methods=['GET'])
+def export_books():
+    try:
+        # Same filters and sorting as /books/search, without pagination
+        books_table = get_table('books')
+        query, _, _ = build_book_search_query(books_table)
+        
+        return stream_export(query, books_table, 'books')
+        
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as e:
+        return handle_error(e, "exporting books")
 
 @book_bp.route('/books/featured', methods=['GET'])
+@response_cache.cached('CACHE_TTL_FEATURED_BOOKS', tags=lambda: ['books'])
 def get_featured_books():
     try:
         # Get query parameters
         limit = request.args.get('limit', 6, type=int)
         
         # Use direct SQL approach to avoid loading relationships
-        from sqlalchemy import Table, MetaData, select, desc
-        
-        # Create the books table object
-        metadata = MetaData()
-        books_table = Table('books', metadata, autoload_with=db.engine)
+        books_table = get_table('books')
         
         # Build the query for newest available books - use id instead of created_at
-        query = select(books_table).where(
+        query = select(*select_columns(books_table)).where(
             books_table.c.status == 'Available'
         ).order_by(
             desc(books_table.c.id)  # Sort by ID descending to get newest
         ).limit(limit)
         
         # Execute the query
-        result = db.session.execute(query)
-        books = result.fetchall()
-        
-        # Convert to list of dictionaries
-        featured_books = []
-        for book in books:
-            book_dict = {}
-            for column in books_table.columns:
-                book_dict[column.name] = getattr(book, column.name)
-            featured_books.append(book_dict)
+        books = db.session.execute(query).fetchall()
         
         return jsonify({
-            "featured_books": featured_books
+            "featured_books": rows_to_list(books, books_table)
         }), 200
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as e:
         print(f"Error in get_featured_books: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @book_bp.route('/book/<int:id>', methods=['GET'])
+@response_cache.cached('CACHE_TTL_BOOK', tags=lambda id: [f'book:{id}'])
 def get_book(id):
     # Simply use our helper function
     return get_by_id('books', id)
@@ -259,8 +368,8 @@ def update_book(id):
         # Prepare update data from request
         update_data = {}
         for key, value in request.json.items():
-            # Don't allow changing seller_id
-            if key != 'seller_id' and hasattr(books_table.c, key):
+            # Don't allow changing seller_id (or the row version)
+            if key != 'seller_id' and key not in ROW_VERSION_COLUMNS and hasattr(books_table.c, key):
                 update_data[key] = value
         
         # Update the book
@@ -268,6 +377,11 @@ def update_book(id):
         db.session.execute(stmt)
         db.session.commit()
         
+        # Re-index the title/author, or drop the book once it is no longer Available
+        book = {**result._mapping, **update_data}
+        suggest_index.upsert(id, book['title'], book['author'], book['status'])
+        invalidate_books(id)
+        
         # Get the updated book
         return get_by_id('books', id)
         
@@ -292,6 +406,8 @@ def delete_book(id):
         stmt = delete(books_table).where(books_table.c.id == id)
         db.session.execute(stmt)
         db.session.commit()
+        suggest_index.remove(id)
+        invalidate_books(id)
         
         return jsonify({"message": "Book deleted successfully"}), 200
     except Exception as e:
@@ -341,6 +457,7 @@ def upload_book_image(current_user, id):
         # Update book image_url
         book.image_url = f"/static/uploads/books/{unique_filename}"
         db.session.commit()
+        invalidate_books(id)
         
         return jsonify({
             "message": "Image uploaded successfully",
@@ -1,15 +1,168 @@
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, current_app
 from marshmallow import ValidationError
 from sqlalchemy import select, Table, MetaData, insert, update, delete
 from schemas.order_schema import order_schema, orders_schema, OrderSchema
 from models import db, Order
 from utils.db_helpers import (
-    get_table, row_to_dict, rows_to_list, paginate_results,
-    handle_error, execute_query, get_by_id, create_record
+    get_table, row_to_dict, rows_to_list, paginate_query, wants_total, stream_export, select_columns,
+    handle_error, execute_query, get_by_id, create_record, ROW_VERSION_COLUMNS
 )
+from datetime import datetime
+import uuid
 
 order_bp = Blueprint('order', __name__)
 
+def get_available_book_prices(book_ids):
+    """Return {book_id: price} for the given books that exist and are still available (one query)"""
+    if not book_ids:
+        return {}
+    books_table = get_table('books')
+    books_query = select(books_table.c.id, books_table.c.price).where(
+        books_table.c.id.in_(book_ids),
+        books_table.c.status == 'Available'
+    )
+    return {row.id: row.price for row in db.session.execute(books_query)}
+
+def is_id(value):
+    # bool is an int subclass, but True is not a valid id
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def is_amount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value < float('inf')
+
+def get_order_references(user_ids, address_ids):
+    """
+    Return (ids of the given users that exist, {address_id: owner user_id} for the
+    given addresses that exist) - one IN query each, skipped when there is nothing to look up
+    """
+    users, addresses = set(), {}
+    if user_ids:
+        users_table = get_table('users')
+        users = set(db.session.execute(
+            select(users_table.c.id).where(users_table.c.id.in_(user_ids))
+        ).scalars())
+    if address_ids:
+        addresses_table = get_table('addresses')
+        addresses = {
+            row.id: row.user_id for row in db.session.execute(
+                select(addresses_table.c.id, addresses_table.c.user_id).where(addresses_table.c.id.in_(address_ids))
+            )
+        }
+    return users, addresses
+
+def prepare_order(order_data, prices=None, references=None, default_user_id=None):
+    """
+    Turn a create_order payload into (insert_data, book_ids) - raises ValidationError.
+    prices is a get_available_book_prices() result covering the order's books and
+    references a get_order_references() result covering its user and shipping address;
+    both are looked up here when not given (batch callers fetch them once for every order).
+    Without a user_id the order goes to default_user_id, or is rejected when that is None.
+    """
+    if not isinstance(order_data, dict):
+        raise ValidationError({"_schema": ["Order must be an object"]})
+    
+    books = order_data.get('books') or []
+    if not isinstance(books, list) or not all(is_id(book_id) for book_id in books):
+        raise ValidationError({"books": ["Must be a list of book ids"]})
+    
+    # Unique book ids, keeping the order they were sent in
+    book_ids = list(dict.fromkeys(books))
+    
+    user_id = order_data.get('user_id', default_user_id)
+    if not is_id(user_id):
+        raise ValidationError({"user_id": ["Missing or not an id"]})
+    address_id = order_data.get('shipping_address_id')
+    if address_id is not None and not is_id(address_id):
+        raise ValidationError({"shipping_address_id": ["Not an id"]})
+    
+    # Check the foreign keys here, so the database never rejects the INSERT for them
+    if references is None:
+        references = get_order_references([user_id], [address_id] if address_id else [])
+    users, addresses = references
+    if user_id not in users:
+        raise ValidationError({"user_id": [f"User {user_id} does not exist"]})
+    if address_id and addresses.get(address_id) != user_id:
+        raise ValidationError({"shipping_address_id": [f"Address {address_id} is not an address of user {user_id}"]})
+    
+    # Without books we can only take the client's total (defaults to 0)
+    total_amount = order_data.get('total_amount', 0)
+    if not book_ids and not is_amount(total_amount):
+        raise ValidationError({"total_amount": ["Must be a number greater than or equal to 0"]})
+    
+    if book_ids:
+        if prices is None:
+            prices = get_available_book_prices(book_ids)
+        
+        # Every book must exist and still be available
+        unavailable = [book_id for book_id in book_ids if book_id not in prices]
+        if unavailable:
+            raise ValidationError({"books": [f"Book {book_id} is not available" for book_id in unavailable]})
+        
+        # Total is computed from the stored prices, not trusted from the client
+        total_amount = round(sum(prices[book_id] for book_id in book_ids), 2)
+    
+    # Prepare the data for insertion - only include core fields
+    now = datetime.now()
+    insert_data = {
+        'user_id': user_id,
+        'total_amount': total_amount,
+        'status': 'Pending',  # Default status
+        'payment_status': 'Unpaid',  # Default payment status
+        'order_date': now,  # Set the order date
+        'created_at': now  # Set the created_at date
+    }
+    
+    # Add shipping_address_id only if provided to avoid null constraint issues
+    if address_id:
+        insert_data['shipping_address_id'] = address_id
+    
+    return insert_data, book_ids
+
+def insert_orders(orders):
+    """
+    Insert prepared orders plus their order_book rows in bulk.
+    orders is a list of (insert_data, book_ids) - returns the new order ids in the same order.
+    Does not commit.
+    """
+    orders_table = get_table('orders')
+    order_book_table = get_table('order_book')
+    
+    # executemany needs the same keys on every row
+    columns = set().union(*(insert_data for insert_data, _ in orders))
+    rows = [{column: insert_data.get(column) for column in columns} for insert_data, _ in orders]
+    
+    if len(rows) == 1:
+        order_ids = [db.session.execute(insert(orders_table).values(**rows[0])).inserted_primary_key[0]]
+    else:
+        # One executemany INSERT without RETURNING - MySQL has none, and SQLite can't keep
+        # executemany RETURNING in parameter order without one statement per row. Each
+        # order is tagged "<token>-<position>", so one range scan of ix_orders_batch_ref
+        # reads every id back and maps it to its order
+        token = uuid.uuid4().hex
+        for position, row in enumerate(rows):
+            row['batch_ref'] = f'{token}-{position}'
+        db.session.execute(insert(orders_table), rows)
+        
+        batch_ref = orders_table.c.batch_ref
+        # '.' sorts right after '-', so this covers exactly the refs of this batch
+        inserted = db.session.execute(
+            select(orders_table.c.id, batch_ref).where(batch_ref >= f'{token}-', batch_ref < f'{token}.')
+        )
+        order_ids = [None] * len(rows)
+        for row in inserted:
+            order_ids[int(row.batch_ref.rpartition('-')[2])] = row.id
+    
+    # Add every book of every order in one executemany insert
+    junction_rows = [
+        {'order_id': order_id, 'book_id': book_id}
+        for order_id, (_, book_ids) in zip(order_ids, orders)
+        for book_id in book_ids
+    ]
+    if junction_rows:
+        db.session.execute(insert(order_book_table), junction_rows)
+    
+    return order_ids
+
 @order_bp.route('/orders', methods=['POST'])
 def create_order():
     try:
@@ -19,45 +172,11 @@ def create_order():
         # Print debug info
         print(f"Attempting to create order with data: {order_data}")
         
-        # Use direct SQL approach instead of ORM to avoid relationship loading issues
-        metadata = MetaData()
-        orders_table = Table('orders', metadata, autoload_with=db.engine)
-        
-        # Import datetime
-        from datetime import datetime
-        
-        # Prepare the data for insertion - only include core fields
-        insert_data = {
-            'user_id': order_data.get('user_id', 1),  # Default to user 1 if not provided
-            'total_amount': order_data.get('total_amount', 0),  # Default to 0 if not provided
-            'status': 'Pending',  # Default status
-            'payment_status': 'Unpaid',  # Default payment status
-            'order_date': datetime.now(),  # Set the order date
-            'created_at': datetime.now()  # Set the created_at date
-        }
+        # Validate every book in one query and build the order row
+        insert_data, book_ids = prepare_order(order_data, default_user_id=1)  # Default to user 1 if not provided
         
-        # Add shipping_address_id only if provided to avoid null constraint issues
-        if 'shipping_address_id' in order_data and order_data['shipping_address_id']:
-            insert_data['shipping_address_id'] = order_data['shipping_address_id']
-            
-        # Insert the order
-        stmt = insert(orders_table).values(**insert_data)
-        result = db.session.execute(stmt)
-        order_id = result.inserted_primary_key[0]
-        
-        # If books were provided, add them to the order_book junction table
-        if 'books' in order_data and order_data['books']:
-            # Create table object for order_book junction
-            order_book_table = Table('order_book', metadata, autoload_with=db.engine)
-            
-            # Add each book to the order
-            for book_id in order_data['books']:
-                book_data = {
-                    'order_id': order_id,
-                    'book_id': book_id
-                }
-                book_stmt = insert(order_book_table).values(**book_data)
-                db.session.execute(book_stmt)
+        # Insert the order and its books
+        order_id = insert_orders([(insert_data, book_ids)])[0]
         
         # Commit all changes
         db.session.commit()
@@ -76,6 +195,83 @@ def create_order():
         print(f"Order creation error: {str(e)}")
         return jsonify({"error": "Something went wrong", "details": str(e)}), 500
 
+@order_bp.route('/orders/batch', methods=['POST'])
+def create_orders_batch():
+    try:
+        # Array of orders in the same format as POST /orders
+        orders_data = request.json
+        
+        if not isinstance(orders_data, list):
+            return jsonify({"error": "Validation error", "details": {"_schema": ["Expected a list of orders"]}}), 400
+        
+        max_size = current_app.config['ORDER_BATCH_MAX_SIZE']
+        if len(orders_data) > max_size:
+            return jsonify({"error": f"Batch is limited to {max_size} orders"}), 413
+        
+        chunk_size = max(request.args.get('chunk_size', current_app.config['ORDER_BATCH_CHUNK_SIZE'], type=int), 1)
+        
+        # Validate the whole batch up front - one query each for every book, user and address in it
+        all_book_ids, all_user_ids, all_address_ids = set(), set(), set()
+        for order_data in orders_data:
+            if not isinstance(order_data, dict):
+                continue
+            books = order_data.get('books')
+            if isinstance(books, list):
+                all_book_ids.update(book_id for book_id in books if is_id(book_id))
+            if is_id(order_data.get('user_id')):
+                all_user_ids.add(order_data['user_id'])
+            if is_id(order_data.get('shipping_address_id')):
+                all_address_ids.add(order_data['shipping_address_id'])
+        prices = get_available_book_prices(list(all_book_ids))
+        references = get_order_references(list(all_user_ids), list(all_address_ids))
+        
+        results = [None] * len(orders_data)
+        valid = []
+        for index, order_data in enumerate(orders_data):
+            try:
+                valid.append((index, prepare_order(order_data, prices, references)))
+            except ValidationError as ve:
+                results[index] = {"index": index, "errors": ve.messages}
+        
+        # Insert the valid orders chunk by chunk, one transaction per chunk
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            try:
+                order_ids = insert_orders([prepared for _, prepared in chunk])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception("Order batch chunk failed, retrying its orders one by one")
+                # Something changed since validation (e.g. a user was deleted) - insert the
+                # orders one at a time so only the ones the database rejects fail
+                order_ids = []
+                for index, prepared in chunk:
+                    try:
+                        order_ids.append(insert_orders([prepared])[0])
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        current_app.logger.exception("Order %d of the batch was rejected by the database", index)
+                        order_ids.append(None)
+                        results[index] = {"index": index, "errors": {"_schema": ["Order could not be saved"]}}
+            
+            for order_id, (index, (insert_data, _)) in zip(order_ids, chunk):
+                if order_id is not None:
+                    results[index] = {"index": index, "id": order_id, "total_amount": insert_data['total_amount']}
+        
+        failed = sum(1 for result in results if "errors" in result)
+        return jsonify({
+            "message": "Orders processed",
+            "created": len(results) - failed,
+            "failed": failed,
+            "results": results
+        }), 201 if not failed else 207
+        
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Order batch failed")
+        return jsonify({"error": "Something went wrong"}), 500
+
 #GET Methods
 @order_bp.route('/orders', methods=['GET'])
 def get_orders():
@@ -88,26 +284,47 @@ def get_orders():
         orders_table = get_table('orders')
         
         # Build query to exclude canceled orders
-        query = select(orders_table).where(orders_table.c.status != "Cancelled")
-        
-        # Execute query
-        orders = execute_query(query)
-        
-        # Convert to list of dictionaries
-        order_list = rows_to_list(orders, orders_table)
+        query = select(*select_columns(orders_table)).where(
+            orders_table.c.status != "Cancelled"
+        ).order_by(orders_table.c.id)
         
-        # Paginate results
-        paginated_orders = paginate_results(order_list, page, limit)
+        # Fetch only the requested page (plus the total count)
+        orders, total = paginate_query(query, page, limit, wants_total())
         
         return jsonify({
             "page": page,
-            "total": len(order_list),
-            "orders": paginated_orders
+            "total": total,
+            "orders": rows_to_list(orders, orders_table)
         }), 200
 
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as e:
         return handle_error(e, "getting orders")
 
+@order_bp.route('/orders/export', methods=['GET'])
+def export_orders():
+    try:
+        # Optional filters
+        user_id = request.args.get('user_id', type=int)
+        status = request.args.get('status', type=str)
+        
+        orders_table = get_table('orders')
+        query = select(*select_columns(orders_table))
+        
+        if user_id is not None:
+            query = query.where(orders_table.c.user_id == user_id)
+        
+        if status:
+            query = query.where(orders_table.c.status == status)
+        
+        return stream_export(query.order_by(orders_table.c.id), orders_table, 'orders')
+        
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as e:
+        return handle_error(e, "exporting orders")
+
 @order_bp.route('/order/<int:id>', methods=['GET'])
 def get_order(id):
     # Simply use our helper function
@@ -129,7 +346,8 @@ def update_order(id):
         # Prepare update data from request
         update_data = {}
         for key, value in request.json.items():
-            if hasattr(orders_table.c, key):
+            # version/updated_at are bumped by the UPDATE itself
+            if key not in ROW_VERSION_COLUMNS and hasattr(orders_table.c, key):
                 update_data[key] = value
         
         # Update the order
@@ -8,13 +8,17 @@ from models.book_model import Book
 from schemas.review_schema import review_schema, reviews_schema
 from routes.auth_routes import token_required
 from utils.db_helpers import (
-    get_table, row_to_dict, rows_to_list, paginate_results,
+    get_table, row_to_dict, rows_to_list, paginate_query, wants_total, stream_export, select_columns,
     handle_error, execute_query, get_by_id
 )
+from utils.rating_helpers import apply_rating_change
 from datetime import datetime
 
 review_bp = Blueprint('review', __name__)
 
+# Public buyer details attached to reviews (never the password hash, email or phone)
+BUYER_PUBLIC_FIELDS = ('id', 'name', 'last_name', 'rating')
+
 @review_bp.route('/reviews', methods=['POST'])
 # @token_required - Temporarily removed for testing
 def create_review():
@@ -71,21 +75,8 @@ def create_review():
         # Get the new review ID
         review_id = result.inserted_primary_key[0]
         
-        # Update seller rating
-        seller_reviews_query = select(reviews_table).where(reviews_table.c.seller_id == data['seller_id'])
-        seller_reviews = execute_query(seller_reviews_query)
-        
-        if seller_reviews:
-            total_rating = sum(review.rating for review in seller_reviews) + data['rating']
-            avg_rating = total_rating / (len(seller_reviews) + 1)
-            
-            # Update seller rating
-            update_stmt = update(users_table).where(
-                users_table.c.id == data['seller_id']
-            ).values(
-                rating=avg_rating
-            )
-            db.session.execute(update_stmt)
+        # Update seller rating - add the new review to the running totals
+        apply_rating_change(data['seller_id'], data['rating'], 1)
         
         db.session.commit()
         
@@ -115,40 +106,73 @@ def get_reviews():
         reviews_table = get_table('reviews')
         
         # Build query
-        query = select(reviews_table)
+        query = select(*select_columns(reviews_table)).order_by(reviews_table.c.id)
         
-        # Execute query
-        reviews = execute_query(query)
-        
-        # Convert to list of dictionaries
-        review_list = rows_to_list(reviews, reviews_table)
-        
-        # Paginate results
-        paginated_reviews = paginate_results(review_list, page, limit)
+        # Fetch only the requested page (plus the total count)
+        reviews, total = paginate_query(query, page, limit, wants_total())
         
         return jsonify({
             "page": page, 
-            "total": len(review_list),
-            "reviews": paginated_reviews
+            "total": total,
+            "reviews": rows_to_list(reviews, reviews_table)
         }), 200
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as e:
         return handle_error(e, "getting reviews")
 
+@review_bp.route('/reviews/export', methods=['GET'])
+def export_reviews():
+    try:
+        reviews_table = get_table('reviews')
+        query = select(*select_columns(reviews_table))
+        
+        # Optional filters
+        for field in ('seller_id', 'buyer_id', 'book_id'):
+            value = request.args.get(field, type=int)
+            if value is not None:
+                query = query.where(reviews_table.c[field] == value)
+        
+        return stream_export(query.order_by(reviews_table.c.id), reviews_table, 'reviews')
+        
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+    except Exception as e:
+        return handle_error(e, "exporting reviews")
+
 @review_bp.route('/review/<int:id>', methods=['GET'])
 def get_review(id):
     # Simply use our helper function
     return get_by_id('reviews', id)
 
+def lock_review(reviews_table, id):
+    """
+    Read a review for an update or delete, locking the row until commit where the
+    database supports it (MySQL/PostgreSQL), so concurrent writes to the same review
+    apply their seller rating changes one after the other.
+    """
+    query = select(reviews_table).where(reviews_table.c.id == id).with_for_update()
+    return db.session.execute(query).first()
+
+def review_conflict(reviews_table, id):
+    """
+    Response for a guarded write that matched no row: the review was deleted (404) or
+    its rating changed (409) after it was read. Nothing was applied, so retrying is safe.
+    """
+    exists = db.session.execute(select(reviews_table.c.id).where(reviews_table.c.id == id)).first()
+    if not exists:
+        return jsonify({"error": "Review not found"}), 404
+    return jsonify({"error": "Review was changed by another request, please retry"}), 409
+
 @review_bp.route('/review/<int:id>', methods=['PUT'])
 # @token_required - Temporarily removed for testing
 def update_review(id):
     try:
         # Get tables
         reviews_table = get_table('reviews')
-        users_table = get_table('users')
         
-        # First check if the review exists
-        result, _ = get_by_id('reviews', id, response=False)
+        # First check if the review exists (locked until commit, see lock_review)
+        result = lock_review(reviews_table, id)
         
         if not result:
             return jsonify({"error": "Review not found"}), 404
@@ -167,29 +191,17 @@ def update_review(id):
             if key not in ['buyer_id', 'seller_id'] and hasattr(reviews_table.c, key):
                 update_data[key] = value
         
-        # Update the review
-        stmt = update(reviews_table).where(reviews_table.c.id == id).values(**update_data)
-        db.session.execute(stmt)
+        # Update the review - only if the rating is still the one the delta is computed from
+        stmt = update(reviews_table).where(
+            reviews_table.c.id == id, reviews_table.c.rating == old_rating
+        ).values(**update_data)
+        if db.session.execute(stmt).rowcount != 1:
+            db.session.rollback()
+            return review_conflict(reviews_table, id)
         
-        # If rating changed, update seller's average rating
+        # If rating changed, shift the seller's totals by the difference
         if 'rating' in data and data['rating'] != old_rating:
-            # Get all reviews for the seller
-            seller_id = result.seller_id
-            seller_reviews_query = select(reviews_table).where(reviews_table.c.seller_id == seller_id)
-            seller_reviews = execute_query(seller_reviews_query)
-            
-            if seller_reviews:
-                # Calculate new average rating
-                total_rating = sum(r.rating for r in seller_reviews)
-                avg_rating = total_rating / len(seller_reviews)
-                
-                # Update seller rating
-                update_seller_stmt = update(users_table).where(
-                    users_table.c.id == seller_id
-                ).values(
-                    rating=avg_rating
-                )
-                db.session.execute(update_seller_stmt)
+            apply_rating_change(result.seller_id, data['rating'] - old_rating, 0)
             
         db.session.commit()
         
@@ -208,10 +220,9 @@ def delete_review(id):
     try:
         # Get tables
         reviews_table = get_table('reviews')
-        users_table = get_table('users')
         
-        # First check if the review exists
-        result, _ = get_by_id('reviews', id, response=False)
+        # First check if the review exists (locked until commit, see lock_review)
+        result = lock_review(reviews_table, id)
         
         if not result:
             return jsonify({"error": "Review not found"}), 404
@@ -220,36 +231,17 @@ def delete_review(id):
         # if result.buyer_id != current_user.id:
         #     return jsonify({"error": "Unauthorized to delete this review"}), 403
             
-        seller_id = result.seller_id
-        
-        # Delete the review
-        delete_stmt = delete(reviews_table).where(reviews_table.c.id == id)
-        db.session.execute(delete_stmt)
-        
-        # Update seller rating
-        seller_reviews_query = select(reviews_table).where(reviews_table.c.seller_id == seller_id)
-        seller_reviews = execute_query(seller_reviews_query)
+        # Delete the review - the totals only change if this request removed the row it read
+        delete_stmt = delete(reviews_table).where(
+            reviews_table.c.id == id, reviews_table.c.rating == result.rating
+        )
+        if db.session.execute(delete_stmt).rowcount != 1:
+            db.session.rollback()
+            return review_conflict(reviews_table, id)
         
-        if seller_reviews:
-            # Calculate new average rating
-            total_rating = sum(r.rating for r in seller_reviews)
-            avg_rating = total_rating / len(seller_reviews)
-            
-            # Update seller rating
-            update_seller_stmt = update(users_table).where(
-                users_table.c.id == seller_id
-            ).values(
-                rating=avg_rating
-            )
-            db.session.execute(update_seller_stmt)
-        else:
-            # No reviews left, reset to default rating of 0
-            update_seller_stmt = update(users_table).where(
-                users_table.c.id == seller_id
-            ).values(
-                rating=0
-            )
-            db.session.execute(update_seller_stmt)
+        # Update seller rating - take the review out of the running totals
+        # (rating resets to 0 when no reviews are left)
+        apply_rating_change(result.seller_id, -result.rating, -1)
             
         db.session.commit()
         
@@ -283,18 +275,17 @@ def get_user_reviews(id):
         else:
             query = select(reviews_table).where(reviews_table.c.seller_id == id)
         
-        # Execute query
-        reviews = execute_query(query)
-        review_list = rows_to_list(reviews, reviews_table)
+        # Stable order so pages don't overlap
+        query = query.order_by(reviews_table.c.id)
         
-        # Apply pagination
-        paginated_reviews = paginate_results(review_list, page, limit)
+        # Fetch only the requested page (plus the total count)
+        reviews, total = paginate_query(query, page, limit, wants_total())
         
         return jsonify({
             "page": page,
             "per_page": limit,
-            "total": len(review_list),
-            "reviews": paginated_reviews
+            "total": total,
+            "reviews": rows_to_list(reviews, reviews_table)
         }), 200
         
     except Exception as e:
@@ -319,29 +310,33 @@ def get_book_reviews(id):
         reviews_table = get_table('reviews')
         
         # Query for reviews for this book
-        query = select(reviews_table).where(reviews_table.c.book_id == id)
+        query = select(reviews_table).where(
+            reviews_table.c.book_id == id
+        ).order_by(reviews_table.c.id)
             
-        # Execute query
-        reviews = execute_query(query)
+        # Fetch only the requested page (plus the total count)
+        reviews, total = paginate_query(query, page, limit, wants_total())
         
         # Convert to list of dictionaries
-        review_list = rows_to_list(reviews, reviews_table)
-        
-        # Paginate results
-        paginated_reviews = paginate_results(review_list, page, limit)
+        paginated_reviews = rows_to_list(reviews, reviews_table)
         
-        # For each review, get the buyer details
+        # Get the buyer details for the whole page in one query
         users_table = get_table('users')
+        buyer_ids = {review_dict['buyer_id'] for review_dict in paginated_reviews}
+        buyers = {}
+        if buyer_ids:
+            buyer_query = select(
+                *[users_table.c[field] for field in BUYER_PUBLIC_FIELDS]
+            ).where(users_table.c.id.in_(buyer_ids))
+            buyers = {row.id: dict(row._mapping) for row in db.session.execute(buyer_query)}
+        
         for review_dict in paginated_reviews:
-            # Get buyer info
-            buyer_query = select(users_table).where(users_table.c.id == review_dict['buyer_id'])
-            buyer = execute_query(buyer_query, single_result=True)
-            if buyer:
-                review_dict['buyer'] = row_to_dict(buyer, users_table)
+            if review_dict['buyer_id'] in buyers:
+                review_dict['buyer'] = buyers[review_dict['buyer_id']]
         
         return jsonify({
             "page": page,
-            "total": len(review_list),
+            "total": total,
             "reviews": paginated_reviews
         }), 200
     except Exception as e:
@@ -1,13 +1,16 @@
 from schemas.user_schema import user_schema, users_schema, UserSchema
+from schemas.variants import schema_variants
 from models import db, User
 from flask import request, jsonify, Blueprint, current_app
 from marshmallow import ValidationError
 from sqlalchemy import select, or_, and_, desc, update, delete # to query the database
 from sqlalchemy.orm import selectinload
 from utils.db_helpers import (
-    get_table, row_to_dict, rows_to_list, paginate_results,
-    handle_error, execute_query, get_by_id
+    get_table, row_to_dict, rows_to_list, paginate_query, paginate_keyset, count_rows, wants_total,
+    select_columns, handle_error, execute_query, get_by_id
 )
+from utils.auth_helpers import AUTHORIZATION_FIELDS, principal_cache, revoke_tokens
+from utils.password_hashing import HashingBusy, hashing_busy_response
 
 import jwt
 import datetime # to handle token expiration
@@ -45,6 +48,9 @@ def create_user():
         
     except ValidationError as e:
         return jsonify(e.messages), 400
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
     except Exception as e:
         return jsonify({"error": "Something went wrong", "details": str(e)}), 500
     
@@ -83,8 +89,8 @@ def get_users():
         users_table = get_table('users')
         
         # ilike -> case-insensitive search & or_() to properly join conditions in sqlalchemy
-        # Build query
-        query = select(users_table)
+        # Build query - public columns only (never the password hash), or just the ?fields= ones
+        query = select(*select_columns(users_table))
         
         # Add search if provided
         if search:
@@ -96,24 +102,24 @@ def get_users():
                 )
             )
         
-        # Execute query
-        users = execute_query(query)
+        # Stable order so pages don't overlap
+        query = query.order_by(users_table.c.id)
         
-        # Convert to list of dictionaries
-        user_list = rows_to_list(users, users_table)
+        # Fetch only the requested page (plus the total count)
+        users, total = paginate_query(query, page, limit, wants_total())
         
-        if not user_list:
+        # An empty first page means there are no matching users at all
+        if not users and page <= 1:
             return jsonify({"message": "No users found", "debug": "This is the updated route"}), 200 
         
-        # Paginate results
-        paginated_users = paginate_results(user_list, page, limit)
-        
         return jsonify({
             "page": page,
-            "total": len(user_list), 
-            "users": paginated_users
+            "total": total, 
+            "users": rows_to_list(users, users_table)
         }), 200
     
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
     except Exception as e:
         return handle_error(e, "getting users")
 
@@ -134,10 +140,7 @@ def get_user(id):
         # For requests with relationship loading, we need to use the ORM
         query = select(User).where(User.id == id)
         
-        # Selective loading
-        if "addresses" in include_fields:
-            query = query.options(selectinload(User.addresses))
-        
+        # Selective loading - addresses is a dynamic relationship, queried when the schema reads it
         if "orders" in include_fields:
             query = query.options(selectinload(User.orders)) 
 
@@ -146,8 +149,8 @@ def get_user(id):
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        # Use dynamic schema to include relationships
-        user_schema_dynamic = UserSchema(include_fields=include_fields)
+        # Use dynamic schema to include relationships (built once per include combination)
+        user_schema_dynamic = schema_variants.get(UserSchema, include_fields)
         print("Schema Fields:", user_schema_dynamic.fields.keys())
 
         return jsonify(user_schema_dynamic.dump(user)), 200
@@ -180,6 +183,13 @@ def update_user(id):
         if not result:
             return jsonify({"error": "User not found"}), 404
         
+        # A new password or privilege logs out every existing session - through token_version,
+        # which every worker checks, not only through this worker's principal cache
+        if 'password' in data or any(
+            name in data and data[name] != getattr(result, name) for name in AUTHORIZATION_FIELDS
+        ):
+            revoke_tokens(id)
+        
         # Handle password separately if provided
         if 'password' in data:
             # We need to hash the password before updating
@@ -195,9 +205,15 @@ def update_user(id):
             
         db.session.commit()
         
+        # Drop the cached token version / is_seller for this user
+        principal_cache.invalidate(id)
+        
         # Get updated user
         return get_by_id('users', id)
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
     except Exception as e:
         db.session.rollback()
         return handle_error(e, "updating user")
@@ -219,6 +235,9 @@ def delete_user(id):
         db.session.execute(stmt)
         db.session.commit()
         
+        # Tokens of a deleted user stop working right away in this worker
+        principal_cache.invalidate(id)
+        
         return jsonify({"message": "User deleted successfully"}), 200
         
     except Exception as e:
@@ -235,10 +254,12 @@ def get_user_orders(user_id):
         status = request.args.get('status', type=str)
         sort = request.args.get('sort', 'order_date', type=str)
         order = request.args.get('order', 'desc', type=str)
+        # Opt-in keyset pagination - pass ?cursor= for the first page, then next_cursor/prev_cursor
+        cursor = request.args.get('cursor', type=str)
         
         # Check if user exists
         users_table = get_table('users')
-        user_query = select(users_table).where(users_table.c.id == user_id)
+        user_query = select(users_table.c.id).where(users_table.c.id == user_id)
         user = execute_query(user_query, single_result=True)
         
         if not user:
@@ -257,44 +278,66 @@ def get_user_orders(user_id):
         # Apply sorting
         if hasattr(orders_table.c, sort):
             sort_column = getattr(orders_table.c, sort)
-            if order.lower() == 'desc':
-                query = query.order_by(desc(sort_column))
-            else:
-                query = query.order_by(sort_column)
+            descending = order.lower() == 'desc'
         else:
             # Default sort by order_date descending
-            query = query.order_by(desc(orders_table.c.order_date))
-        
-        # Execute query
-        orders = execute_query(query)
+            sort_column = orders_table.c.order_date
+            descending = True
+        query = query.order_by(desc(sort_column) if descending else sort_column)
+        
+        next_cursor = prev_cursor = None
+        if cursor is not None:
+            # Seeking needs a total order, NULL sort keys would drop rows
+            if sort_column.nullable:
+                return jsonify({"error": f"Cursor pagination is not supported when sorting by {sort_column.name}"}), 400
+            try:
+                orders, next_cursor, prev_cursor = paginate_keyset(
+                    query, sort_column, orders_table.c.id, descending, limit, cursor
+                )
+            except ValueError as err:
+                return jsonify({"error": str(err)}), 400
+            total = count_rows(query) if wants_total() else None
+        else:
+            # Fetch only the requested page (plus the total count)
+            orders, total = paginate_query(query, page, limit, wants_total())
         
         # Convert to list of dictionaries
-        order_list = rows_to_list(orders, orders_table)
-        
-        # Paginate results
-        paginated_orders = paginate_results(order_list, page, limit)
+        paginated_orders = rows_to_list(orders, orders_table)
+        
+        # Get the books for every order on this page in one query
+        order_book_table = get_table('order_book')
+        books_table = get_table('books')
+        
+        books_by_order = {order_dict['id']: [] for order_dict in paginated_orders}
+        if books_by_order:
+            book_query = select(
+                order_book_table.c.order_id, books_table
+            ).join(
+                order_book_table, order_book_table.c.book_id == books_table.c.id
+            ).where(
+                order_book_table.c.order_id.in_(list(books_by_order))
+            ).distinct().order_by(order_book_table.c.order_id, books_table.c.id)
+            
+            # Group the books by order in a single pass
+            for row in db.session.execute(book_query):
+                books_by_order[row.order_id].append(row_to_dict(row, books_table))
         
-        # For each order, get its books
         for order_dict in paginated_orders:
-            # Get order_book junction table
-            order_book_table = get_table('order_book')
-            books_table = get_table('books')
-            
-            # Get books for this order
-            book_query = select(books_table).where(
-                books_table.c.id.in_(
-                    select(order_book_table.c.book_id).where(
-                        order_book_table.c.order_id == order_dict['id']
-                    )
-                )
-            )
-            books = execute_query(book_query)
-            order_dict['books'] = rows_to_list(books, books_table)
+            order_dict['books'] = books_by_order[order_dict['id']]
+        
+        if cursor is not None:
+            return jsonify({
+                "limit": limit,
+                "total": total,
+                "orders": paginated_orders,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor
+            }), 200
         
         return jsonify({
             "page": page,
             "limit": limit,
-            "total": len(order_list),
+            "total": total,
             "orders": paginated_orders
         }), 200
         
@@ -1,4 +1,4 @@
-from marshmallow import fields
+from marshmallow import fields, validate, EXCLUDE
 from schemas import ma
 from models.book_model import Book
 
@@ -8,14 +8,18 @@ class BookSchema(ma.SQLAlchemySchema):
         load_instance = True
         
     id = fields.Int(dump_only=True)
+    # Row version (ETags) - maintained by the database, never loaded from requests
+    version = fields.Int(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
     title = fields.String(required=True)
     author = fields.String(required=True)
-    price = fields.Float(required=True)
-    description = fields.String()
-    condition = fields.String()
-    genre = fields.String()
-    publication_year = fields.Int()
-    isbn = fields.String()
+    # Same rules as the check constraints in Book.__table_args__
+    price = fields.Float(required=True, validate=validate.Range(min=0, max=10000))
+    description = fields.String(allow_none=True)
+    condition = fields.String(validate=validate.OneOf(["New", "Like New", "Very Good", "Good", "Fair"]))
+    genre = fields.String(allow_none=True)
+    publication_year = fields.Int(allow_none=True, validate=validate.Range(min=1800, max=2100))
+    isbn = fields.String(allow_none=True, validate=validate.Length(equal=13))
     status = fields.String()
     image_url = fields.String()
     
@@ -24,18 +28,25 @@ class BookSchema(ma.SQLAlchemySchema):
     seller = fields.Nested('UserSchema', only=('id', 'name', 'last_name', 'rating'), dump_only=True)
     reviews = fields.Nested('ReviewSchema', many=True, dump_only=True)
     
+    # Nested fields dumped only when named in include_fields
+    optional_fields = ("seller", "reviews")
+    
     def __init__(self, *args, **kwargs):
         include_fields = kwargs.pop('include_fields', [])
-        super().__init__(*args, **kwargs)
-        
         include_fields = include_fields or []
         
-        # Remove nested fields unless specifically requested
-        if "seller" not in include_fields:
-            del self.fields["seller"]
-            
-        if "reviews" not in include_fields:
-            del self.fields["reviews"]
+        # Exclude nested fields unless specifically requested
+        kwargs['exclude'] = tuple(kwargs.get('exclude', ())) + tuple(
+            name for name in self.optional_fields if name not in include_fields
+        )
+        super().__init__(*args, **kwargs)
     
+# Validates bulk import rows into plain dicts (no ORM objects), ignoring extra columns
+class BookImportSchema(BookSchema):
+    class Meta(BookSchema.Meta):
+        load_instance = False
+        unknown = EXCLUDE
+
 book_schema = BookSchema()
-books_schema = BookSchema(many=True)
\ No newline at end of file
+books_schema = BookSchema(many=True)
+book_import_schema = BookImportSchema()
\ No newline at end of file
@@ -8,9 +8,14 @@ class OrderSchema(ma.SQLAlchemyAutoSchema):
         model = Order
         include_fk = True
         load_instance = True
+        # Only used by the batch insert to read back ids
+        exclude = ("batch_ref",)
         
     # Only include these by default
     id = fields.Int(dump_only=True)
+    # Row version (ETags) - maintained by the database, never loaded from requests
+    version = fields.Int(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
     order_date = fields.DateTime(dump_only=True)
     total_amount = fields.Float(dump_only=True, required=True)
     status = fields.String(dump_only=True)
@@ -23,21 +28,18 @@ class OrderSchema(ma.SQLAlchemyAutoSchema):
     shipping_address = fields.Nested('AddressSchema', dump_only=True)
     books = fields.Nested('BookSchema', many=True, only=('id', 'title', 'author', 'price'), dump_only=True)
     
+    # Nested fields dumped only when named in include_fields
+    optional_fields = ('books', 'customer', 'shipping_address')
+    
     def __init__(self, *args, **kwargs):
         include_fields = kwargs.pop('include_fields', [])
-        super().__init__(*args, **kwargs)
-        
         include_fields = include_fields or []
         
-        # Remove nested fields unless specifically requested
-        if 'books' not in include_fields:
-            del self.fields['books']
-            
-        if 'customer' not in include_fields:
-            del self.fields['customer']
-            
-        if 'shipping_address' not in include_fields:
-            del self.fields['shipping_address']
+        # Exclude nested fields unless specifically requested
+        kwargs['exclude'] = tuple(kwargs.get('exclude', ())) + tuple(
+            name for name in self.optional_fields if name not in include_fields
+        )
+        super().__init__(*args, **kwargs)
         
 order_schema = OrderSchema()
 orders_schema = OrderSchema(many=True) 
\ No newline at end of file
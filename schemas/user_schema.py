@@ -9,8 +9,14 @@ class UserSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = User # Connects the schema to the User model (Maps to User model)
         load_instance = True # Deserializes data directly into a User instance instead of just dictionary
+        # Rating totals are maintained by the review routes, token_version by the auth routes -
+        # never set by clients
+        exclude = ("rating_sum", "rating_count", "token_version")
     
     id = fields.Int(dump_only=True)
+    # Row version (ETags) - maintained by the database, never loaded from requests
+    version = fields.Int(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
     name = fields.String(required=True)
     last_name = fields.String(required=True)
     phone_number = fields.String(required=True)
@@ -24,21 +30,22 @@ class UserSchema(ma.SQLAlchemyAutoSchema):
     orders = fields.Nested('OrderSchema', many=True, dump_only=True) # read only - only basic info is included by default 
     addresses = fields.Nested('AddressSchema', many=True)
     
+    # Nested fields dumped only when named in include_fields
+    optional_fields = ("addresses", "orders")
     
     def __init__(self, *args, **kwargs):
         # Get 'include' parameter in endpoints 
         include_fields = kwargs.pop("include_fields", [])
-        super().__init__(*args, **kwargs)
         
         # bunsuz user_routes'de kullaninca error verdi. 
         include_fields = include_fields or []
         
-        # Remove addresses and orders unless requested
-        if "addresses" not in include_fields:
-            del self.fields["addresses"]
-
-        if "orders" not in include_fields:
-            del self.fields["orders"]
+        # Leave out addresses and orders unless requested - passed as exclude so marshmallow
+        # drops them from dump_fields too (deleting from self.fields afterwards doesn't)
+        kwargs["exclude"] = tuple(kwargs.get("exclude", ())) + tuple(
+            name for name in self.optional_fields if name not in include_fields
+        )
+        super().__init__(*args, **kwargs)
             
 # Initialize instances
 user_schema = UserSchema()
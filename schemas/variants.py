@@ -0,0 +1,61 @@
+"""
+Cache of schema instances per include_fields combination.
+
+Building a schema copies and binds every declared field, which costs far more
+than the dump itself. Schemas are stateless once built, so each distinct
+(schema class, included fields, many) variant is built once and reused.
+"""
+import threading
+from collections import OrderedDict
+
+class SchemaVariants:
+    """Bounded, thread-safe LRU of schema instances"""
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, schema_class, include_fields=None, many=False):
+        """
+        schema_class(include_fields=include_fields, many=many), built once per combination.
+        Names that are not optional fields of the schema are ignored, so arbitrary
+        ?include= values can't fill the cache with copies of the same variant.
+        """
+        included = frozenset(include_fields or ()) & frozenset(schema_class.optional_fields)
+        key = (schema_class, included, many)
+        with self._lock:
+            schema = self._entries.get(key)
+            if schema is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return schema
+
+        # Build outside the lock - two threads may both build a new variant, one wins
+        schema = schema_class(include_fields=sorted(included), many=many)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = schema
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return schema
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "variants": sorted(
+                f"{schema_class.__name__}({','.join(sorted(included))}){'[many]' if many else ''}"
+                for schema_class, included, many in list(self._entries)
+            )
+        }
+
+# Process-wide cache used by the routes
+schema_variants = SchemaVariants()
@@ -0,0 +1,87 @@
+"""
+Shared fixtures: the app on a throwaway SQLite file, emptied before every test.
+
+app.py configures itself from the environment at import time, so the settings
+below have to be in place before anything imports it.
+"""
+import os
+import re
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DB_DIR = tempfile.mkdtemp(prefix='bookstore-tests-')
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(DB_DIR, 'primary.db')}"
+# Hash inline - the spawn pool would re-import the test modules
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ.setdefault('DB_REPLICA_URIS', '')
+
+from app import app as flask_app
+from models import db
+
+@pytest.fixture(scope='session')
+def app():
+    # testing also makes the SQL instrumentation fail requests with N+1 loops
+    flask_app.testing = True
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+@pytest.fixture(autouse=True)
+def clean_state(app):
+    """Empty every table and the process-wide caches so each test starts from scratch"""
+    from utils.response_cache import response_cache
+    from utils.rate_limit import rate_limiter
+    from utils.auth_helpers import principal_cache
+    from utils.sql_instrumentation import sql_instrumentation
+    from utils.book_suggest import suggest_index
+    with app.app_context():
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+    response_cache.clear()
+    rate_limiter.reset()
+    principal_cache.invalidate()
+    sql_instrumentation.reset()
+    suggest_index.mark_stale()
+    yield
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def query_count(response):
+    """Statements the request ran, from the Server-Timing header"""
+    match = re.search(r'desc="(\d+) queries"', response.headers.get('Server-Timing', ''))
+    assert match, response.headers
+    return int(match.group(1))
+
+def create_user(client, email, is_seller=True):
+    from models import User
+    with client.application.app_context():
+        user = User(name='Test', last_name='User', phone_number='1234567890', email=email, is_seller=is_seller)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+def create_book(client, seller_id, title='Book', author='Author', price=10):
+    response = client.post('/books', json={'title': title, 'author': author, 'price': price, 'seller_id': seller_id})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['books']['id']
+
+def insert_books(client, count, price=lambda i: 10):
+    """Insert count books straight into the table and return their ids in insertion order"""
+    from sqlalchemy import insert
+    from utils.db_helpers import get_table
+    seller_id = create_user(client, 'seller@example.com')
+    with client.application.app_context():
+        books_table = get_table('books')
+        db.session.execute(insert(books_table), [
+            {'title': f'Book {i}', 'author': 'Author', 'price': price(i), 'seller_id': seller_id} for i in range(count)
+        ])
+        db.session.commit()
+        return [row.id for row in db.session.execute(books_table.select().order_by(books_table.c.id))]
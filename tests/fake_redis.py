@@ -0,0 +1,143 @@
+"""
+In-process stand-in for the part of the redis-py client API the shared backends use,
+so RedisCache and RedisBuckets run in the tests without a Redis server or the redis package.
+"""
+import fnmatch
+import threading
+import time
+from utils.rate_limit import WatchError
+
+class FakeRedis:
+    """Byte-string keys and values with optional expiry, like a redis.Redis client"""
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        # Bumped on every write, for WATCH
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _touch(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def mget(self, keys):
+        with self._lock:
+            return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = self._encode(value)
+            self._expires.pop(key, None)
+            self._touch(key)
+            if ex:
+                self._expires[key] = time.monotonic() + ex
+            return True
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self.get(key) or 0) + amount
+            self._data[key] = self._encode(value)
+            self._touch(key)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    del self._data[key]
+                    self._expires.pop(key, None)
+                    self._touch(key)
+                    removed += 1
+            return removed
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            keys = [key for key in list(self._data) if self._alive(key)]
+        return iter([key for key in keys if fnmatch.fnmatchcase(key, match)])
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._data[key]) if self._alive(key) else {}
+
+    def hset(self, key, mapping):
+        with self._lock:
+            fields = self._data[key] if self._alive(key) else {}
+            added = sum(1 for field in mapping if self._encode(field) not in fields)
+            fields.update((self._encode(field), self._encode(value)) for field, value in mapping.items())
+            self._data[key] = fields
+            self._touch(key)
+            return added
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            self._touch(key)
+            return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+class FakePipeline:
+    """
+    WATCH/MULTI/EXEC like redis-py's Pipeline: commands run straight away after
+    watch(), are queued after multi(), and execute() raises WatchError instead of
+    applying them if a watched key was written in between.
+    """
+    def __init__(self, client):
+        self.client = client
+        self._watched = {}
+        self._queued = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self._watched = {}
+        self._queued = None
+
+    def watch(self, *keys):
+        with self.client._lock:
+            self._watched.update((key, self.client._versions.get(key, 0)) for key in keys)
+
+    def multi(self):
+        self._queued = []
+
+    def execute(self):
+        with self.client._lock:
+            try:
+                if any(self.client._versions.get(key, 0) != version for key, version in self._watched.items()):
+                    raise WatchError("Watched variable changed.")
+                return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self._queued or []]
+            finally:
+                self.reset()
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        def run_or_queue(*args, **kwargs):
+            if self._queued is None:
+                return command(*args, **kwargs)
+            self._queued.append((name, args, kwargs))
+            return self
+        return run_or_queue
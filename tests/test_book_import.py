@@ -0,0 +1,37 @@
+"""POST /books/import: bad encodings are reported per line and imported books reach the suggest index"""
+import json
+from utils.book_suggest import suggest_index
+from conftest import create_user
+
+def jsonl(*records):
+    return b''.join(json.dumps(record).encode() + b'\n' for record in records)
+
+def test_non_utf8_lines_are_reported_not_fatal(client):
+    seller_id = create_user(client, 'seller@example.com')
+    body = jsonl({'title': 'Good', 'author': 'Author', 'price': 5, 'seller_id': seller_id})
+    body += '{"title": "Caf\xe9", "author": "Author", "price": 5}\n'.encode('latin-1')
+    response = client.post('/books/import?format=jsonl', data=body)
+    assert response.status_code == 207
+    summary = response.get_json()
+    assert summary['imported'] == 1
+    assert summary['errors'] == [{'line': 2, 'errors': {'_schema': ['Line is not valid UTF-8']}}]
+
+def test_non_utf8_csv_is_reported_not_fatal(client):
+    seller_id = create_user(client, 'seller@example.com')
+    body = f'title,author,price,seller_id\nGood,Author,5,{seller_id}\n'.encode() + 'Caf\xe9,Author,5,1\n'.encode('latin-1')
+    response = client.post('/books/import?format=csv', data=body)
+    assert response.status_code == 207
+    assert response.get_json()['errors'][0]['line'] == 3
+
+def test_import_adds_only_the_new_books_to_the_suggest_index(app, client, monkeypatch):
+    seller_id = create_user(client, 'seller@example.com')
+    with app.test_request_context():
+        suggest_index.rebuild()
+    monkeypatch.setattr(suggest_index, 'rebuild', lambda: (_ for _ in ()).throw(AssertionError('full rebuild')))
+
+    body = jsonl(*[{'title': f'Harry {i}', 'author': 'Rowling', 'price': 5, 'seller_id': seller_id} for i in range(5)])
+    response = client.post('/books/import?format=jsonl&chunk_size=2', data=body)
+    assert response.status_code == 200, response.get_json()
+
+    suggestions = client.get('/books/suggest?q=harr').get_json()['suggestions']
+    assert sorted(book['title'] for book in suggestions) == [f'Harry {i}' for i in range(5)]
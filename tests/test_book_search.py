@@ -0,0 +1,22 @@
+"""Full-text matching and relevance order of GET /books?search= and /books/search"""
+from conftest import create_book, create_user
+
+def titles(response):
+    assert response.status_code == 200, response.get_json()
+    return [book['title'] for book in response.get_json()['books']]
+
+def test_book_list_search_is_ranked_by_relevance(client):
+    seller_id = create_user(client, 'seller@example.com')
+    # Created first, so id order would put the weaker match on top
+    create_book(client, seller_id, title='Cooking for wizards', author='Someone')
+    create_book(client, seller_id, title='Wizard wizard wizard', author='Wizard')
+
+    assert titles(client.get('/books?search=wizard')) == ['Wizard wizard wizard', 'Cooking for wizards']
+    assert titles(client.get('/books/search?q=wizard')) == ['Wizard wizard wizard', 'Cooking for wizards']
+
+def test_search_matches_word_prefixes_not_substrings(client):
+    seller_id = create_user(client, 'seller@example.com')
+    create_book(client, seller_id, title='Harry Potter', author='Rowling')
+
+    assert titles(client.get('/books?search=harr pott')) == ['Harry Potter']
+    assert titles(client.get('/books?search=otter')) == []
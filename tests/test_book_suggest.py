@@ -0,0 +1,50 @@
+"""The /books/suggest index: memory budget while loading and periodic reloads"""
+import time
+from utils.book_suggest import SuggestIndex, suggest_index
+from conftest import create_book, create_user
+
+def test_rebuild_stops_reading_at_the_budget(app, client, monkeypatch):
+    seller_id = create_user(client, 'seller@example.com')
+    for i in range(30):
+        create_book(client, seller_id, title=f'Title number {i}')
+    index = SuggestIndex()
+    with app.test_request_context():
+        index.rebuild()
+        full = index.stats()['bytes']
+        monkeypatch.setitem(app.config, 'BOOK_SUGGEST_MAX_BYTES', full // 3)
+
+        rows_read = []
+        original = index._book_entries
+
+        def counting(book_id, title, author):
+            rows_read.append(book_id)
+            return original(book_id, title, author)
+
+        monkeypatch.setattr(index, '_book_entries', counting)
+        index.rebuild()
+
+    stats = index.stats()
+    assert stats['truncated'] and stats['bytes'] <= full // 3
+    assert stats['books'] + stats['skipped'] == 30
+    # Reading stopped at the first book over budget instead of scanning all of them
+    assert len(rows_read) == stats['books'] + 1
+    # Newest books are the ones kept
+    assert max(index._books) == max(rows_read)
+
+def test_index_reloads_after_the_refresh_interval(app, client, monkeypatch):
+    seller_id = create_user(client, 'seller@example.com')
+    create_book(client, seller_id, title='Harry Potter')
+    monkeypatch.setitem(app.config, 'BOOK_SUGGEST_REFRESH_SECONDS', 60)
+    assert len(client.get('/books/suggest?q=harr').get_json()['suggestions']) == 1
+
+    # Written through another worker: this process's index never saw it
+    from sqlalchemy import insert
+    from models import db
+    from utils.db_helpers import get_table
+    with app.app_context():
+        db.session.execute(insert(get_table('books')).values(title='Harry Again', author='A', price=5, seller_id=seller_id))
+        db.session.commit()
+    assert len(client.get('/books/suggest?q=harr').get_json()['suggestions']) == 1
+
+    monkeypatch.setattr(suggest_index, 'built_at', time.time() - 61)
+    assert len(client.get('/books/suggest?q=harr').get_json()['suggestions']) == 2
@@ -0,0 +1,64 @@
+"""
+ETag/Last-Modified on single-resource GETs and the 304s they allow.
+"""
+from datetime import datetime, timedelta, timezone
+import pytest
+from werkzeug.http import http_date, parse_date
+from conftest import create_user
+
+@pytest.fixture
+def user(client):
+    user_id = create_user(client, 'user@example.com')
+    response = client.get(f'/user/{user_id}')
+    assert response.status_code == 200
+    return user_id, response.headers['ETag'], response.headers['Last-Modified']
+
+def test_matching_etag_gets_304(client, user):
+    user_id, etag, last_modified = user
+    response = client.get(f'/user/{user_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+def test_weak_and_wildcard_etags_match(client, user):
+    user_id, etag, _ = user
+    for header in (f'W/{etag}', '*', f'"other", {etag}'):
+        assert client.get(f'/user/{user_id}', headers={'If-None-Match': header}).status_code == 304, header
+    assert client.get(f'/user/{user_id}', headers={'If-None-Match': '"other"'}).status_code == 200
+
+def test_update_changes_the_etag(client, user):
+    user_id, etag, _ = user
+    assert client.put(f'/user/{user_id}', json={'name': 'Renamed'}).status_code == 200
+    response = client.get(f'/user/{user_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['name'] == 'Renamed'
+    assert client.get(f'/user/{user_id}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_fields_variants_get_their_own_etag(client, user):
+    user_id, etag, _ = user
+    projected = client.get(f'/user/{user_id}?fields=name,email').headers['ETag']
+    assert projected != etag
+    # Same projection, same ETag, whatever the order of the names
+    assert client.get(f'/user/{user_id}?fields=email,name').headers['ETag'] == projected
+    assert client.get(f'/user/{user_id}?fields=name,email', headers={'If-None-Match': etag}).status_code == 200
+    assert client.get(f'/user/{user_id}?fields=email,name', headers={'If-None-Match': projected}).status_code == 304
+
+def test_if_modified_since(client, user):
+    user_id, _, last_modified = user
+    modified = parse_date(last_modified)
+    assert client.get(f'/user/{user_id}', headers={'If-Modified-Since': last_modified}).status_code == 304
+    later = http_date(modified + timedelta(hours=1))
+    assert client.get(f'/user/{user_id}', headers={'If-Modified-Since': later}).status_code == 304
+    earlier = http_date(modified - timedelta(seconds=1))
+    assert client.get(f'/user/{user_id}', headers={'If-Modified-Since': earlier}).status_code == 200
+    assert client.get(f'/user/{user_id}', headers={'If-Modified-Since': 'not a date'}).status_code == 200
+
+def test_if_none_match_takes_precedence(client, user):
+    user_id, _, last_modified = user
+    response = client.get(f'/user/{user_id}', headers={'If-None-Match': '"other"', 'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+
+def test_missing_row_is_still_404(client):
+    headers = {'If-None-Match': '*', 'If-Modified-Since': http_date(datetime.now(timezone.utc))}
+    assert client.get('/user/999', headers=headers).status_code == 404
@@ -0,0 +1,120 @@
+"""
+Read-replica routing on a small app of its own: a primary and two replica SQLite files,
+each holding a row naming the database, so a response shows where it was read from.
+"""
+import time
+import pytest
+from flask import Blueprint, Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select, text, update
+from utils.db_routing import ReplicaRouter, RoutingSession
+from utils.response_cache import ResponseCache
+
+metadata = MetaData()
+sources = Table('sources', metadata, Column('id', Integer, primary_key=True), Column('name', String(20)))
+
+def create_app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'replica_{index}': f"sqlite:///{tmp_path / f'replica_{index}.db'}" for index in range(2)
+    }
+    app.config['CACHE_TTL_SOURCE'] = 60
+    db = SQLAlchemy(session_options={"class_": RoutingSession})
+    db.init_app(app)
+    cache = ResponseCache(app)
+    api = Blueprint('api', __name__)
+
+    def read_source():
+        return db.session.execute(select(sources.c.name).order_by(sources.c.id)).scalar()
+
+    @api.route('/source')
+    def source():
+        return jsonify(read_source())
+
+    @api.route('/source/raw')
+    def raw_source():
+        return jsonify(db.session.execute(text('SELECT name FROM sources ORDER BY id')).scalar())
+
+    @api.route('/source/cached')
+    @cache.cached('CACHE_TTL_SOURCE', lambda: ('sources',))
+    def cached_source():
+        return jsonify(read_source())
+
+    @api.route('/source', methods=['POST'])
+    def write_source():
+        db.session.execute(insert(sources).values(name='written'))
+        # Read back within the same request
+        name = read_source()
+        db.session.commit()
+        return jsonify(name)
+
+    @api.route('/source', methods=['PUT'])
+    def rename_primary():
+        db.session.execute(update(sources).where(sources.c.id == 1).values(name='primary, renamed'))
+        db.session.commit()
+        cache.invalidate('sources')
+        return jsonify(read_source())
+
+    app.register_blueprint(api)
+    router = ReplicaRouter(app, db)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(insert(sources).values(id=1, name=key or 'primary'))
+    return app, router
+
+@pytest.fixture
+def routed(tmp_path):
+    return create_app(tmp_path)
+
+def client_at(app, address):
+    client = app.test_client()
+    client.environ_base['REMOTE_ADDR'] = address
+    return client
+
+def test_reads_alternate_between_replicas(routed):
+    app, router = routed
+    client = app.test_client()
+    assert [client.get('/source').get_json() for _ in range(4)] == ['replica_0', 'replica_1'] * 2
+    assert router.stats()['requests'] == {'primary': 0, 'replica_0': 2, 'replica_1': 2}
+
+def test_writes_and_later_reads_go_to_the_primary(routed):
+    app, router = routed
+    writer, other = client_at(app, '10.0.0.1'), client_at(app, '10.0.0.2')
+
+    # The statement after the INSERT reads from the primary as well
+    response = writer.post('/source')
+    assert response.get_json() == 'primary'
+    assert 'primary_until' in response.headers['Set-Cookie']
+    # The writer is pinned, other clients keep reading from replicas
+    assert writer.get('/source').get_json() == 'primary'
+    assert other.get('/source').get_json().startswith('replica_')
+
+def test_pin_expires(routed):
+    app, router = routed
+    router.pin_seconds = 1
+    client = client_at(app, '10.0.0.1')
+    client.post('/source')
+    assert client.get('/source').get_json() == 'primary'
+    time.sleep(1.1)
+    assert client.get('/source').get_json().startswith('replica_')
+
+def test_raw_sql_goes_to_the_primary(routed):
+    app, router = routed
+    assert app.test_client().get('/source/raw').get_json() == 'primary'
+
+def test_cached_responses_are_read_from_the_primary(routed):
+    app, router = routed
+    writer, reader = client_at(app, '10.0.0.1'), client_at(app, '10.0.0.2')
+
+    response = reader.get('/source/cached')
+    assert (response.headers['X-Cache'], response.get_json()) == ('MISS', 'primary')
+    # The replicas have not caught up with the write; the response cached after
+    # it must still show the write, not the replica's older state
+    assert writer.put('/source').get_json() == 'primary, renamed'
+    for expected_cache in ('MISS', 'HIT'):
+        response = reader.get('/source/cached')
+        assert (response.headers['X-Cache'], response.get_json()) == (expected_cache, 'primary, renamed')
+    assert reader.get('/source').get_json().startswith('replica_')
@@ -0,0 +1,22 @@
+"""
+Debug routes can be read anywhere but only changed in debug mode.
+"""
+import pytest
+
+DEBUG_RESETS = ['/debug/tables', '/debug/cache', '/debug/schemas', '/debug/db-pool',
+                '/debug/sql', '/debug/rate-limit', '/debug/hashing', '/debug/suggest']
+
+@pytest.fixture
+def debug_mode(app):
+    app.debug = True
+    yield
+    app.debug = False
+
+@pytest.mark.parametrize('path', DEBUG_RESETS)
+def test_delete_refused_outside_debug_mode(client, path):
+    assert client.get(path).status_code == 200
+    assert client.delete(path).status_code == 403
+
+@pytest.mark.parametrize('path', DEBUG_RESETS)
+def test_delete_allowed_in_debug_mode(client, debug_mode, path):
+    assert client.delete(path).status_code == 200
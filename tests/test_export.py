@@ -0,0 +1,78 @@
+"""
+Streamed exports: rows go out chunk by chunk and match the table, without hidden columns.
+"""
+import csv
+import io
+import json
+import pytest
+from sqlalchemy import select
+from models import db
+from utils.db_helpers import DENIED_COLUMNS, get_table, stream_export
+from conftest import create_user, insert_books
+
+@pytest.fixture
+def small_batches(app):
+    # Several EXPORT_BATCH_SIZE batches out of a handful of rows
+    batch_size = app.config['EXPORT_BATCH_SIZE']
+    app.config['EXPORT_BATCH_SIZE'] = 3
+    yield
+    app.config['EXPORT_BATCH_SIZE'] = batch_size
+
+def read_chunks(response):
+    assert response.status_code == 200
+    assert response.is_streamed
+    chunks = [chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response]
+    response.close()
+    return chunks
+
+def book_rows(app):
+    with app.app_context():
+        books_table = get_table('books')
+        return [dict(row._mapping) for row in db.session.execute(select(books_table).order_by(books_table.c.id))]
+
+def test_ndjson_export_streams_every_row(app, client, small_batches):
+    insert_books(client, 8)
+    chunks = read_chunks(client.get('/books/export?sort_by=id&sort_order=asc'))
+    # 8 rows in batches of 3
+    assert len(chunks) == 3
+    exported = [json.loads(line) for line in ''.join(chunks).splitlines()]
+    expected = book_rows(app)
+    assert [book['id'] for book in exported] == [book['id'] for book in expected]
+    assert [book['title'] for book in exported] == [book['title'] for book in expected]
+    assert set(exported[0]) == set(expected[0])
+
+def test_csv_export_streams_every_row(app, client, small_batches):
+    insert_books(client, 8)
+    response = client.get('/books/export?format=csv&sort_by=id&sort_order=asc')
+    assert response.mimetype == 'text/csv'
+    chunks = read_chunks(response)
+    assert len(chunks) == 3
+    exported = list(csv.DictReader(io.StringIO(''.join(chunks))))
+    expected = book_rows(app)
+    assert [int(book['id']) for book in exported] == [book['id'] for book in expected]
+    assert [book['title'] for book in exported] == [book['title'] for book in expected]
+    assert [float(book['price']) for book in exported] == [book['price'] for book in expected]
+
+def test_unknown_format_is_rejected(client):
+    assert client.get('/books/export?format=xml').status_code == 400
+
+@pytest.mark.parametrize('data_format', ['ndjson', 'csv'])
+def test_hidden_columns_never_leave_an_export(app, client, small_batches, data_format):
+    for i in range(4):
+        create_user(client, f'user{i}@example.com')
+    users_table = get_table('users')
+    hidden = DENIED_COLUMNS['users']
+
+    # Even a query that selects the password hash and the other hidden columns
+    with app.test_request_context(f'/users/export?format={data_format}'):
+        chunks = read_chunks(stream_export(select(users_table), users_table, 'users'))
+    body = ''.join(chunks)
+    if data_format == 'csv':
+        exported = list(csv.DictReader(io.StringIO(body)))
+    else:
+        exported = [json.loads(line) for line in body.splitlines()]
+    assert len(exported) == 4
+    assert 'email' in exported[0] and not hidden & set(exported[0])
+    with app.app_context():
+        hashes = db.session.execute(select(users_table.c.password)).scalars().all()
+    assert all(password_hash not in body for password_hash in hashes)
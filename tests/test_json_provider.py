@@ -0,0 +1,70 @@
+"""
+Both JSON_BACKENDs against Flask's DefaultJSONProvider: the same response bytes for
+Decimal, datetime, date and non-ASCII payloads.
+"""
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from utils.json_provider import FastJSONProvider, orjson
+
+PAYLOAD = {
+    'price': Decimal('19.90'),
+    'exponent': Decimal('1E+3'),
+    'created_at': datetime(2024, 3, 5, 14, 7, 9, 123456),
+    'aware': datetime(2024, 3, 5, 23, 30, tzinfo=timezone(timedelta(hours=-5))),
+    'published': date(2024, 3, 5),
+    'title': 'Café – 東京 😀',
+    'escapes': 'tab\there "quoted" back\\slash /\x1f\x7f',
+    'Ünïcode key': [1, 2.5, None, True, {'b': 'ß', 'a': []}]
+}
+
+@pytest.fixture(params=['stdlib', pytest.param('orjson', marks=pytest.mark.skipif(orjson is None, reason='orjson not installed'))])
+def providers(request, app, monkeypatch):
+    """(FastJSONProvider on the backend, Flask's default provider) for the test app"""
+    monkeypatch.setitem(app.config, 'JSON_BACKEND', request.param)
+    provider = FastJSONProvider(app)
+    assert provider.backend == request.param
+    with app.app_context():
+        yield provider, DefaultJSONProvider(app)
+
+def body(provider, obj):
+    return provider.response(obj).get_data()
+
+def test_compact_responses_match_flask(providers):
+    provider, default = providers
+    assert body(provider, PAYLOAD) == body(default, PAYLOAD)
+    assert body(provider, PAYLOAD).isascii()
+
+def test_debug_responses_match_flask(app, providers):
+    provider, default = providers
+    app.debug = True
+    try:
+        assert body(provider, PAYLOAD) == body(default, PAYLOAD)
+    finally:
+        app.debug = False
+
+@pytest.mark.parametrize('value', [Decimal('0.1'), Decimal('-12.50'), Decimal('1E-7'), date(1999, 12, 31),
+                                   datetime(2024, 2, 29, 23, 59, 59), datetime(2024, 1, 1, tzinfo=timezone.utc),
+                                   'ü', ' ', '𝄞', '\x7f'])
+def test_single_values_match_flask(providers, value):
+    provider, default = providers
+    assert body(provider, {'value': value}) == body(default, {'value': value})
+
+def test_ensure_ascii_off_matches_flask(providers):
+    provider, default = providers
+    provider.ensure_ascii = default.ensure_ascii = False
+    assert body(provider, PAYLOAD) == body(default, PAYLOAD)
+    assert 'Café – 東京 😀'.encode() in body(provider, PAYLOAD)
+
+def test_plain_dumps_is_the_compact_document(providers):
+    provider, default = providers
+    assert provider.dumps(PAYLOAD) == default.dumps(PAYLOAD, separators=(',', ':'))
+    assert provider.loads(provider.dumps(PAYLOAD)) == json.loads(default.dumps(PAYLOAD))
+
+def test_float_exponents_parse_to_the_same_numbers(providers):
+    # orjson spells them 1e16 / 1e-5 where the stdlib writes 1e+16 / 1e-05
+    provider, default = providers
+    floats = [1e16, 1e-5, -2.5e-300, 0.1]
+    assert json.loads(body(provider, floats)) == json.loads(body(default, floats)) == floats
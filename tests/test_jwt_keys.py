@@ -0,0 +1,78 @@
+"""
+Signing key rotation (JWT_KEYS/kid) and the verified-token cache of TokenVerifier.
+"""
+import time
+from datetime import datetime, timedelta
+import jwt
+import pytest
+from utils import auth_helpers
+from utils.auth_helpers import KeyRing, TokenVerifier
+from conftest import create_user
+
+@pytest.fixture
+def rotated_keys(app):
+    """"old" is retired but still listed, "new" signs new tokens"""
+    settings = {name: app.config[name] for name in ('JWT_KEYS', 'JWT_ACTIVE_KID')}
+    app.config.update(JWT_KEYS='old:secret-old,new:secret-new', JWT_ACTIVE_KID='new')
+    app.extensions.pop('token_verifier', None)
+    yield
+    app.config.update(settings)
+    app.extensions.pop('token_verifier', None)
+
+def signed(user_id, key, kid=None, expires_in=60):
+    payload = {'user_id': user_id, 'is_seller': True, 'tv': 0, 'exp': datetime.utcnow() + timedelta(seconds=expires_in)}
+    return jwt.encode(payload, key, algorithm='HS256', headers={'kid': kid} if kid else None)
+
+def get_me(client, token):
+    return client.get('/auth/me', headers={'Authorization': f'Bearer {token}'})
+
+def test_new_tokens_carry_the_active_kid(client, rotated_keys):
+    create_user(client, 'seller@example.com')
+    response = client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'})
+    token = response.get_json()['token']
+    assert jwt.get_unverified_header(token)['kid'] == 'new'
+    assert get_me(client, token).status_code == 200
+
+def test_retired_kid_still_in_jwt_keys_verifies(client, rotated_keys):
+    user_id = create_user(client, 'seller@example.com')
+    assert get_me(client, signed(user_id, 'secret-old', kid='old')).status_code == 200
+
+def test_unknown_kid_is_rejected(client, rotated_keys):
+    user_id = create_user(client, 'seller@example.com')
+    response = get_me(client, signed(user_id, 'secret-gone', kid='gone'))
+    assert response.status_code == 401
+    assert 'gone' in response.get_json()['error']
+
+def test_known_kid_with_the_wrong_secret_is_rejected(client, rotated_keys):
+    user_id = create_user(client, 'seller@example.com')
+    assert get_me(client, signed(user_id, 'secret-new', kid='old')).status_code == 401
+
+def test_legacy_token_without_kid_uses_secret_key(app, client, rotated_keys):
+    user_id = create_user(client, 'seller@example.com')
+    assert get_me(client, signed(user_id, app.config['SECRET_KEY'])).status_code == 200
+    assert get_me(client, signed(user_id, 'secret-new')).status_code == 401
+
+def test_cached_token_is_rejected_once_exp_passes(monkeypatch):
+    verifier = TokenVerifier(KeyRing({'k1': 'secret-1'}, 'k1', 'legacy'))
+    token = signed(1, 'secret-1', kid='k1', expires_in=60)
+    assert verifier.verify(token)['user_id'] == 1
+    assert len(verifier._entries) == 1
+
+    # From now on only the cache can answer
+    def no_decode(*args, **kwargs):
+        raise AssertionError('jwt.decode called for a cached token')
+    monkeypatch.setattr(jwt, 'decode', no_decode)
+    assert verifier.verify(token)['user_id'] == 1
+
+    now = time.time()
+    monkeypatch.setattr(auth_helpers.time, 'time', lambda: now + 61)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(token)
+    # Dropped from the cache as well
+    assert len(verifier._entries) == 0
+
+def test_verifier_cache_is_bounded():
+    verifier = TokenVerifier(KeyRing({'k1': 'secret-1'}, 'k1', 'legacy'), max_entries=3)
+    for user_id in range(5):
+        verifier.verify(signed(user_id, 'secret-1', kid='k1'))
+    assert len(verifier._entries) == 3
@@ -0,0 +1,114 @@
+"""
+POST /orders/batch validates every order's references up front and only fails
+the orders that are actually wrong.
+"""
+import pytest
+from sqlalchemy import event, insert
+from models import db
+from routes import order_routes
+from utils.db_helpers import get_table
+from conftest import create_book, create_user
+
+@pytest.fixture
+def shop(app, client):
+    seller_id = create_user(client, 'seller@example.com')
+    buyer_id = create_user(client, 'buyer@example.com', is_seller=False)
+    other_id = create_user(client, 'other@example.com', is_seller=False)
+    with app.app_context():
+        address_id = db.session.execute(insert(get_table('addresses')).values(
+            street='Street 1', city='City', state='State', postal_code='12345', country='TR', user_id=buyer_id
+        )).inserted_primary_key[0]
+        db.session.commit()
+    book_ids = [create_book(client, seller_id, title=f'Book {i}', price=10 + i) for i in range(3)]
+    return {'buyer': buyer_id, 'other': other_id, 'address': address_id, 'books': book_ids}
+
+def test_bad_references_fail_only_their_order(client, shop):
+    response = client.post('/orders/batch', json=[
+        {'user_id': shop['buyer'], 'books': [shop['books'][0]], 'shipping_address_id': shop['address']},
+        {'books': [shop['books'][1]]},
+        {'user_id': 999, 'books': [shop['books'][1]]},
+        {'user_id': shop['other'], 'books': [shop['books'][1]], 'shipping_address_id': shop['address']},
+        {'user_id': shop['buyer'], 'shipping_address_id': 999},
+        {'user_id': shop['buyer'], 'total_amount': -5},
+        {'user_id': shop['buyer'], 'total_amount': 'lots'},
+        {'user_id': shop['buyer'], 'total_amount': 12.5},
+        {'user_id': shop['buyer'], 'books': [shop['books'][2]], 'total_amount': 'ignored'},
+    ])
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert [('id' in result) for result in results] == [True, False, False, False, False, False, False, True, True]
+    assert set(results[1]['errors']) == {'user_id'}
+    assert set(results[2]['errors']) == {'user_id'}
+    assert set(results[3]['errors']) == {'shipping_address_id'}
+    assert set(results[4]['errors']) == {'shipping_address_id'}
+    assert set(results[5]['errors']) == set(results[6]['errors']) == {'total_amount'}
+    assert results[7]['total_amount'] == 12.5
+    assert results[8]['total_amount'] == 12
+
+def test_statements_do_not_grow_with_the_batch(app, client, shop):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements[-1].append(' '.join(statement.split()[:3]))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for size in (2, 8):
+            statements.append([])
+            orders = [
+                {'user_id': shop['buyer'], 'books': [shop['books'][i % 3]], 'shipping_address_id': shop['address']}
+                for i in range(size)
+            ]
+            response = client.post('/orders/batch', json=orders)
+            assert response.status_code == 201, response.get_json()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    # Books, users, addresses; one INSERT for every order, no RETURNING (MySQL has none for
+    # executemany), one SELECT for their ids; one INSERT for every order_book row
+    for batch in statements:
+        assert batch.count('INSERT INTO orders') == 1
+        assert batch.count('INSERT INTO order_book') == 1
+        assert len(batch) == 6, batch
+
+def test_batch_ids_belong_to_their_orders(app, client, shop):
+    totals = [float(10 + i) for i in range(7)]
+    response = client.post('/orders/batch', json=[
+        {'user_id': shop['buyer'], 'total_amount': total} for total in totals
+    ])
+    assert response.status_code == 201, response.get_json()
+    results = response.get_json()['results']
+    assert len({result['id'] for result in results}) == len(totals)
+    for result, total in zip(results, totals):
+        order = client.get(f"/order/{result['id']}").get_json()
+        assert float(order['total_amount']) == total
+        # The read-back reference stays internal
+        assert 'batch_ref' not in order
+    assert all('batch_ref' not in order for order in client.get('/orders').get_json()['orders'])
+
+def test_rejected_chunk_is_retried_order_by_order(client, shop, monkeypatch):
+    # The database refuses a user that passed validation (e.g. deleted in between)
+    insert_orders = order_routes.insert_orders
+
+    def refuse_other(orders):
+        if any(insert_data['user_id'] == shop['other'] for insert_data, _ in orders):
+            raise RuntimeError("FOREIGN KEY constraint failed: INSERT INTO orders ...")
+        return insert_orders(orders)
+
+    monkeypatch.setattr(order_routes, 'insert_orders', refuse_other)
+    response = client.post('/orders/batch', json=[
+        {'user_id': shop['buyer'], 'books': [shop['books'][0]]},
+        {'user_id': shop['other'], 'books': [shop['books'][1]]},
+        {'user_id': shop['buyer'], 'books': [shop['books'][2]]},
+    ])
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert 'id' in results[0] and 'id' in results[2]
+    # The database error stays in the log
+    assert results[1]['errors'] == {'_schema': ['Order could not be saved']}
+
+def test_single_order_references_are_checked(client, shop):
+    response = client.post('/orders', json={'user_id': 999, 'books': [shop['books'][0]]})
+    assert response.status_code == 400
+    assert 'user_id' in response.get_json()['details']
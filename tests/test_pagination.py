@@ -0,0 +1,82 @@
+"""
+Page-number pagination of the list endpoints: LIMIT/OFFSET pages and the optional total.
+"""
+import base64
+import json
+from conftest import insert_books, query_count
+
+def book_ids(response):
+    assert response.status_code == 200, response.get_json()
+    return [book['id'] for book in response.get_json()['books']]
+
+def test_pages_split_the_rows_without_overlap(client):
+    ids = insert_books(client, 25)
+    pages = [book_ids(client.get(f'/books?page={page}&limit=10')) for page in (1, 2, 3)]
+    assert pages == [ids[:10], ids[10:20], ids[20:]]
+    # Past the last page
+    assert book_ids(client.get('/books?page=4&limit=10')) == []
+    assert client.get('/books?page=1&limit=10').get_json()['total'] == 25
+
+def test_page_and_limit_are_clamped_to_one(client):
+    ids = insert_books(client, 3)
+    assert book_ids(client.get('/books?page=0&limit=2')) == ids[:2]
+    assert book_ids(client.get('/books?page=-3&limit=0')) == ids[:1]
+    assert book_ids(client.get('/books?page=2&limit=-5')) == ids[1:2]
+
+def test_total_is_null_when_not_requested(client):
+    insert_books(client, 3)
+    for url in ('/books?count=false', '/books/search?count=false', '/users?count=false'):
+        response = client.get(url)
+        assert response.status_code == 200, url
+        assert response.get_json()['total'] is None, url
+    assert client.get('/books?count=true').get_json()['total'] == 3
+    # The COUNT(*) query is skipped, not just left out of the response
+    assert query_count(client.get('/books?count=false')) == query_count(client.get('/books')) - 1
+
+def walk(client, url, cursor_key):
+    """Follow next_cursor (or prev_cursor) from url to the end, returning the ids of every page"""
+    pages = []
+    while url:
+        response = client.get(url)
+        pages.append(book_ids(response))
+        cursor = response.get_json()[cursor_key]
+        url = f'/books/search?sort_by=price&sort_order=asc&limit=4&cursor={cursor}' if cursor else None
+    return pages, response.get_json()
+
+def test_cursor_pages_walk_forward_and_back_over_duplicate_sort_keys(client):
+    # Three books per price, so pages end in the middle of equal sort keys
+    ids = insert_books(client, 10, price=lambda i: 10 + i % 3)
+    by_price = sorted(ids, key=lambda book_id: (10 + (book_id - ids[0]) % 3, book_id))
+
+    forward, last_page = walk(client, '/books/search?sort_by=price&sort_order=asc&limit=4&cursor=', 'next_cursor')
+    assert forward == [by_price[:4], by_price[4:8], by_price[8:]]
+    assert last_page['next_cursor'] is None
+
+    # Back from the last page to the first
+    backward, first_page = walk(
+        client, f"/books/search?sort_by=price&sort_order=asc&limit=4&cursor={last_page['prev_cursor']}", 'prev_cursor'
+    )
+    assert backward == [by_price[4:8], by_price[:4]]
+    assert first_page['prev_cursor'] is None
+
+def test_bad_cursors_are_rejected(client):
+    insert_books(client, 5)
+    response = client.get('/books/search?sort_by=price&sort_order=asc&limit=2&cursor=')
+    cursor = response.get_json()['next_cursor']
+
+    for bad in ('garbage!!', cursor[:-3], cursor[::-1]):
+        assert client.get(f'/books/search?sort_by=price&sort_order=asc&cursor={bad}').status_code == 400, bad
+    # Well-formed cursors whose sort value is not a price
+    for value in ('10', None, True, [10], {'price': 10}):
+        payload = {'s': 'price', 'o': 'asc', 'd': 'next', 'v': value, 'id': 1}
+        tampered = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        assert client.get(f'/books/search?sort_by=price&sort_order=asc&cursor={tampered}').status_code == 400, value
+    # A cursor only works for the sort it was issued for
+    assert client.get(f'/books/search?sort_by=price&sort_order=desc&cursor={cursor}').status_code == 400
+    assert client.get(f'/books/search?sort_by=title&sort_order=asc&cursor={cursor}').status_code == 400
+
+def test_cursor_needs_a_not_null_sort_column(client):
+    insert_books(client, 3)
+    response = client.get('/books/search?sort_by=publication_year&cursor=')
+    assert response.status_code == 400
+    assert 'publication_year' in response.get_json()['error']
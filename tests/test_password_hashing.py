@@ -0,0 +1,118 @@
+"""
+Bounded password hashing: 503 + Retry-After once the queue is full, the metrics,
+and the upgrade of outdated hashes on login.
+"""
+from contextlib import contextmanager
+import pytest
+from werkzeug.security import generate_password_hash
+from models import db, User
+from utils.password_hashing import HashingBusy, PasswordHasher
+from conftest import create_user
+
+NEW_USER = {'name': 'New', 'last_name': 'User', 'phone_number': '1234567890',
+            'email': 'new@example.com', 'password': 'password123'}
+
+@pytest.fixture
+def hasher(app):
+    """A fresh inline hasher with two slots in place of the app's"""
+    previous = app.extensions.get('password_hasher')
+    hasher = PasswordHasher(0, 2, app.config['PASSWORD_HASH_METHOD'], retry_after=7)
+    app.extensions['password_hasher'] = hasher
+    yield hasher
+    app.extensions['password_hasher'] = previous
+
+@contextmanager
+def slots_taken(hasher):
+    """Hold every slot of the hasher, as if that many slow hashes were in flight"""
+    for _ in range(hasher.max_pending):
+        assert hasher._slots.acquire(blocking=False)
+    try:
+        yield
+    finally:
+        for _ in range(hasher.max_pending):
+            hasher._slots.release()
+
+def stored_hash(app, email):
+    with app.app_context():
+        return db.session.execute(db.select(User.password).where(User.email == email)).scalar_one()
+
+def assert_busy(response):
+    assert response.status_code == 503, response.get_json()
+    assert response.headers['Retry-After'] == '7'
+
+def test_login_gets_503_when_hashing_is_saturated(client, hasher):
+    create_user(client, 'seller@example.com')
+    with slots_taken(hasher):
+        response = client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'})
+    assert_busy(response)
+    assert hasher.stats()['rejected'] == 1
+    assert client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'}).status_code == 200
+
+def test_create_user_gets_503_and_stores_nothing(app, client, hasher):
+    with slots_taken(hasher):
+        assert_busy(client.post('/users', json=NEW_USER))
+    with app.app_context():
+        assert db.session.execute(db.select(User).where(User.email == NEW_USER['email'])).first() is None
+
+def test_metrics_count_completed_and_rejected_hashes(app, client, hasher):
+    create_user(client, 'seller@example.com')
+    hasher.reset_metrics()
+    assert client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'}).status_code == 200
+    assert client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'wrong'}).status_code == 401
+
+    stats = client.get('/debug/hashing').get_json()
+    assert (stats['completed'], stats['rejected'], stats['rehashed']) == (2, 0, 0)
+    assert stats['hash_time_total'] > 0
+    assert stats['hash_time_max'] >= stats['hash_time_avg'] == pytest.approx(stats['hash_time_total'] / 2)
+    assert stats['queue_wait_max'] >= 0
+    assert (stats['workers'], stats['max_pending']) == (0, 2)
+
+    with slots_taken(hasher), pytest.raises(HashingBusy) as busy:
+        hasher.hash('password123')
+    assert busy.value.retry_after == 7
+    assert hasher.stats()['rejected'] == 1
+
+    # Only the debug server may reset the counters
+    assert client.delete('/debug/hashing').status_code == 403
+    app.debug = True
+    try:
+        assert client.delete('/debug/hashing').get_json()['completed'] == 0
+    finally:
+        app.debug = False
+
+def test_login_upgrades_an_outdated_hash(app, client, hasher):
+    create_user(client, 'seller@example.com')
+    with app.app_context():
+        user = db.session.execute(db.select(User).where(User.email == 'seller@example.com')).scalar_one()
+        user.password = generate_password_hash('password123', 'pbkdf2:sha256:1000')
+        db.session.commit()
+    assert hasher.needs_rehash(stored_hash(app, 'seller@example.com'))
+
+    assert client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'}).status_code == 200
+    upgraded = stored_hash(app, 'seller@example.com')
+    assert upgraded.startswith(f"{app.config['PASSWORD_HASH_METHOD']}:")
+    assert not hasher.needs_rehash(upgraded)
+    assert hasher.stats()['rehashed'] == 1
+
+    # Current hashes are left alone, and the new one still logs in
+    assert client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'}).status_code == 200
+    assert stored_hash(app, 'seller@example.com') == upgraded
+    assert hasher.stats()['rehashed'] == 1
+
+def test_busy_rehash_keeps_the_old_hash_and_still_logs_in(app, client, hasher):
+    create_user(client, 'seller@example.com')
+    outdated = generate_password_hash('password123', 'pbkdf2:sha256:1000')
+    with app.app_context():
+        user = db.session.execute(db.select(User).where(User.email == 'seller@example.com')).scalar_one()
+        user.password = outdated
+        db.session.commit()
+    # The queue fills up between the verify and the upgrade - the upgrade waits for the next login
+    original_rehash = hasher.rehash
+    def rehash_while_busy(pwhash, password):
+        with slots_taken(hasher):
+            return original_rehash(pwhash, password)
+    hasher.rehash = rehash_while_busy
+
+    assert client.post('/auth/login', json={'email': 'seller@example.com', 'password': 'password123'}).status_code == 200
+    assert stored_hash(app, 'seller@example.com') == outdated
+    assert hasher.stats()['rehashed'] == 0
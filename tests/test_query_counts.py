@@ -0,0 +1,47 @@
+"""
+Statement counts of the list endpoints that used to run one query per row.
+Counts come from the Server-Timing header written by utils/sql_instrumentation.
+"""
+from conftest import create_book, create_user, query_count
+
+def test_user_orders_query_count_does_not_grow_with_orders(client):
+    seller_id = create_user(client, 'seller@example.com')
+    buyer_id = create_user(client, 'buyer@example.com', is_seller=False)
+    book_ids = [create_book(client, seller_id, title=f'Book {i}') for i in range(6)]
+
+    counts = []
+    for batch in (book_ids[:2], book_ids[2:]):
+        for book_id in batch:
+            response = client.post('/orders', json={'user_id': buyer_id, 'books': [book_id], 'total_amount': 10})
+            assert response.status_code == 201, response.get_json()
+        response = client.get(f'/user/{buyer_id}/orders')
+        assert response.status_code == 200
+        counts.append(query_count(response))
+
+    # User check + page + COUNT(*) + one query for the books of every order on the page
+    assert counts == [4, 4]
+    orders = response.get_json()['orders']
+    assert len(orders) == 6
+    assert all(len(order['books']) == 1 for order in orders)
+
+def test_book_reviews_query_count_does_not_grow_with_reviews(client):
+    seller_id = create_user(client, 'seller@example.com')
+    book_id = create_book(client, seller_id)
+    buyer_ids = [create_user(client, f'buyer{i}@example.com', is_seller=False) for i in range(6)]
+
+    counts = []
+    for batch in (buyer_ids[:2], buyer_ids[2:]):
+        for buyer_id in batch:
+            response = client.post('/reviews', json={
+                'buyer_id': buyer_id, 'seller_id': seller_id, 'book_id': book_id, 'rating': 4
+            })
+            assert response.status_code == 201, response.get_json()
+        response = client.get(f'/books/{book_id}/reviews')
+        assert response.status_code == 200
+        counts.append(query_count(response))
+
+    # Book check + page + COUNT(*) + one query for the buyers of the page
+    assert counts == [4, 4]
+    reviews = response.get_json()['reviews']
+    assert len(reviews) == 6
+    assert all(review['buyer']['id'] in buyer_ids for review in reviews)
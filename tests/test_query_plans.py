@@ -0,0 +1,105 @@
+"""
+The indexes added for the hot lookups are used by the queries the routes actually run.
+
+Statements are captured while a request is handled and re-run with EXPLAIN QUERY PLAN
+(SQLite), so the plans follow the handlers when they change.
+"""
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from models import db
+from conftest import create_book, create_user
+
+@contextmanager
+def captured_statements(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+def query_plan(app, statements, *fragments):
+    """EXPLAIN QUERY PLAN details of the one captured statement containing every fragment"""
+    matching = [(sql, params) for sql, params in statements if all(fragment in sql for fragment in fragments)]
+    assert len(matching) == 1, [sql for sql, _ in statements]
+    sql, params = matching[0]
+    with app.app_context():
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+@pytest.fixture
+def shop(client):
+    seller_id = create_user(client, 'seller@example.com')
+    buyer_id = create_user(client, 'buyer@example.com', is_seller=False)
+    book_ids = [create_book(client, seller_id, title=f'Harry Potter {i}', author='Rowling') for i in range(3)]
+    assert client.post('/orders', json={'user_id': buyer_id, 'books': book_ids[:2]}).status_code == 201
+    review = {'buyer_id': buyer_id, 'seller_id': seller_id, 'book_id': book_ids[0], 'rating': 5}
+    assert client.post('/reviews', json=review).status_code == 201
+    return {'seller': seller_id, 'buyer': buyer_id, 'books': book_ids}
+
+def test_user_orders_use_the_user_date_index(app, client, shop):
+    with captured_statements(app) as statements:
+        assert client.get(f"/user/{shop['buyer']}/orders").status_code == 200
+    plan = query_plan(app, statements, 'FROM orders', 'ORDER BY orders.order_date', 'LIMIT')
+    assert 'USING INDEX ix_orders_user_id_order_date' in plan, plan
+    # The books of the page are found through the junction table's primary key
+    plan = query_plan(app, statements, 'JOIN order_book')
+    assert 'SCAN books' not in plan, plan
+
+def test_book_search_uses_the_full_text_index(app, client, shop):
+    with captured_statements(app) as statements:
+        response = client.get('/books/search?q=harry')
+        assert response.status_code == 200
+        assert response.get_json()['total'] == 3
+    plan = query_plan(app, statements, 'books_fts MATCH', 'LIMIT')
+    assert 'VIRTUAL TABLE INDEX' in plan, plan
+    assert 'SCAN books' not in plan.replace('SCAN books_fts', ''), plan
+
+def test_book_reviews_use_the_book_index(app, client, shop):
+    with captured_statements(app) as statements:
+        assert client.get(f"/books/{shop['books'][0]}/reviews").status_code == 200
+    plan = query_plan(app, statements, 'FROM reviews', 'reviews.book_id =', 'LIMIT')
+    assert 'USING INDEX ix_reviews_book_id' in plan, plan
+
+def test_user_reviews_use_the_buyer_index(app, client, shop):
+    with captured_statements(app) as statements:
+        assert client.get(f"/users/{shop['buyer']}/reviews?type=buyer").status_code == 200
+    plan = query_plan(app, statements, 'FROM reviews', 'reviews.buyer_id =', 'LIMIT')
+    assert 'USING INDEX ix_reviews_buyer_id' in plan, plan
+
+def test_duplicate_review_check_uses_the_seller_buyer_index(app, client, shop):
+    review = {'buyer_id': shop['buyer'], 'seller_id': shop['seller'], 'book_id': shop['books'][1], 'rating': 4}
+    with captured_statements(app) as statements:
+        assert client.post('/reviews', json=review).status_code == 409
+    plan = query_plan(app, statements, 'FROM reviews', 'reviews.buyer_id =', 'reviews.seller_id =')
+    assert 'USING INDEX ix_reviews_seller_id_buyer_id' in plan, plan
+
+def test_featured_books_use_the_status_index(app, client, shop):
+    with captured_statements(app) as statements:
+        assert client.get('/books/featured').status_code == 200
+    plan = query_plan(app, statements, 'FROM books', 'books.status =', 'ORDER BY books.id DESC')
+    assert 'USING INDEX ix_books_status_id' in plan, plan
+    # The index is ordered by (status, id), so no sort step for the newest books
+    assert 'TEMP B-TREE' not in plan, plan
+
+def test_default_address_lookup_uses_the_user_default_index(app, client, shop):
+    for is_default in (False, True):
+        response = client.post('/addresses', json={
+            'user_id': shop['buyer'], 'street': 'Street 1', 'city': 'City', 'state': 'State',
+            'postal_code': '12345', 'country': 'TR', 'is_default': is_default
+        })
+        assert response.status_code == 201, response.get_json()
+    with captured_statements(app) as statements:
+        response = client.get(f"/user/{shop['buyer']}/addresses/defaults")
+        assert response.status_code == 200
+        assert response.get_json()['default_address'] is not None
+    plan = query_plan(app, statements, 'FROM addresses', 'addresses.user_id =', 'addresses.is_default =')
+    assert 'USING INDEX ix_addresses_user_id_is_default' in plan, plan
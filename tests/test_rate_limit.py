@@ -0,0 +1,138 @@
+"""
+Login rate limiting: 429 + Retry-After before any query or hash, token refill,
+and RedisBuckets' WATCH/MULTI transaction on the in-repo stand-in client.
+"""
+import time
+import pytest
+from utils import rate_limit
+from utils.rate_limit import MemoryBuckets, RedisBuckets, rate_limiter
+from utils.password_hashing import get_password_hasher
+from conftest import create_user, query_count
+from fake_redis import FakeRedis
+
+@pytest.fixture(params=['memory', 'redis'])
+def limiter_backend(request, app):
+    """Run the test against the per-worker buckets and against RedisBuckets on a stand-in client"""
+    backend = app.config['RATE_LIMIT_BACKEND']
+    app.config['RATE_LIMIT_BACKEND'] = request.param
+    rate_limiter.init_app(app, client=FakeRedis() if request.param == 'redis' else None)
+    yield rate_limiter.backend
+    app.config['RATE_LIMIT_BACKEND'] = backend
+    rate_limiter.init_app(app)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen time.monotonic/time.time; advance(seconds) moves both on"""
+    now = [time.time()]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(rate_limit.time, 'time', lambda: now[0])
+    def advance(seconds):
+        now[0] += seconds
+    return advance
+
+def login(client, password='password123', email='seller@example.com'):
+    return client.post('/auth/login', json={'email': email, 'password': password})
+
+def test_failed_logins_get_429_with_retry_after(app, client, limiter_backend):
+    create_user(client, 'seller@example.com')
+    rejected = rate_limiter.rejected
+    for _ in range(app.config['LOGIN_EMAIL_BURST']):
+        assert login(client, password='wrong').status_code == 401
+    # The right password no longer helps once the email's bucket is empty
+    response = login(client)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(60 // app.config['LOGIN_EMAIL_PER_MINUTE'])
+    assert client.get('/debug/rate-limit').get_json()['rejected'] == rejected + 1
+
+def test_successful_logins_do_not_spend_the_email_bucket(app, client, limiter_backend):
+    create_user(client, 'seller@example.com')
+    for _ in range(app.config['LOGIN_EMAIL_BURST'] + 1):
+        assert login(client).status_code == 200
+
+def test_ip_bucket_limits_every_attempt(app, client, limiter_backend, monkeypatch):
+    monkeypatch.setitem(app.config, 'LOGIN_IP_BURST', 3)
+    for number in range(3):
+        assert login(client, email=f'nobody{number}@example.com').status_code == 404
+    response = login(client, email='nobody3@example.com')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == 60 // app.config['LOGIN_IP_PER_MINUTE']
+
+def test_rejected_login_runs_no_query_and_no_hash(app, client, limiter_backend, monkeypatch):
+    create_user(client, 'seller@example.com')
+    monkeypatch.setitem(app.config, 'LOGIN_IP_BURST', 1)
+    assert login(client, password='wrong').status_code == 401
+    with app.app_context():
+        hasher = get_password_hasher()
+    hashed = hasher.stats()['completed']
+
+    response = login(client)
+    assert response.status_code == 429
+    assert query_count(response) == 0
+    assert hasher.stats()['completed'] == hashed
+
+@pytest.mark.parametrize('make_buckets', [MemoryBuckets, lambda: RedisBuckets(FakeRedis())], ids=['memory', 'redis'])
+def test_buckets_refill_over_time(make_buckets, clock):
+    buckets = make_buckets()
+    # 2 at once, then one more every 10 seconds
+    assert buckets.take('k', 2, 6) == (True, 0)
+    assert buckets.take('k', 2, 6) == (True, 0)
+    assert buckets.take('k', 2, 6) == (False, 10)
+    clock(4)
+    assert buckets.take('k', 2, 6) == (False, 6)
+    clock(6)
+    assert buckets.take('k', 2, 6) == (True, 0)
+    assert buckets.take('k', 2, 6)[0] is False
+    # Never refills past the burst
+    clock(600)
+    assert [buckets.take('k', 2, 6)[0] for _ in range(3)] == [True, True, False]
+
+@pytest.mark.parametrize('make_buckets', [MemoryBuckets, lambda: RedisBuckets(FakeRedis())], ids=['memory', 'redis'])
+def test_zero_cost_only_checks_the_bucket(make_buckets, clock):
+    buckets = make_buckets()
+    for _ in range(3):
+        assert buckets.take('k', 1, 6, cost=0) == (True, 0)
+    assert buckets.take('k', 1, 6) == (True, 0)
+    assert buckets.take('k', 1, 6, cost=0) == (False, 10)
+
+def test_redis_buckets_retry_when_another_worker_wins_the_race(monkeypatch):
+    client = FakeRedis()
+    buckets = RedisBuckets(client)
+    key = buckets.prefix + 'k'
+    now = time.time()
+    assert buckets.take('k', 2, 6) == (True, 0)
+
+    # Another worker spends the last token between our WATCH/HGETALL and EXEC
+    calls = []
+    def racing_time():
+        if not calls:
+            client.hset(key, mapping={'tokens': 0.0, 'updated_at': now})
+        calls.append(now)
+        return now
+    monkeypatch.setattr(rate_limit.time, 'time', racing_time)
+
+    # Our first attempt saw a token left; the retry sees the other worker's write
+    assert buckets.take('k', 2, 6) == (False, 10)
+    assert len(calls) == 2
+    assert float(client.hgetall(key)[b'tokens']) == 0.0
+
+def test_redis_buckets_expire_and_reset():
+    client = FakeRedis()
+    buckets = RedisBuckets(client)
+    buckets.take('a', 2, 6)
+    buckets.take('b', 2, 6)
+    assert buckets.size() == 2
+    # Expires a little after the bucket would be full again
+    assert 0 < client._expires[buckets.prefix + 'a'] - time.monotonic() <= 31
+    buckets.reset('a')
+    assert buckets.size() == 1
+    buckets.reset()
+    assert buckets.size() == 0
+
+def test_memory_buckets_prune_full_buckets(clock):
+    buckets = MemoryBuckets(max_entries=3)
+    for name in 'abc':
+        buckets.take(name, 2, 6)
+    # All three are full again after 10 seconds, so the next new key drops them
+    clock(11)
+    buckets.take('d', 2, 6)
+    assert buckets.size() == 1
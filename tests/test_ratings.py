@@ -0,0 +1,70 @@
+"""
+Seller rating totals stay equal to what reconcile_ratings() rebuilds from the reviews,
+including when writes to the same review race each other.
+"""
+import pytest
+from models import db, User
+from routes import review_routes
+from utils.rating_helpers import reconcile_ratings
+from conftest import create_user
+
+def seller_totals(app, seller_id):
+    with app.app_context():
+        user = db.session.get(User, seller_id)
+        return user.rating, user.rating_sum, user.rating_count
+
+def post_review(client, buyer_id, seller_id, rating):
+    response = client.post('/reviews', json={'buyer_id': buyer_id, 'seller_id': seller_id, 'rating': rating})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['review']['id']
+
+@pytest.fixture
+def users(client):
+    seller_id = create_user(client, 'seller@example.com')
+    buyer_ids = [create_user(client, f'buyer{i}@example.com', is_seller=False) for i in range(2)]
+    return seller_id, buyer_ids
+
+def test_repeated_delete_does_not_change_totals_twice(app, client, users):
+    seller_id, (buyer_id, other_buyer_id) = users
+    first = post_review(client, buyer_id, seller_id, 4)
+    post_review(client, other_buyer_id, seller_id, 2)
+
+    assert client.delete(f'/review/{first}').status_code == 200
+    assert client.delete(f'/review/{first}').status_code == 404
+    assert seller_totals(app, seller_id) == (2.0, 2, 1)
+
+def test_delete_after_a_concurrent_delete_applies_nothing(app, client, users, monkeypatch):
+    seller_id, (buyer_id, other_buyer_id) = users
+    review_id = post_review(client, buyer_id, seller_id, 4)
+    post_review(client, other_buyer_id, seller_id, 2)
+    with app.app_context():
+        stale = review_routes.lock_review(review_routes.get_table('reviews'), review_id)
+
+    # Both requests passed the existence check; the first one deletes the row
+    assert client.delete(f'/review/{review_id}').status_code == 200
+    monkeypatch.setattr(review_routes, 'lock_review', lambda table, id: stale)
+    assert client.delete(f'/review/{review_id}').status_code == 404
+    assert seller_totals(app, seller_id) == (2.0, 2, 1)
+
+def test_update_from_a_stale_rating_is_refused(app, client, users, monkeypatch):
+    seller_id, (buyer_id, other_buyer_id) = users
+    review_id = post_review(client, buyer_id, seller_id, 1)
+    with app.app_context():
+        stale = review_routes.lock_review(review_routes.get_table('reviews'), review_id)
+
+    assert client.put(f'/review/{review_id}', json={'rating': 3}).status_code == 200
+    # A second update that read rating 1 before the first one committed
+    monkeypatch.setattr(review_routes, 'lock_review', lambda table, id: stale)
+    assert client.put(f'/review/{review_id}', json={'rating': 5}).status_code == 409
+    assert seller_totals(app, seller_id) == (3.0, 3, 1)
+
+def test_reconcile_matches_the_live_totals(app, client, users):
+    seller_id, (buyer_id, other_buyer_id) = users
+    review_id = post_review(client, buyer_id, seller_id, 5)
+    assert client.put(f'/review/{review_id}', json={'rating': 3}).status_code == 200
+    assert client.delete(f'/review/{review_id}').status_code == 200
+    live = seller_totals(app, seller_id)
+
+    with app.app_context():
+        reconcile_ratings()
+    assert seller_totals(app, seller_id) == live == (0, 0, 0)
@@ -0,0 +1,104 @@
+"""Response cache hits and invalidation on both backends, and the bounds of the per-worker memory backend"""
+import time
+import pytest
+from utils.response_cache import MemoryCache, RedisCache, ResponseCache, response_cache
+from conftest import create_book, create_user
+from fake_redis import FakeRedis
+
+@pytest.fixture(params=['memory', 'redis'])
+def cache_backend(request, app):
+    """Run the test against the per-worker LRU and against RedisCache on a stand-in client"""
+    backend = app.config['CACHE_BACKEND']
+    app.config['CACHE_BACKEND'] = request.param
+    response_cache.init_app(app, client=FakeRedis() if request.param == 'redis' else None)
+    yield response_cache.backend
+    app.config['CACHE_BACKEND'] = backend
+    response_cache.init_app(app)
+
+def test_write_invalidates_cached_book(client, cache_backend):
+    seller_id = create_user(client, 'seller@example.com')
+    book_id = create_book(client, seller_id, title='Old title')
+    assert client.get(f'/book/{book_id}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/book/{book_id}').headers['X-Cache'] == 'HIT'
+
+    assert client.put(f'/book/{book_id}', json={'title': 'New title'}).status_code == 200
+    response = client.get(f'/book/{book_id}')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['title'] == 'New title'
+
+def test_listing_invalidated_by_any_book_write(client, cache_backend):
+    seller_id = create_user(client, 'seller@example.com')
+    create_book(client, seller_id, title='First')
+    assert client.get('/books/featured').headers['X-Cache'] == 'MISS'
+    response = client.get('/books/featured')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert [book['title'] for book in response.get_json()['featured_books']] == ['First']
+
+    create_book(client, seller_id, title='Second')
+    response = client.get('/books/featured')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert [book['title'] for book in response.get_json()['featured_books']] == ['Second', 'First']
+
+def test_cached_etag_still_answers_conditional_requests(client, cache_backend):
+    seller_id = create_user(client, 'seller@example.com')
+    book_id = create_book(client, seller_id)
+    etag = client.get(f'/book/{book_id}').headers['ETag']
+    response = client.get(f'/book/{book_id}', headers={'If-None-Match': etag})
+    assert (response.status_code, response.headers['X-Cache']) == (304, 'HIT')
+
+def test_clear_empties_the_backend(client, cache_backend):
+    seller_id = create_user(client, 'seller@example.com')
+    book_id = create_book(client, seller_id)
+    client.get(f'/book/{book_id}')
+    assert cache_backend.size() == 1
+    response_cache.clear()
+    assert cache_backend.size() == 0
+    assert client.get(f'/book/{book_id}').headers['X-Cache'] == 'MISS'
+
+def test_redis_backend_keeps_the_ttl():
+    client = FakeRedis()
+    cache = RedisCache(client)
+    cache.set('resp:a', (b'body', 'application/json', {'ETag': '"1"'}), ttl=30)
+    assert cache.get('resp:a') == (b'body', 'application/json', {'ETag': '"1"'})
+    assert 0 < client._expires['bookstore:resp:a'] - time.monotonic() <= 30
+
+def test_memory_backend_bounds_tag_generations():
+    cache = MemoryCache(max_entries=2)
+    assert cache.max_tags == 8
+    cache.bump('book:0')
+    stale_key = f"book:0={cache.generations(['book:0'])[0]}"
+    for book_id in range(1, 20):
+        cache.bump(f'book:{book_id}')
+    assert len(cache._generations) == 8
+    # A dropped tag reads newer than anything it had, so no old key comes back
+    assert f"book:0={cache.generations(['book:0'])[0]}" != stale_key
+    assert cache.generations(['book:0']) > [1]
+
+def test_memory_backend_drops_generations_on_clear():
+    cache = MemoryCache()
+    for book_id in range(10):
+        cache.bump(f'book:{book_id}')
+    before = cache.generations(['book:3'])
+    cache.clear()
+    assert len(cache._generations) == 0
+    assert cache.generations(['book:3']) >= before
+
+def test_memory_backend_caps_ttls(monkeypatch):
+    cache = MemoryCache(max_ttl=5)
+    now = time.monotonic()
+    cache.set('long', b'x', ttl=300)
+    cache.set('forever', b'x')
+    cache.set('short', b'x', ttl=2)
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 3)
+    assert cache.get('long') == cache.get('forever') == b'x'
+    assert cache.get('short') is None
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 6)
+    assert cache.get('long') is None and cache.get('forever') is None
+
+def test_memory_backend_uses_the_configured_cap(app):
+    cache = ResponseCache()
+    cache.init_app(app)
+    assert cache.backend.max_ttl == app.config['CACHE_MEMORY_MAX_TTL'] == 5
+    # init_app registered this instance - put the app's cache back
+    from utils.response_cache import response_cache
+    app.extensions['response_cache'] = response_cache
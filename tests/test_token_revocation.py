@@ -0,0 +1,57 @@
+"""
+Tokens issued before a change of password or privilege stop working.
+"""
+from models import db, User
+from utils.auth_helpers import principal_cache
+from conftest import create_user
+
+def login(client, email):
+    response = client.post('/auth/login', json={'email': email, 'password': 'password123'})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+def token_version(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).token_version
+
+def test_is_seller_change_revokes_tokens(app, client):
+    user_id = create_user(client, 'seller@example.com')
+    headers = login(client, 'seller@example.com')
+    assert client.get('/auth/me', headers=headers).status_code == 200
+
+    assert client.put(f'/user/{user_id}', json={'is_seller': False}).status_code == 200
+    assert token_version(app, user_id) == 1
+    assert client.get('/auth/me', headers=headers).status_code == 401
+    assert client.get('/auth/me', headers=login(client, 'seller@example.com')).status_code == 200
+
+def test_unchanged_privileges_keep_tokens(app, client):
+    user_id = create_user(client, 'seller@example.com')
+    headers = login(client, 'seller@example.com')
+
+    # Re-sending the current value is not a change
+    response = client.put(f'/user/{user_id}', json={'name': 'Renamed', 'is_seller': True})
+    assert response.status_code == 200, response.get_json()
+    assert token_version(app, user_id) == 0
+    assert client.get('/auth/me', headers=headers).status_code == 200
+
+def test_password_change_revokes_tokens_in_stateless_mode(app, client):
+    assert app.config['AUTH_MODE'] == 'stateless'
+    user_id = create_user(client, 'buyer@example.com', is_seller=False)
+    headers = login(client, 'buyer@example.com')
+    assert client.get('/auth/me', headers=headers).status_code == 200
+
+    assert client.put(f'/user/{user_id}', json={'password': 'new-password'}).status_code == 200
+    assert client.get('/auth/me', headers=headers).status_code == 401
+    assert client.post('/auth/refresh', headers=headers).status_code == 401
+    response = client.post('/auth/login', json={'email': 'buyer@example.com', 'password': 'new-password'})
+    assert response.status_code == 200
+
+def test_refresh_for_a_user_deleted_meanwhile_is_401(client, monkeypatch):
+    create_user(client, 'buyer@example.com', is_seller=False)
+    headers = login(client, 'buyer@example.com')
+    # token_required still sees the user, the refresh itself no longer does
+    lookups = [principal_cache.get, lambda user_id: None]
+    monkeypatch.setattr(principal_cache, 'get', lambda user_id: lookups.pop(0)(user_id))
+    response = client.post('/auth/refresh', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token has been revoked'
@@ -0,0 +1,20 @@
+"""
+Credentials and internal bookkeeping columns never leave the API, not even through ?fields=.
+"""
+import pytest
+from conftest import create_user
+
+HIDDEN = {'password', 'token_version', 'rating_sum', 'rating_count'}
+
+def test_user_responses_leave_out_hidden_columns(client):
+    user_id = create_user(client, 'seller@example.com')
+
+    users = client.get('/users').get_json()['users']
+    assert users and not HIDDEN & set(users[0])
+    user = client.get(f'/user/{user_id}').get_json()
+    assert 'email' in user and not HIDDEN & set(user)
+
+@pytest.mark.parametrize('field', sorted(HIDDEN))
+def test_hidden_columns_cannot_be_requested(client, field):
+    create_user(client, 'seller@example.com')
+    assert client.get(f'/users?fields=id,{field}').status_code == 400
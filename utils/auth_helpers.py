@@ -0,0 +1,238 @@
+"""
+JWT helpers: token creation and the authenticated principal passed to protected routes
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import jwt
+from jwt.utils import base64url_encode
+from flask import current_app
+from sqlalchemy import select, update
+from utils.db_helpers import get_table
+from models import db
+from models.user_model import User
+
+class KeyRing:
+    """
+    HMAC signing keys by key id (JWT "kid" header), prepared once per process.
+
+    New tokens are signed with the active key; tokens are verified with whichever
+    key their kid names, so old keys can stay in JWT_KEYS until their tokens expire.
+    Tokens without a kid (issued before rotation was set up) use SECRET_KEY.
+    """
+    def __init__(self, keys, active_kid, legacy_key):
+        self.keys = {kid: secret.encode() for kid, secret in keys.items()}
+        self.active_kid = active_kid
+        self.legacy_key = legacy_key.encode()
+        if active_kid is not None and active_kid not in self.keys:
+            raise ValueError(f"JWT_ACTIVE_KID {active_kid!r} is not in JWT_KEYS")
+        
+        # Verification keys as prepared PyJWK objects, so PyJWT skips re-preparing
+        # (and re-validating) the raw secret on every decode
+        self._jwks = {kid: self._prepare(key) for kid, key in self.keys.items()}
+        self._legacy_jwk = self._prepare(self.legacy_key)
+        # Tokens signed with the same key share the same header segment
+        self._header_keys = {}
+
+    @classmethod
+    def from_config(cls, config):
+        # JWT_KEYS="kid1:secret1,kid2:secret2"
+        keys = dict(
+            item.split(':', 1) for item in config.get('JWT_KEYS', '').split(',') if ':' in item
+        )
+        active_kid = config.get('JWT_ACTIVE_KID') or (next(iter(keys)) if keys else None)
+        return cls(keys, active_kid, config['SECRET_KEY'])
+
+    def signing_key(self):
+        """(kid, key) for new tokens - kid is None when no JWT_KEYS are configured"""
+        if self.active_kid is None:
+            return None, self.legacy_key
+        return self.active_kid, self.keys[self.active_kid]
+
+    @staticmethod
+    def _prepare(secret):
+        return jwt.PyJWK({"kty": "oct", "k": base64url_encode(secret).decode()}, algorithm="HS256")
+
+    def verification_key(self, token):
+        """Prepared key for the kid in the token's header"""
+        header_segment = token.split('.', 1)[0]
+        jwk = self._header_keys.get(header_segment)
+        if jwk is not None:
+            return jwk
+        
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            jwk = self._legacy_jwk
+        else:
+            jwk = self._jwks.get(kid)
+            if jwk is None:
+                raise jwt.InvalidTokenError(f'Unknown key id {kid!r}')
+        # Headers are client-supplied, keep the lookup table small
+        if len(self._header_keys) < 64:
+            self._header_keys[header_segment] = jwk
+        return jwk
+
+class TokenVerifier:
+    """
+    Verifies JWTs and remembers the result for tokens seen recently.
+
+    Hot clients send the same token over and over, so the claims of each verified
+    token are kept in a bounded LRU keyed by the token's SHA-256 digest. A cached
+    token is still rejected the moment its exp passes.
+    """
+    def __init__(self, keyring, max_entries=4096):
+        self.keyring = keyring
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token):
+        digest = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            claims = self._entries.get(digest)
+            if claims is not None:
+                self._entries.move_to_end(digest)
+        
+        if claims is None:
+            # Full check: signature with the key named by kid, exp required
+            claims = jwt.decode(
+                token, self.keyring.verification_key(token), algorithms=["HS256"],
+                options={"require": ["exp"]}
+            )
+            with self._lock:
+                self._entries[digest] = claims
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        
+        # Same rule as PyJWT: expired once exp <= now
+        if claims['exp'] <= time.time():
+            with self._lock:
+                self._entries.pop(digest, None)
+            raise jwt.ExpiredSignatureError('Signature has expired')
+        return claims
+
+def get_token_verifier():
+    """The app's TokenVerifier, built from the config on first use"""
+    verifier = current_app.extensions.get('token_verifier')
+    if verifier is None:
+        verifier = TokenVerifier(
+            KeyRing.from_config(current_app.config),
+            current_app.config.get('JWT_VERIFY_CACHE_SIZE', 4096)
+        )
+        current_app.extensions['token_verifier'] = verifier
+    return verifier
+
+def create_token(user_id, is_seller, token_version, hours=24, purpose=None):
+    """
+    Sign a JWT carrying what most handlers need (id, is_seller) plus the user's
+    token_version, so token_required can authenticate without loading the user.
+    """
+    payload = {
+        'user_id': user_id,
+        'is_seller': bool(is_seller),
+        'tv': token_version,
+        'exp': datetime.utcnow() + timedelta(hours=hours)
+    }
+    if purpose:
+        payload['purpose'] = purpose
+    kid, key = get_token_verifier().keyring.signing_key()
+    headers = {'kid': kid} if kid else None
+    return jwt.encode(payload, key, algorithm="HS256", headers=headers)
+
+def decode_token(token):
+    """Verify a JWT's signature and expiry and return its claims"""
+    return get_token_verifier().verify(token)
+
+class Principal:
+    """
+    The authenticated user as described by the token claims.
+
+    id and is_seller come straight from the token. The full User row is only
+    loaded if a handler asks for .user (or any other User attribute).
+    """
+    def __init__(self, user_id, is_seller=None, token_version=0):
+        self.id = user_id
+        self._is_seller = is_seller
+        self.token_version = token_version
+        self._user = None
+
+    @property
+    def user(self):
+        """The ORM User, loaded on first access"""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    @property
+    def is_seller(self):
+        # Tokens issued before is_seller was a claim fall back to the database
+        if self._is_seller is None:
+            return self.user.is_seller
+        return self._is_seller
+
+    def __getattr__(self, name):
+        # Anything else (email, name, books, ...) reads from the loaded User
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+class PrincipalCache:
+    """
+    Short-TTL, per-process cache of user_id -> (token_version, is_seller).
+
+    Validating a token costs one narrow primary-key lookup per user per TTL
+    instead of loading the User on every request. Entries are dropped on password
+    changes and user deletion; other workers pick those up when their TTL expires.
+    """
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return (token_version, is_seller) for user_id, or None if the user does not exist"""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        users_table = get_table('users')
+        row = db.session.execute(
+            select(users_table.c.token_version, users_table.c.is_seller).where(users_table.c.id == user_id)
+        ).first()
+        state = (row.token_version, row.is_seller) if row else None
+        now = time.monotonic()
+        with self._lock:
+            # Keep the dict from growing with users that stopped calling the API
+            if len(self._entries) >= self.max_entries:
+                self._entries = {key: value for key, value in self._entries.items() if value[1] > now}
+            self._entries[user_id] = (state, now + current_app.config['AUTH_PRINCIPAL_CACHE_TTL'])
+        return state
+
+    def invalidate(self, user_id=None):
+        """Forget one user (or everyone) so the next request re-reads the database"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+principal_cache = PrincipalCache()
+
+# User columns that tokens carry as claims or that decide what a token may do. Changing
+# one revokes the user's tokens, so no worker keeps honoring the old value
+AUTHORIZATION_FIELDS = ('is_seller',)
+
+def revoke_tokens(user_id):
+    """
+    Invalidate every token issued to user_id so far (password change/reset, a change
+    of AUTHORIZATION_FIELDS) by bumping users.token_version. Does not commit - call principal_cache.invalidate
+    after the commit so this worker stops accepting old tokens right away.
+    """
+    users_table = get_table('users')
+    db.session.execute(
+        update(users_table).where(users_table.c.id == user_id).values(
+            token_version=users_table.c.token_version + 1
+        )
+    )
@@ -0,0 +1,166 @@
+"""
+Streaming bulk import of book listings from JSON lines or CSV
+"""
+import csv
+import io
+import json
+from marshmallow import ValidationError
+from sqlalchemy import insert
+from schemas.book_schema import book_import_schema
+from utils.db_helpers import get_table
+from models import db
+
+# Columns written for every imported row - executemany needs the same keys on each row
+IMPORT_COLUMNS = (
+    'title', 'author', 'price', 'description', 'condition', 'genre',
+    'publication_year', 'isbn', 'image_url', 'seller_id', 'status'
+)
+
+def _is_utf8(text):
+    """
+    False for text decoded with errors='surrogateescape' from bytes that were not UTF-8.
+    The readers decode that way so one bad line is reported instead of aborting the upload.
+    """
+    try:
+        text.encode('utf-8')
+        return True
+    except UnicodeEncodeError:
+        return False
+
+NOT_UTF8_ERROR = {"_schema": ["Line is not valid UTF-8"]}
+
+def read_jsonl(stream):
+    """Yield (line_number, record) from a binary stream of JSON lines, one line at a time"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='surrogateescape')
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if not _is_utf8(line):
+            yield line_number, ValidationError(NOT_UTF8_ERROR)
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ValidationError({"_schema": [f"Invalid JSON: {e}"]})
+
+def read_csv(stream):
+    """Yield (line_number, record) from a binary CSV stream with a header row, one row at a time"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='surrogateescape', newline='')
+    reader = csv.DictReader(text)
+    # Without readable column names no row can be imported
+    if reader.fieldnames and not all(_is_utf8(name) for name in reader.fieldnames if name):
+        yield 1, ValidationError({"_schema": ["Header row is not valid UTF-8"]})
+        return
+    for record in reader:
+        # Empty cells mean "not provided", not empty strings
+        record = {key: value for key, value in record.items() if key and value not in ('', None)}
+        if not all(_is_utf8(value) for value in record.values() if isinstance(value, str)):
+            yield reader.line_num, ValidationError(NOT_UTF8_ERROR)
+            continue
+        yield reader.line_num, record
+
+def import_books(records, seller_id=None, chunk_size=500, max_errors=1000, on_insert=None):
+    """
+    Validate records with BookSchema and insert them chunk by chunk, one executemany per chunk.
+
+    records yields (line_number, record) - a record may also be a ValidationError from
+    the reader. Failing lines are reported and skipped; the rest of the file still goes in.
+    Only one chunk is held in memory at a time. Returns a summary dict.
+
+    on_insert(books) is called after each committed chunk with the (id, title, author) of
+    its rows, or with None when the database can't return them for an executemany (MySQL).
+    """
+    summary = {"imported": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def add_error(line_number, messages):
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append({"line": line_number, "errors": messages})
+        else:
+            summary["errors_truncated"] = True
+
+    chunk = []
+    for line_number, record in records:
+        if isinstance(record, ValidationError):
+            add_error(line_number, record.messages)
+            continue
+        if not isinstance(record, dict):
+            add_error(line_number, {"_schema": ["Row must be an object"]})
+            continue
+
+        if seller_id is not None:
+            record.setdefault('seller_id', seller_id)
+        chunk.append((line_number, record))
+
+        if len(chunk) >= chunk_size:
+            _insert_chunk(_validate_chunk(chunk, add_error), summary, add_error, on_insert)
+            chunk = []
+
+    if chunk:
+        _insert_chunk(_validate_chunk(chunk, add_error), summary, add_error, on_insert)
+
+    return summary
+
+def _validate_chunk(chunk, add_error):
+    """
+    Validate a chunk of raw records with one BookSchema load(many=True) call
+    (loading row by row costs a lot more per row). Returns the valid rows ready to insert.
+    """
+    try:
+        loaded = book_import_schema.load([record for _, record in chunk], many=True)
+        errors = {}
+    except ValidationError as err:
+        # valid_data stays aligned with the input, errors are keyed by index
+        loaded, errors = err.valid_data, err.messages
+
+    rows = []
+    for index, (line_number, _) in enumerate(chunk):
+        if index in errors:
+            add_error(line_number, errors[index])
+            continue
+        book_data = loaded[index]
+        # New listings are always Available, condition falls back to the model default
+        book_data['status'] = 'Available'
+        book_data.setdefault('condition', 'Good')
+        rows.append((line_number, {column: book_data.get(column) for column in IMPORT_COLUMNS}))
+    return rows
+
+def _insert_chunk(chunk, summary, add_error, on_insert=None):
+    """Insert one chunk with a single executemany; if the database rejects it, retry row by row"""
+    if not chunk:
+        return
+    books_table = get_table('books')
+    rows = [row for _, row in chunk]
+    try:
+        if on_insert is not None and db.session.get_bind().dialect.insert_executemany_returning:
+            # Multi-row INSERT ... RETURNING. Rows come back in any order, so they carry
+            # what the caller needs instead of being matched to the parameters
+            stmt = insert(books_table).returning(books_table.c.id, books_table.c.title, books_table.c.author)
+            books = [tuple(book) for book in db.session.execute(stmt, rows)]
+        else:
+            # The MySQL driver batches an INSERT executemany into multi-row VALUES statements
+            db.session.execute(insert(books_table), rows)
+            books = None
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+    else:
+        summary["imported"] += len(chunk)
+        if on_insert is not None:
+            on_insert(books)
+        return
+
+    # Something in this chunk violates a database constraint (e.g. unknown seller) -
+    # insert the rows one at a time so only the bad lines are reported
+    for line_number, row in chunk:
+        try:
+            book_id = db.session.execute(insert(books_table).values(**row)).inserted_primary_key[0]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            add_error(line_number, {"_schema": [str(e.__cause__ or e).splitlines()[0]]})
+            continue
+        summary["imported"] += 1
+        if on_insert is not None:
+            on_insert([(book_id, row['title'], row['author'])])
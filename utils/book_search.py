@@ -0,0 +1,137 @@
+"""
+Full-text search over book listings (title, author, description, genre).
+
+Each database gets its own backend - SQLite FTS5, MySQL FULLTEXT or PostgreSQL
+tsvector - picked from the engine dialect. The index objects themselves are defined
+in models/book_model.py. When the index is missing (e.g. a database that has not
+been migrated yet) search falls back to the old ILIKE scan.
+"""
+import re
+from flask import current_app
+from sqlalchemy import inspect, or_, func, literal_column, table, column
+from sqlalchemy.dialects.mysql import match as mysql_match
+from models import db
+from models.book_model import BOOK_SEARCH_COLUMNS, BOOK_SEARCH_TSVECTOR
+
+# Words in the search box - everything else (quotes, operators) is dropped so user
+# input can never break the engine's query syntax
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def search_words(search_term):
+    """
+    Split a search box string into lower-cased words. Single letters (the s of
+    "Harry's", initials) are dropped unless nothing else is left - as required
+    prefixes they would match almost anything.
+    """
+    words = [word.lower() for word in WORD_PATTERN.findall(search_term or '')]
+    return [word for word in words if len(word) > 1] or words
+
+class LikeSearch:
+    """Substring match with ILIKE on every column - no index, no ranking"""
+    name = 'like'
+
+    def is_available(self, connection):
+        return True
+
+    def apply(self, query, books_table, search_term):
+        query = query.where(or_(
+            *[books_table.c[name].ilike(f'%{search_term}%') for name in BOOK_SEARCH_COLUMNS]
+        ))
+        return query, None
+
+class SqliteFtsSearch:
+    """SQLite FTS5 table books_fts, joined on rowid and ranked with bm25"""
+    name = 'sqlite_fts5'
+
+    fts_table = table('books_fts', column('rowid'), column('books_fts'), column('rank'))
+
+    def is_available(self, connection):
+        return inspect(connection).has_table('books_fts')
+
+    def apply(self, query, books_table, search_term):
+        # Every word must match, each as a prefix ("harr pott" finds Harry Potter)
+        fts_query = ' '.join(f'"{word}"*' for word in search_words(search_term))
+        fts = self.fts_table
+        query = query.join(fts, fts.c.rowid == books_table.c.id).where(
+            fts.c.books_fts.match(fts_query)
+        )
+        # FTS5 rank is bm25, where lower means more relevant
+        return query, -fts.c.rank
+
+class MysqlFulltextSearch:
+    """MySQL/MariaDB FULLTEXT index ft_books_search, MATCH ... AGAINST in boolean mode"""
+    name = 'mysql_fulltext'
+
+    def is_available(self, connection):
+        indexes = inspect(connection).get_indexes('books')
+        return any(index['name'] == 'ft_books_search' for index in indexes)
+
+    def apply(self, query, books_table, search_term):
+        # +word* = required prefix. Words shorter than innodb_ft_min_token_size (3)
+        # are never indexed, so requiring them would match nothing
+        against = ' '.join(
+            f'+{word}*' if len(word) >= 3 else f'{word}*' for word in search_words(search_term)
+        )
+        relevance = mysql_match(
+            *[books_table.c[name] for name in BOOK_SEARCH_COLUMNS], against=against
+        ).in_boolean_mode()
+        return query.where(relevance), relevance
+
+class PostgresSearch:
+    """PostgreSQL tsvector expression backed by the GIN index ix_books_search_tsv, ranked with ts_rank"""
+    name = 'postgresql_tsvector'
+
+    def is_available(self, connection):
+        # Works without the index too, just without the speed-up
+        return True
+
+    def apply(self, query, books_table, search_term):
+        tsquery = func.to_tsquery(
+            literal_column("'english'"),
+            ' & '.join(f'{word}:*' for word in search_words(search_term))
+        )
+        document = literal_column(BOOK_SEARCH_TSVECTOR)
+        query = query.where(document.op('@@')(tsquery))
+        return query, func.ts_rank(document, tsquery)
+
+# Full-text backend per SQLAlchemy dialect name
+SEARCH_BACKENDS = {
+    'sqlite': SqliteFtsSearch,
+    'mysql': MysqlFulltextSearch,
+    'mariadb': MysqlFulltextSearch,
+    'postgresql': PostgresSearch,
+}
+
+def get_search_backend():
+    """
+    Return the search backend for the current app, chosen once and then reused.
+    BOOK_SEARCH_BACKEND=like forces the ILIKE fallback, the default 'auto' uses
+    the dialect's full-text backend if its index exists.
+    """
+    backend = current_app.extensions.get('book_search')
+    if backend is not None:
+        return backend
+
+    backend = LikeSearch()
+    if current_app.config.get('BOOK_SEARCH_BACKEND', 'auto') == 'auto':
+        backend_class = SEARCH_BACKENDS.get(db.engine.dialect.name)
+        if backend_class is not None:
+            with db.engine.connect() as connection:
+                if backend_class().is_available(connection):
+                    backend = backend_class()
+                else:
+                    print(f"Book search index missing, falling back to ILIKE ({backend_class.name})")
+
+    current_app.extensions['book_search'] = backend
+    return backend
+
+def apply_book_search(query, books_table, search_term):
+    """
+    Restrict a select() over books to rows matching search_term.
+    Returns (query, relevance) - relevance is a column expression where higher means
+    a better match, or None when the backend cannot rank.
+    """
+    # Nothing the full-text engines could match on (e.g. only punctuation)
+    if not search_words(search_term):
+        return LikeSearch().apply(query, books_table, search_term)
+    return get_search_backend().apply(query, books_table, search_term)
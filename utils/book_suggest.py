@@ -0,0 +1,215 @@
+"""
+In-memory prefix index over book titles and authors for search-as-you-type suggestions
+"""
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy import select, desc, func
+from utils.db_helpers import get_table
+from models import db
+
+WORD_START_PATTERN = re.compile(r'\b\w', re.UNICODE)
+
+def normalize(text):
+    """Lower-case and collapse whitespace so lookups ignore case and spacing"""
+    return ' '.join((text or '').lower().split())
+
+class SuggestIndex:
+    """
+    Sorted array of (key, field, book_id) entries searched with bisect.
+
+    Every title and author is indexed from the start of each of its words, so
+    "pot" finds "Harry Potter" as well as "Potter's Field". Only Available books
+    are indexed. The index lives in the worker process: the book routes keep it
+    current for the writes this worker handles, and it is reloaded from the
+    database every BOOK_SUGGEST_REFRESH_SECONDS for the writes other workers
+    handled - until then those are missing or outdated here. Loading stops at
+    the memory budget (newest books are loaded first).
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024, refresh_seconds=0):
+        self.max_bytes = max_bytes
+        self.refresh_seconds = refresh_seconds
+        self._entries = []
+        self._books = {}
+        self._lock = threading.Lock()
+        # Held by the one thread reloading the index; the others keep using the current one
+        self._rebuild_lock = threading.Lock()
+        self._bytes = 0
+        self.loaded = False
+        # Set when books were added without their ids; the next ensure_loaded() reloads
+        self.stale = False
+        self.built_at = None
+        self.skipped = 0
+        self.truncated = False
+
+    def _book_entries(self, book_id, title, author):
+        entries = []
+        for field, value in (('title', normalize(title)), ('author', normalize(author))):
+            for match in WORD_START_PATTERN.finditer(value):
+                entries.append((value[match.start():], field, book_id))
+        return entries
+
+    @staticmethod
+    def _entry_size(entry):
+        # Key string + tuple + list slot; the field string and id are shared/small
+        return sys.getsizeof(entry[0]) + sys.getsizeof(entry) + 8
+
+    def _add(self, book_id, title, author, sort=True):
+        entries = self._book_entries(book_id, title, author)
+        size = sum(self._entry_size(entry) for entry in entries)
+        if self._bytes + size > self.max_bytes:
+            self.skipped += 1
+            return False
+        if sort:
+            for entry in entries:
+                insort(self._entries, entry)
+        else:
+            # Caller sorts once after adding many books
+            self._entries.extend(entries)
+        self._books[book_id] = (title, author, entries, size)
+        self._bytes += size
+        return True
+
+    def _remove(self, book_id):
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return
+        _, _, entries, size = book
+        for entry in entries:
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+        self._bytes -= size
+
+    def rebuild(self):
+        """Load the newest Available books from the database up to the memory budget, replacing the current contents"""
+        config = current_app.config
+        self.max_bytes = config.get('BOOK_SUGGEST_MAX_BYTES', self.max_bytes)
+        self.refresh_seconds = config.get('BOOK_SUGGEST_REFRESH_SECONDS', self.refresh_seconds)
+        books_table = get_table('books')
+        available = books_table.c.status == 'Available'
+        query = select(
+            books_table.c.id, books_table.c.title, books_table.c.author
+        ).where(available).order_by(desc(books_table.c.id))
+
+        # Build into fresh structures and sort once, then swap them in. Rows are
+        # streamed in batches and reading stops at the budget, so memory stays
+        # within it whatever the catalog size
+        entries, books, total_bytes, truncated = [], {}, 0, False
+        result = db.session.execute(query.execution_options(yield_per=1000))
+        try:
+            for row in result:
+                book_entries = self._book_entries(row.id, row.title, row.author)
+                size = sum(self._entry_size(entry) for entry in book_entries)
+                if total_bytes + size > self.max_bytes:
+                    truncated = True
+                    break
+                entries.extend(book_entries)
+                books[row.id] = (row.title, row.author, book_entries, size)
+                total_bytes += size
+        finally:
+            result.close()
+        entries.sort()
+
+        skipped = 0
+        if truncated:
+            # Served by the (status, id) index
+            skipped = db.session.execute(select(func.count()).where(available)).scalar() - len(books)
+
+        with self._lock:
+            self._entries, self._books = entries, books
+            self._bytes, self.skipped, self.truncated = total_bytes, skipped, truncated
+            self.loaded = True
+            self.stale = False
+            self.built_at = time.time()
+
+    def is_expired(self):
+        return bool(self.refresh_seconds) and time.time() - self.built_at > self.refresh_seconds
+
+    def ensure_loaded(self):
+        """
+        Build the index on first use (workers that skipped the startup build), when marked
+        stale, or when it is older than BOOK_SUGGEST_REFRESH_SECONDS. A reload that is
+        only due to age runs in one thread; the others keep answering from the current index.
+        """
+        if not self.loaded or self.stale:
+            self.rebuild()
+        elif self.is_expired() and self._rebuild_lock.acquire(blocking=False):
+            try:
+                if self.is_expired():
+                    self.rebuild()
+            finally:
+                self._rebuild_lock.release()
+
+    def mark_stale(self):
+        """Reload on the next lookup - for writes whose rows can't be indexed one by one"""
+        if self.loaded:
+            self.stale = True
+
+    def upsert(self, book_id, title, author, status):
+        """Re-index one book after a create or update; non-Available books are dropped"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(book_id)
+            if status == 'Available':
+                self._add(book_id, title, author)
+
+    def add_many(self, books):
+        """Index new Available books given as (id, title, author), sorting once instead of per entry"""
+        if not self.loaded:
+            return
+        books = list(books)
+        with self._lock:
+            # Removals bisect, so they all go before the unsorted appends
+            for book_id, _, _ in books:
+                self._remove(book_id)
+            for book_id, title, author in books:
+                self._add(book_id, title, author, sort=False)
+            self._entries.sort()
+
+    def remove(self, book_id):
+        """Drop a deleted book from the index"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(book_id)
+
+    def suggest(self, prefix, limit=10):
+        """Books whose title or author has a word starting with prefix, one entry per book"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        suggestions, seen = [], set()
+        with self._lock:
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(suggestions) < limit:
+                key, field, book_id = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                if book_id not in seen:
+                    seen.add(book_id)
+                    title, author, _, _ = self._books[book_id]
+                    suggestions.append({"id": book_id, "title": title, "author": author, "match": field})
+                position += 1
+        return suggestions
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "stale": self.stale,
+            "built_at": self.built_at,
+            "books": len(self._books),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "truncated": self.truncated,
+            "skipped": self.skipped,
+            "refresh_seconds": self.refresh_seconds
+        }
+
+# Process-wide index used by the book routes
+suggest_index = SuggestIndex()
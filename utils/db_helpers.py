@@ -1,33 +1,336 @@
 """
 Database helper functions to simplify SQL operations and standardize error handling
 """
-from flask import jsonify
-from sqlalchemy import Table, MetaData, select, insert
+import base64
+import csv
+import io
+import json
+import threading
+from operator import itemgetter
+from datetime import datetime, timezone
+from decimal import Decimal
+from flask import jsonify, request, current_app, Response, stream_with_context
+from werkzeug.http import http_date, parse_date
+from sqlalchemy import Table, MetaData, select, insert, func, desc, tuple_
 from models import db
 
+class TableRegistry:
+    """
+    Process-wide cache of Table objects, resolved once and shared by every request.
+    
+    Tables come straight from the declarative metadata in models/ (no database
+    round-trip). Only tables that are not declared there are reflected, once,
+    into a private MetaData. Safe to use from threaded WSGI servers.
+    """
+    def __init__(self, metadata):
+        self._metadata = metadata
+        self._reflected = MetaData()
+        self._tables = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reflections = 0
+
+    def get(self, table_name):
+        """Return the Table for table_name, resolving it on first use"""
+        # Fast path - plain dict lookup, no lock needed once the table is cached
+        # (counters are best-effort here, they are only used for monitoring)
+        table = self._tables.get(table_name)
+        if table is not None:
+            self.hits += 1
+            return table
+        
+        with self._lock:
+            # Another thread may have resolved it while we waited for the lock
+            table = self._tables.get(table_name)
+            if table is not None:
+                self.hits += 1
+                return table
+            
+            self.misses += 1
+            table = self._metadata.tables.get(table_name)
+            if table is None:
+                # Not declared in models/ - fall back to reflecting it once
+                table = Table(table_name, self._reflected, autoload_with=db.engine)
+                self.reflections += 1
+            self._tables[table_name] = table
+            return table
+
+    def invalidate(self, table_name=None):
+        """Forget one table (or all of them), e.g. after an Alembic migration"""
+        with self._lock:
+            if table_name is None:
+                self._tables.clear()
+                self._reflected = MetaData()
+                return
+            self._tables.pop(table_name, None)
+            if table_name in self._reflected.tables:
+                self._reflected.remove(self._reflected.tables[table_name])
+
+    def stats(self):
+        """Return cache counters so we can confirm reflection round-trips are gone"""
+        return {
+            "tables": sorted(self._tables),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reflections": self.reflections
+        }
+
+# Shared by the whole process - db.metadata is the declarative Base.metadata
+table_registry = TableRegistry(db.metadata)
+
 def get_table(table_name):
-    """Create a SQLAlchemy Table object with autoload"""
-    metadata = MetaData()
-    return Table(table_name, metadata, autoload_with=db.engine)
+    """Get the SQLAlchemy Table object for table_name from the table registry"""
+    return table_registry.get(table_name)
+
+def invalidate_tables(table_name=None):
+    """Drop cached Table objects so the next get_table() resolves them again"""
+    table_registry.invalidate(table_name)
+
+# Columns never returned by the API, whatever a query selected: credentials and internal
+# bookkeeping (token revocation counter, rating totals behind users.rating)
+DENIED_COLUMNS = {
+    'users': frozenset({'password', 'token_version', 'rating_sum', 'rating_count'}),
+    'orders': frozenset({'batch_ref'})
+}
+
+def public_columns(table):
+    """The table's columns minus DENIED_COLUMNS"""
+    denied = DENIED_COLUMNS.get(table.name, frozenset())
+    return [column for column in table.columns if column.name not in denied]
+
+def select_columns(table, *required):
+    """
+    Columns to select(): the ones named in ?fields=a,b plus the primary key (and required,
+    e.g. the sort key cursors need), or every public column. The projection happens in SQL,
+    so unrequested columns are never fetched. Raises ValueError for unknown or denied names.
+    """
+    columns = public_columns(table)
+    fields = request.args.get('fields', type=str)
+    if not fields:
+        return columns
+    
+    names = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = names - {column.name for column in columns}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    names.update(column.name for column in (*table.primary_key, *required))
+    return [column for column in columns if column.name in names]
+
+# (table name, row keys) -> (names, picker), see _row_layout
+_row_layouts = {}
+
+def _row_layout(keys, table):
+    """
+    Which of a result's columns to serialize, worked out once per result shape
+    instead of once per row: the table's columns that are not denied. picker is
+    None when that is every column, else it pulls those positions out of a row.
+    """
+    layout = _row_layouts.get((table.name, keys))
+    if layout is not None:
+        return layout
+    
+    denied = DENIED_COLUMNS.get(table.name, frozenset())
+    positions = [
+        position for position, key in enumerate(keys) if key in table.c and key not in denied
+    ]
+    names = tuple(keys[position] for position in positions)
+    if len(positions) == len(keys):
+        picker = None
+    elif len(positions) == 1:
+        picker = lambda row, position=positions[0]: (row[position],)
+    else:
+        picker = itemgetter(*positions)
+    
+    # ?fields= makes the number of shapes client-controlled - keep it bounded
+    if len(_row_layouts) >= 256:
+        _row_layouts.clear()
+    _row_layouts[(table.name, keys)] = layout = (names, picker)
+    return layout
 
 def row_to_dict(row, table):
     """Convert a SQLAlchemy result row to a dictionary"""
     if not row:
         return None
-    result = {}
-    for column in table.columns:
-        result[column.name] = getattr(row, column.name)
-    return result
+    names, picker = _row_layout(row._fields, table)
+    return dict(zip(names, row if picker is None else picker(row)))
 
 def rows_to_list(rows, table):
     """Convert multiple SQLAlchemy result rows to a list of dictionaries"""
-    return [row_to_dict(row, table) for row in rows]
+    if not rows:
+        return []
+    # Rows of one result share their keys - zip straight over the row tuples
+    names, picker = _row_layout(rows[0]._fields, table)
+    if picker is None:
+        return [dict(zip(names, row)) for row in rows]
+    return [dict(zip(names, picker(row))) for row in rows]
+
+def wants_total():
+    """Clients can skip the COUNT(*) query with ?count=false (total is then null)"""
+    return request.args.get('count', 'true', type=str).lower() != 'false'
+
+def paginate_query(query, page, limit, with_total=True):
+    """
+    Fetch a single page of a select() using LIMIT/OFFSET in SQL.
+    Returns (rows, total) - total comes from a COUNT(*) over the same filtered query,
+    or None when with_total is False.
+    """
+    page = max(page, 1)
+    limit = max(limit, 1)
+    
+    total = count_rows(query) if with_total else None
+    
+    rows = db.session.execute(query.limit(limit).offset((page - 1) * limit)).fetchall()
+    return rows, total
 
-def paginate_results(results, page, limit):
-    """Paginate a list of results"""
-    start = (page - 1) * limit
-    end = start + limit
-    return results[start:end] if start < len(results) else []
+def count_rows(query):
+    """Run a COUNT(*) over the same filtered select()"""
+    # Ordering does not change the count, so drop it from the subquery
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return db.session.execute(count_query).scalar()
+
+def encode_cursor(row, sort_column, descending, direction):
+    """Build an opaque cursor from a row's sort key plus its id (the tie-breaker)"""
+    value = getattr(row, sort_column.name)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    payload = {
+        "s": sort_column.name,
+        "o": "desc" if descending else "asc",
+        "d": direction,
+        "v": value,
+        "id": row.id
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor, sort_column, descending):
+    """
+    Unpack a cursor made by encode_cursor().
+    Returns (value, id, direction) - raises ValueError if the cursor is malformed
+    or was issued for a different sort.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        value, row_id, direction = payload["v"], int(payload["id"]), payload["d"]
+        sort_name, order = payload["s"], payload["o"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    
+    if sort_name != sort_column.name or order != ("desc" if descending else "asc"):
+        raise ValueError("Cursor does not match the requested sort")
+    if direction not in ("next", "prev"):
+        raise ValueError("Invalid cursor")
+    
+    # Turn the JSON value back into the column's Python type - a value of any other
+    # type was not made by encode_cursor and must not reach the query
+    python_type = sort_column.type.python_type
+    try:
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is Decimal:
+            value = Decimal(value)
+        elif python_type is float and type(value) is int:
+            value = float(value)
+    except (ValueError, TypeError, ArithmeticError) as e:
+        raise ValueError("Invalid cursor") from e
+    if type(value) is not python_type:
+        raise ValueError("Invalid cursor")
+    return value, row_id, direction
+
+def paginate_keyset(query, sort_column, id_column, descending, limit, cursor=None):
+    """
+    Fetch a single page of a select() by seeking past the cursor position instead of OFFSET.
+    The seek is WHERE (sort_col, id) < (value, id) (or > when ascending), so page N
+    costs the same as page 1. The sort column must be NOT NULL.
+    Returns (rows, next_cursor, prev_cursor) - cursors are None at either end.
+    """
+    limit = max(limit, 1)
+    sort_by_id = sort_column.name == id_column.name
+    
+    direction = "next"
+    if cursor:
+        value, row_id, direction = decode_cursor(cursor, sort_column, descending)
+    backwards = direction == "prev"
+    
+    # Walking backwards flips both the comparison and the ordering
+    seek_desc = descending != backwards
+    if cursor:
+        if sort_by_id:
+            key, bound = id_column, row_id
+        else:
+            key, bound = tuple_(sort_column, id_column), tuple_(value, row_id)
+        query = query.where(key < bound if seek_desc else key > bound)
+    
+    order_columns = [id_column] if sort_by_id else [sort_column, id_column]
+    if seek_desc:
+        order_columns = [desc(column) for column in order_columns]
+    query = query.order_by(None).order_by(*order_columns)
+    
+    # One extra row tells us whether there is another page in this direction
+    rows = db.session.execute(query.limit(limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, bool(cursor)
+    
+    next_cursor = encode_cursor(rows[-1], sort_column, descending, "next") if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0], sort_column, descending, "prev") if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+# Export formats and their response content types
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def stream_export(query, table, name):
+    """
+    Stream every row of a select() as NDJSON (default) or CSV (?format=csv).
+    Rows come off a server-side cursor in batches of EXPORT_BATCH_SIZE and are written
+    straight into a chunked response, so a full-table dump uses constant memory.
+    Raises ValueError for an unknown format.
+    """
+    data_format = request.args.get('format', 'ndjson', type=str)
+    if data_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    
+    def generate():
+        result = db.session.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        try:
+            if data_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                names, picker = _row_layout(tuple(result.keys()), table)
+                writer.writerow(names)
+                for rows in result.partitions():
+                    writer.writerows(rows if picker is None else map(picker, rows))
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                # Header only, when there are no rows
+                if buffer.tell():
+                    yield buffer.getvalue()
+            else:
+                dumps = current_app.json.dumps
+                for rows in result.partitions():
+                    yield ''.join(dumps(row) + '\n' for row in rows_to_list(rows, table))
+        finally:
+            result.close()
+    
+    extension = 'csv' if data_format == 'csv' else 'ndjson'
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[data_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{extension}'
+    return response
 
 def handle_error(e, operation="database operation"):
     """Handle exceptions with consistent logging and response format"""
@@ -45,11 +348,54 @@ def execute_query(query, single_result=False):
     except Exception as e:
         return handle_error(e, "query execution")
 
+# Maintained by RowVersionMixin - never copied from request bodies
+ROW_VERSION_COLUMNS = ('version', 'updated_at')
+
+def row_validators(table_name, id, version, updated_at, fields=None):
+    """Strong ETag and Last-Modified headers for one versioned row (fields: the ?fields= projection)"""
+    variant = '-' + '+'.join(sorted(name.strip() for name in fields.split(',') if name.strip())) if fields else ''
+    headers = {"ETag": f'"{table_name}-{id}-{version}{variant}"'}
+    if updated_at is not None:
+        headers["Last-Modified"] = http_date(updated_at.replace(tzinfo=timezone.utc))
+    return headers
+
+def is_not_modified(headers):
+    """Check the request's If-None-Match (or, without it, If-Modified-Since) against row headers"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(headers["ETag"].strip('"'))
+    if request.if_modified_since and "Last-Modified" in headers:
+        return parse_date(headers["Last-Modified"]) <= request.if_modified_since
+    return False
+
 def get_by_id(table_name, id, response=True):
-    """Get a record by ID with standard error handling"""
+    """
+    Get a record by ID with standard error handling.
+    Versioned tables answer with ETag/Last-Modified and honor conditional GETs:
+    a matching If-None-Match only costs a primary key lookup of (version, updated_at).
+    """
     try:
         table = get_table(table_name)
-        query = select(table).where(table.c.id == id)
+        versioned = response and 'version' in table.c
+        fields = request.args.get('fields', type=str) if response else None
+        conditional = versioned and request.method == 'GET' and (
+            request.if_none_match or request.if_modified_since
+        )
+        
+        if conditional:
+            current = db.session.execute(
+                select(table.c.version, table.c.updated_at).where(table.c.id == id)
+            ).first()
+            if current:
+                headers = row_validators(table_name, id, current.version, current.updated_at, fields)
+                if is_not_modified(headers):
+                    return '', 304, headers
+        
+        # Responses select only public (or ?fields=) columns; callers using the row get all of them
+        if response:
+            required = (table.c.version, table.c.updated_at) if versioned else ()
+            query = select(*select_columns(table, *required)).where(table.c.id == id)
+        else:
+            query = select(table).where(table.c.id == id)
         result = db.session.execute(query).first()
         
         if not result:
@@ -58,9 +404,16 @@ def get_by_id(table_name, id, response=True):
             return None
             
         if response:
+            if versioned:
+                headers = row_validators(table_name, id, result.version, result.updated_at, fields)
+                return jsonify(row_to_dict(result, table)), 200, headers
             return jsonify(row_to_dict(result, table)), 200
         return result, table
         
+    except ValueError as err:
+        if response:
+            return jsonify({"error": str(err)}), 400
+        raise err
     except Exception as e:
         if response:
             return handle_error(e, f"getting {table_name} by ID")
@@ -0,0 +1,131 @@
+"""
+Connection pool configuration and metrics.
+
+Engine options come from the DB_POOL_* settings in app.py. The pool is a QueuePool
+that also records how long checkouts wait for a free connection, so pool sizing can
+be judged from /debug/db-pool instead of guessed. Engines are disposed in forked
+children, so pre-fork servers (gunicorn --preload) never share sockets with the master.
+"""
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+class PoolMetrics:
+    """Counters shared by every MeteredQueuePool of the process"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.waited = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            # Checkouts that found no idle connection (and no overflow slot) right away
+            if seconds > 0.001:
+                self.waited += 1
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+pool_metrics = PoolMetrics()
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection"""
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_wait(time.perf_counter() - started_at, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started_at)
+        return connection
+
+@event.listens_for(MeteredQueuePool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.count('checkouts')
+
+@event.listens_for(MeteredQueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.count('connects')
+
+@event.listens_for(MeteredQueuePool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    # Includes connections pool_pre_ping found dead
+    pool_metrics.count('invalidations')
+
+def engine_options(config, url=None):
+    """
+    Engine options from the DB_POOL_* settings for url (default: SQLALCHEMY_DATABASE_URI).
+    In-memory SQLite keeps Flask-SQLAlchemy's single static connection - there is nothing to pool.
+    """
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE']
+    }
+    url = url or config.get('SQLALCHEMY_DATABASE_URI')
+    if url and not (url.startswith('sqlite') and make_url(url).database in (None, '', ':memory:')):
+        options.update(
+            poolclass=MeteredQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT']
+        )
+    return options
+
+def dispose_engines_after_fork(engines):
+    """
+    Drop inherited pool connections in forked children (close=False leaves the
+    parent's sockets alone), so each worker opens its own.
+    """
+    engines = list(engines)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: [engine.dispose(close=False) for engine in engines])
+
+def pool_stats(engines):
+    """Live pool state per bind plus the process-wide checkout counters"""
+    pools = {}
+    for bind, engine in engines.items():
+        pool = engine.pool
+        state = {"class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            state.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                # Negative while the pool is still below pool_size
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+                timeout=pool.timeout()
+            )
+        pools[bind or "default"] = state
+
+    checkouts = pool_metrics.checkouts
+    return {
+        "pools": pools,
+        "checkouts": checkouts,
+        "connects": pool_metrics.connects,
+        "invalidations": pool_metrics.invalidations,
+        "timeouts": pool_metrics.timeouts,
+        "waited": pool_metrics.waited,
+        "wait_total": pool_metrics.wait_total,
+        "wait_max": pool_metrics.wait_max,
+        "wait_avg": pool_metrics.wait_total / checkouts if checkouts else 0.0
+    }
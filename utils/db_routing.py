@@ -0,0 +1,133 @@
+"""
+Read-replica routing for db.session.
+
+GET/HEAD requests handled by the blueprints read from a replica (SQLALCHEMY_BINDS
+keys "replica_0", "replica_1", ...), picked per request by round-robin or fewest
+checked-out connections. Everything else uses the primary:
+
+- writes (flushes, INSERT/UPDATE/DELETE, raw SQL) and every later statement of
+  the same request, so a handler reads back what it just wrote;
+- every request from a client that wrote within DB_PRIMARY_PIN_SECONDS, so
+  replication lag never shows a client a state older than its own last write.
+  The pin is kept per worker (keyed by the Authorization header, else the IP)
+  and in a cookie, so other workers honor it too;
+- reads whose result outlives the request (read_from_primary), e.g. responses
+  stored in the response cache.
+"""
+import itertools
+import threading
+import time
+from flask import request, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+REPLICA_BIND_PREFIX = 'replica_'
+PIN_COOKIE = 'primary_until'
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session sending plain SELECTs to the request's replica, if any"""
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        # Set by ReplicaRouter for read requests
+        self.replica = None
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or (clause is not None and not isinstance(clause, Select)):
+                # From now on this request reads its own writes
+                self.wrote = True
+            elif self.replica is not None and not self.wrote and isinstance(clause, Select):
+                return self.replica
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+def read_from_primary():
+    """
+    Send the rest of this request's reads to the primary. For results kept beyond the
+    request: a lagging replica would store a pre-write state under the cache generation
+    the write already bumped, and serve it until the entry expires.
+    """
+    current_app.extensions['sqlalchemy'].session().replica = None
+
+class ReplicaRouter:
+    """Flask extension choosing the replica for each read request and pinning writers to the primary"""
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.replica_keys = []
+        self._pins = {}
+        self._lock = threading.Lock()
+        self._cycle = None
+        self.reads = {}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.replica_keys = sorted(
+            key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith(REPLICA_BIND_PREFIX)
+        )
+        self.strategy = app.config.get('DB_REPLICA_STRATEGY', 'round_robin')
+        self.pin_seconds = app.config.get('DB_PRIMARY_PIN_SECONDS', 5)
+        self.max_pins = 10000
+        self._cycle = itertools.cycle(self.replica_keys)
+        self.reads = {key: 0 for key in ['primary', *self.replica_keys]}
+        app.extensions['replica_router'] = self
+        if self.replica_keys:
+            app.before_request(self._route_request)
+            app.after_request(self._pin_writer)
+
+    def _client_key(self):
+        return request.headers.get('Authorization') or request.remote_addr
+
+    def is_pinned(self):
+        """True if this client wrote within the last DB_PRIMARY_PIN_SECONDS"""
+        try:
+            if float(request.cookies.get(PIN_COOKIE, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        expires_at = self._pins.get(self._client_key())
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def choose_replica(self):
+        """Bind key of the replica for the next read request"""
+        if self.strategy == 'least_connections':
+            engines = self.db.engines
+            return min(self.replica_keys, key=lambda key: getattr(engines[key].pool, 'checkedout', lambda: 0)())
+        with self._lock:
+            return next(self._cycle)
+
+    def _route_request(self):
+        # Only read-only requests of the API blueprints (not /debug) go to a replica
+        if request.method not in ('GET', 'HEAD') or request.blueprint is None or self.is_pinned():
+            self.reads['primary'] += 1
+            return
+        key = self.choose_replica()
+        self.reads[key] += 1
+        self.db.session().replica = self.db.engines[key]
+
+    def _pin_writer(self, response):
+        if not self.db.session().wrote:
+            return response
+        now = time.monotonic()
+        with self._lock:
+            # Keep the dict from growing with clients that went quiet
+            if len(self._pins) >= self.max_pins:
+                self._pins = {key: value for key, value in self._pins.items() if value > now}
+            self._pins[self._client_key()] = now + self.pin_seconds
+        # The value is what counts; the cookie itself may outlive it by a second
+        response.set_cookie(
+            PIN_COOKIE, f'{time.time() + self.pin_seconds:.3f}', max_age=self.pin_seconds + 1, httponly=True
+        )
+        return response
+
+    def stats(self):
+        return {
+            "replicas": self.replica_keys,
+            "strategy": self.strategy if self.replica_keys else None,
+            "pin_seconds": self.pin_seconds if self.replica_keys else None,
+            "pinned_clients": len(self._pins),
+            "requests": dict(self.reads)
+        }
+
+replica_router = ReplicaRouter()
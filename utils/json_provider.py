@@ -0,0 +1,149 @@
+"""
+JSON provider for Flask responses: orjson when installed, otherwise the stdlib
+encoder with its per-call setup done once.
+
+Both backends produce the same bytes as Flask's default provider (sorted keys,
+non-ASCII escaped while ensure_ascii is on, datetimes as HTTP dates, Decimal/UUID
+as strings), plus Enum members as their value. The one difference left with orjson
+is the spelling of float exponents (1e16 / 1e-5 instead of 1e+16 / 1e-05), which
+parse to the same numbers; NaN and infinities come out as null instead of the
+stdlib's invalid NaN/Infinity tokens.
+"""
+import dataclasses
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # Optional - JSON_BACKEND=auto falls back to the stdlib
+    orjson = None
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+def _http_datetime(value):
+    """werkzeug.http.http_date for datetimes, without the email.utils round-trip"""
+    # Naive values are taken as UTC, like Flask does
+    t = value.utctimetuple()
+    return '%s, %02d %s %04d %02d:%02d:%02d GMT' % (
+        _WEEKDAYS[t.tm_wday], t.tm_mday, _MONTHS[t.tm_mon - 1], t.tm_year, t.tm_hour, t.tm_min, t.tm_sec
+    )
+
+# What json.dumps(ensure_ascii=True) escapes and orjson writes as UTF-8. These
+# characters only ever occur inside JSON strings, so a plain substitution is safe
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+
+def _escape_non_ascii(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        # Outside the BMP - a UTF-16 surrogate pair, like the stdlib
+        code -= 0x10000
+        return '\\u%04x\\u%04x' % (0xD800 | code >> 10, 0xDC00 | code & 0x3FF)
+    return '\\u%04x' % code
+
+# Encoders by exact type; subclasses are resolved once and added (see _encoder_for)
+_ENCODERS = {
+    datetime: _http_datetime,
+    date: http_date,
+    Decimal: str,
+    UUID: str
+}
+
+def _encoder_for(cls):
+    """Find the encoder for a type that isn't in _ENCODERS yet and remember it"""
+    if issubclass(cls, datetime):
+        encoder = _http_datetime
+    elif issubclass(cls, date):
+        encoder = http_date
+    elif issubclass(cls, Enum):
+        encoder = lambda value: value.value
+    elif issubclass(cls, (Decimal, UUID)):
+        encoder = str
+    elif dataclasses.is_dataclass(cls):
+        encoder = dataclasses.asdict
+    elif hasattr(cls, '__html__'):
+        encoder = lambda value: str(value.__html__())
+    else:
+        return None
+    _ENCODERS[cls] = encoder
+    return encoder
+
+def default(value):
+    """Encode the types json/orjson don't handle themselves - one dict lookup per value"""
+    encoder = _ENCODERS.get(type(value)) or _encoder_for(type(value))
+    if encoder is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return encoder(value)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSONProvider picking its backend from JSON_BACKEND:
+    'auto' (orjson if installed), 'orjson' or 'stdlib'.
+    """
+    default = staticmethod(default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        backend = app.config.get('JSON_BACKEND', 'auto')
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError("JSON_BACKEND=orjson needs the orjson package (pip install orjson)")
+        self.backend = 'orjson' if backend in ('auto', 'orjson') and orjson is not None else 'stdlib'
+
+        self._encoder_settings = None
+        if self.backend == 'orjson':
+            # Dates go through default() so they stay HTTP dates like the stdlib backend
+            self._orjson_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _compact_encoder(self):
+        """
+        Stdlib encoder built once instead of on every dumps() call - and again only if
+        ensure_ascii/sort_keys were changed on the provider (app.json.ensure_ascii = False)
+        """
+        settings = (self.ensure_ascii, self.sort_keys)
+        if settings != self._encoder_settings:
+            self._encoder = json.JSONEncoder(
+                default=self.default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys,
+                separators=(',', ':')
+            )
+            self._encoder_settings = settings
+        return self._encoder
+
+    def _dumps_bytes(self, obj, indent=False):
+        if self.backend == 'orjson':
+            options = self._orjson_options
+            if self.sort_keys:
+                options |= orjson.OPT_SORT_KEYS
+            if indent:
+                options |= orjson.OPT_INDENT_2
+            data = orjson.dumps(obj, default=self.default, option=options)
+            if self.ensure_ascii and (not data.isascii() or b'\x7f' in data):
+                data = _NON_ASCII.sub(_escape_non_ascii, data.decode()).encode()
+            return data
+        if indent:
+            return super().dumps(obj, indent=2).encode()
+        return self._compact_encoder().encode(obj).encode()
+
+    def dumps(self, obj, **kwargs):
+        # Plain calls (app.json.dumps(obj), export streaming) take the fast path
+        if not kwargs:
+            if self.backend == 'orjson':
+                return self._dumps_bytes(obj).decode()
+            return self._compact_encoder().encode(obj)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Same as DefaultJSONProvider.response, but the body goes out as bytes without a str round-trip
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
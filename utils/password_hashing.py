@@ -0,0 +1,163 @@
+"""
+Password hashing off the request thread.
+
+generate_password_hash/check_password_hash run a deliberately slow KDF. Calling
+them inline pins a WSGI worker for the whole hash, so they run in a small process
+pool instead (no GIL contention with the threads serving other requests). The number
+of hashes waiting or running is capped; past the cap callers get HashingBusy,
+which the routes turn into 503 + Retry-After instead of queueing without limit.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+    def __init__(self, retry_after):
+        super().__init__("Password hashing is saturated")
+        self.retry_after = retry_after
+
+def _timed(function, *args):
+    # Runs in the pool process - report when the work started so the caller can
+    # split the latency into queue wait and hash time
+    started_at = time.time()
+    result = function(*args)
+    return result, started_at, time.time() - started_at
+
+def _hash(password, method):
+    return _timed(generate_password_hash, password, method)
+
+def _verify(pwhash, password):
+    return _timed(check_password_hash, pwhash, password)
+
+class PasswordHasher:
+    """
+    Bounded hashing executor. workers=0 hashes inline on the calling thread
+    (development, or platforms without multiprocessing) with the same limits and metrics.
+    """
+    def __init__(self, workers, max_pending, method='scrypt', retry_after=1):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.method = method
+        self.retry_after = retry_after
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._current_prefix = None
+        self.reset_metrics()
+
+    def _get_executor(self):
+        # Created on first use, i.e. inside the serving process after any fork.
+        # spawn keeps the children free of the parent's threads and DB connections
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.metrics["rejected"] += 1
+            raise HashingBusy(self.retry_after)
+        try:
+            submitted_at = time.time()
+            if self.workers:
+                result, started_at, hash_time = self._get_executor().submit(function, *args).result()
+            else:
+                result, started_at, hash_time = function(*args)
+        finally:
+            self._slots.release()
+
+        queue_wait = max(started_at - submitted_at, 0.0)
+        with self._lock:
+            metrics = self.metrics
+            metrics["completed"] += 1
+            metrics["queue_wait_total"] += queue_wait
+            metrics["queue_wait_max"] = max(metrics["queue_wait_max"], queue_wait)
+            metrics["hash_time_total"] += hash_time
+            metrics["hash_time_max"] = max(metrics["hash_time_max"], hash_time)
+        return result
+
+    def hash(self, password):
+        """generate_password_hash with the configured method, off the request thread"""
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """check_password_hash, off the request thread"""
+        if not pwhash or password is None:
+            return False
+        return self._run(_verify, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with other parameters than the current method (e.g. older pbkdf2)"""
+        if self._current_prefix is None:
+            # "scrypt:32768:8:1" / "pbkdf2:sha256:1000000" - werkzeug's current defaults for method
+            self._current_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._current_prefix
+
+    def rehash(self, pwhash, password):
+        """
+        New hash for a password that just verified against an outdated pwhash, or None
+        if pwhash is current. Never raises HashingBusy - the upgrade waits for the next login.
+        """
+        if not self.needs_rehash(pwhash):
+            return None
+        try:
+            new_hash = self.hash(password)
+        except HashingBusy:
+            return None
+        with self._lock:
+            self.metrics["rehashed"] += 1
+        return new_hash
+
+    def reset_metrics(self):
+        self.metrics = {
+            "completed": 0,
+            "rejected": 0,
+            "rehashed": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+            "hash_time_total": 0.0,
+            "hash_time_max": 0.0
+        }
+
+    def stats(self):
+        metrics = dict(self.metrics)
+        completed = metrics["completed"] or 1
+        metrics["queue_wait_avg"] = metrics["queue_wait_total"] / completed
+        metrics["hash_time_avg"] = metrics["hash_time_total"] / completed
+        metrics["workers"] = self.workers
+        metrics["max_pending"] = self.max_pending
+        return metrics
+
+def get_password_hasher():
+    """The app's PasswordHasher, built from the config on first use"""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        config = current_app.config
+        hasher = PasswordHasher(
+            config['PASSWORD_HASH_WORKERS'],
+            config['PASSWORD_HASH_MAX_PENDING'],
+            config['PASSWORD_HASH_METHOD'],
+            config['PASSWORD_HASH_RETRY_AFTER']
+        )
+        current_app.extensions['password_hasher'] = hasher
+    return hasher
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+def verify_password(pwhash, password):
+    return get_password_hasher().verify(pwhash, password)
+
+def hashing_busy_response(err):
+    """503 telling the client when to retry"""
+    response = jsonify({"error": "Server is busy, please retry shortly"})
+    response.headers['Retry-After'] = str(err.retry_after)
+    return response, 503
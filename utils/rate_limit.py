@@ -0,0 +1,178 @@
+"""
+Token-bucket rate limiting (used by /auth/login against credential stuffing).
+
+A bucket holds up to `burst` tokens and refills at `per_minute` tokens a minute.
+Each attempt takes a token; an empty bucket means the attempt is refused with
+429 + Retry-After before any database work or password hashing happens.
+
+Backends: an in-process dict (default, per worker) or a shared Redis-compatible
+store (RATE_LIMIT_BACKEND=redis) so all workers count against the same buckets.
+Both implement take(key, burst, per_minute, cost) / reset(key) / size(); any object
+with those methods can be passed to RateLimiter.init_app(app, backend=...).
+"""
+import threading
+import time
+from flask import current_app, jsonify
+
+try:
+    import redis
+    from redis.exceptions import WatchError
+except ImportError:  # Optional - only needed for RATE_LIMIT_BACKEND=redis
+    redis = None
+
+    class WatchError(Exception):
+        """Stands in for redis.WatchError so RedisBuckets works with other clients"""
+
+def _refill(tokens, updated_at, burst, per_minute, now):
+    return min(burst, tokens + (now - updated_at) * per_minute / 60.0)
+
+def _retry_after(tokens, per_minute):
+    # Seconds until one whole token is back
+    return max(1, int((1 - tokens) * 60.0 / per_minute + 0.999))
+
+class MemoryBuckets:
+    """Buckets in a dict local to this worker process"""
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, per_minute, cost=1):
+        """
+        Take cost tokens from key's bucket if it has at least one.
+        Returns (allowed, retry_after). cost=0 only checks the bucket.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens = _refill(tokens, updated_at, burst, per_minute, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= cost
+            if len(self._buckets) >= self.max_entries:
+                # Forget buckets that are full again - a missing bucket starts full anyway
+                self._buckets = {name: value for name, value in self._buckets.items() if value[2] > now}
+            # Stored with the time it will be full again, for pruning
+            self._buckets[key] = (tokens, now, now + (burst - tokens) * 60.0 / per_minute)
+        return (True, 0) if allowed else (False, _retry_after(tokens, per_minute))
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+    def size(self):
+        return len(self._buckets)
+
+class RedisBuckets:
+    """
+    Buckets in a shared store, on any client with the redis-py API (redis.Redis, or
+    a local stand-in such as fakeredis in tests). Each bucket is a hash updated in a
+    WATCH/MULTI transaction, so concurrent workers never both spend the last token.
+    """
+    def __init__(self, client, prefix='bookstore:ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    def take(self, key, burst, per_minute, cost=1):
+        key = self.prefix + key
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    state = pipe.hgetall(key)
+                    # Wall clock - shared between hosts
+                    now = time.time()
+                    if state:
+                        tokens = _refill(float(state[b'tokens']), float(state[b'updated_at']), burst, per_minute, now)
+                    else:
+                        tokens = float(burst)
+                    allowed = tokens >= 1
+                    if allowed:
+                        tokens -= cost
+                    pipe.multi()
+                    pipe.hset(key, mapping={'tokens': tokens, 'updated_at': now})
+                    # Idle buckets expire once they would have refilled anyway
+                    pipe.expire(key, int(60.0 * (burst + 1) / per_minute) + 1)
+                    pipe.execute()
+                except WatchError:
+                    # Another worker changed the bucket in between - try again
+                    continue
+            return (True, 0) if allowed else (False, _retry_after(tokens, per_minute))
+
+    def reset(self, key=None):
+        if key is not None:
+            self.client.delete(self.prefix + key)
+            return
+        for name in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(name)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + '*'))
+
+class RateLimiter:
+    """Flask extension tying a bucket backend to the configured login limits"""
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, client=None, backend=None):
+        """
+        Pick the backend from the app config. Pass client to use an existing
+        redis-py compatible client (e.g. fakeredis in tests) instead of RATE_LIMIT_REDIS_URL,
+        or backend to plug in any bucket store (e.g. a MemoryBuckets standing in for the shared one).
+        """
+        if backend is not None:
+            self.enabled = True
+            self.backend = backend
+            app.extensions['rate_limiter'] = self
+            return
+        backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+        self.enabled = backend != 'none'
+        if backend == 'redis':
+            if client is None:
+                if redis is None:
+                    raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package (pip install redis)")
+                client = redis.Redis.from_url(app.config['RATE_LIMIT_REDIS_URL'])
+            self.backend = RedisBuckets(client)
+        else:
+            self.backend = MemoryBuckets()
+        app.extensions['rate_limiter'] = self
+
+    def take(self, limit, key, cost=1):
+        """
+        Spend cost tokens of app.config[limit + '_BURST' / '_PER_MINUTE'] for key.
+        Returns (allowed, retry_after).
+        """
+        if not self.enabled:
+            return True, 0
+        config = current_app.config
+        allowed, retry_after = self.backend.take(
+            f'{limit}:{key}', config[f'{limit}_BURST'], config[f'{limit}_PER_MINUTE'], cost
+        )
+        if not allowed:
+            self.rejected += 1
+        return allowed, retry_after
+
+    def reset(self):
+        self.backend.reset()
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "rejected": self.rejected,
+            "buckets": self.backend.size() if self.backend else 0
+        }
+
+rate_limiter = RateLimiter()
+
+def rate_limited_response(retry_after):
+    """429 telling the client when to retry"""
+    response = jsonify({'message': 'Too many login attempts, please retry later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
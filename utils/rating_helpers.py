@@ -0,0 +1,60 @@
+"""
+Helper functions to keep seller rating aggregates (rating_sum, rating_count, rating) in sync
+"""
+from sqlalchemy import update, select, func, case, cast, Float
+from utils.db_helpers import get_table
+from models import db
+
+def apply_rating_change(seller_id, rating_delta, count_delta):
+    """
+    Adjust a seller's rating totals with a single atomic UPDATE.
+    
+    rating_delta is added to rating_sum and count_delta to rating_count (e.g. +rating/+1
+    for a new review, new-old/0 for an edit, -rating/-1 for a delete). The average is
+    recomputed in the same statement, so nothing is read back into Python.
+    """
+    users_table = get_table('users')
+    new_sum = users_table.c.rating_sum + rating_delta
+    new_count = users_table.c.rating_count + count_delta
+    
+    # rating goes first: MySQL applies SET assignments left to right,
+    # so it must be computed before rating_sum/rating_count change
+    stmt = update(users_table).where(
+        users_table.c.id == seller_id
+    ).ordered_values(
+        (users_table.c.rating, case(
+            (new_count > 0, cast(new_sum, Float) / new_count),
+            else_=0
+        )),
+        (users_table.c.rating_sum, new_sum),
+        (users_table.c.rating_count, new_count)
+    )
+    db.session.execute(stmt)
+
+def reconcile_ratings():
+    """
+    Rebuild rating_sum, rating_count and rating for every user from the reviews table
+    in one bulk UPDATE. Returns the number of users updated.
+    """
+    users_table = get_table('users')
+    reviews_table = get_table('reviews')
+    
+    review_sum = select(
+        func.coalesce(func.sum(reviews_table.c.rating), 0)
+    ).where(reviews_table.c.seller_id == users_table.c.id).scalar_subquery()
+    review_count = select(
+        func.count()
+    ).where(reviews_table.c.seller_id == users_table.c.id).scalar_subquery()
+    
+    stmt = update(users_table).values(
+        rating_sum=review_sum,
+        rating_count=review_count,
+        # Same as apply_rating_change: no reviews means a rating of 0
+        rating=case(
+            (review_count > 0, cast(review_sum, Float) / review_count),
+            else_=0
+        )
+    )
+    result = db.session.execute(stmt)
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,233 @@
+"""
+Response cache for read-heavy GET endpoints, with TTLs and write-through invalidation.
+
+Cached responses are keyed on the path plus the sorted query args, together with
+the current generation of every tag the endpoint depends on (e.g. "books" for
+listings, "book:5" for a single book). Writes bump the generation of the tags they
+touch, so stale entries are never served again and simply age out of the backend.
+
+Backends: an in-process LRU (default) or a shared Redis-compatible store
+(CACHE_BACKEND=redis) so every worker sees the same entries and invalidations.
+The in-process LRU only sees the writes of its own worker - with several workers,
+another worker keeps serving what it cached until the entry expires, so its TTLs
+are capped at CACHE_MEMORY_MAX_TTL. Run more than one worker with CACHE_BACKEND=redis
+for invalidation to be exact.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app, make_response, Response
+from utils.db_routing import read_from_primary
+
+try:
+    import redis
+except ImportError:  # Optional - only needed for CACHE_BACKEND=redis
+    redis = None
+
+# Response headers stored along with the body
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+class MemoryCache:
+    """
+    Thread-safe LRU with a per-entry expiry time, local to this worker process.
+    Entries live at most max_ttl seconds (None = no cap): writes through other
+    workers don't invalidate them, the expiry is what bounds that staleness.
+    """
+    def __init__(self, max_entries=1024, max_ttl=None):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        # Tag generations live outside the entry LRU and are bounded separately, oldest
+        # bump first. Every bump takes the next value of one counter, and a dropped tag
+        # reads as the counter value at the time it was dropped: newer than any generation
+        # it had, so dropping one never revives the entries cached under it
+        self._generations = OrderedDict()
+        self.max_tags = max_entries * 4
+        self._counter = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if self.max_ttl:
+            ttl = min(ttl, self.max_ttl) if ttl else self.max_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def generations(self, tags):
+        with self._lock:
+            return [self._generations.get(tag, self._floor) for tag in tags]
+
+    def bump(self, tag):
+        with self._lock:
+            self._counter += 1
+            self._generations[tag] = self._counter
+            self._generations.move_to_end(tag)
+            while len(self._generations) > self.max_tags:
+                self._generations.popitem(last=False)
+                self._floor = self._counter
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # No entry is left to revive - start the tags over
+            self._generations.clear()
+            self._floor = self._counter
+
+    def size(self):
+        return len(self._entries)
+
+class RedisCache:
+    """
+    Shared backend on any client with the redis-py API (redis.Redis, or a local
+    stand-in such as tests/fake_redis.py). Values are (body, mimetype, headers).
+    Eviction is left to Redis' maxmemory policy.
+    """
+    def __init__(self, client, prefix='bookstore:'):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = None
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        # Stored as "<json metadata>\n<body>" - no pickle, the store is shared
+        meta, _, body = value.partition(b'\n')
+        meta = json.loads(meta)
+        return body, meta['mimetype'], meta['headers']
+
+    def set(self, key, value, ttl=None):
+        body, mimetype, headers = value
+        meta = json.dumps({'mimetype': mimetype, 'headers': headers}).encode()
+        self.client.set(self.prefix + key, meta + b'\n' + body, ex=ttl or None)
+
+    def generations(self, tags):
+        # One round-trip for all tags of a request
+        values = self.client.mget([f'{self.prefix}gen:{tag}' for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tag):
+        self.client.incr(f'{self.prefix}gen:{tag}')
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + 'resp:*'):
+            self.client.delete(key)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + 'resp:*'))
+
+class ResponseCache:
+    """Flask extension tying a cache backend to view decorators and invalidation helpers"""
+    def __init__(self, app=None):
+        self.backend = None
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, client=None):
+        """
+        Pick the backend from the app config. Pass client to use an existing
+        redis-py compatible client (e.g. a stand-in for tests) instead of CACHE_REDIS_URL.
+        """
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.enabled = backend != 'none'
+        if backend == 'redis':
+            if client is None:
+                if redis is None:
+                    raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)")
+                client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+            self.backend = RedisCache(client)
+        else:
+            self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1024), app.config.get('CACHE_MEMORY_MAX_TTL'))
+        app.extensions['response_cache'] = self
+
+    def cached(self, ttl_config, tags):
+        """
+        Cache successful (200) GET responses of a view for app.config[ttl_config] seconds.
+        tags is a function of the view kwargs returning the tags the response depends on.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                # Current generation of each tag is part of the key
+                view_tags = tags(**kwargs)
+                generations = self.backend.generations(view_tags)
+                query = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+                key = 'resp:' + ','.join(
+                    f'{tag}={generation}' for tag, generation in zip(view_tags, generations)
+                ) + f':{request.path}?{query}'
+
+                cached_response = self.backend.get(key)
+                if cached_response is not None:
+                    self.hits += 1
+                    body, mimetype, headers = cached_response
+                    response = Response(body, status=200, mimetype=mimetype, headers=headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    # Cached ETag/Last-Modified still answer conditional requests with 304
+                    return response.make_conditional(request)
+
+                self.misses += 1
+                # What gets stored must be at least as new as the generations in the key
+                read_from_primary()
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                    self.backend.set(key, (response.get_data(), response.mimetype, headers), current_app.config[ttl_config])
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """Make every cached response depending on any of tags stale"""
+        if not self.enabled:
+            return
+        for tag in tags:
+            self.backend.bump(tag)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions if self.backend else None,
+            "max_ttl": getattr(self.backend, 'max_ttl', None),
+            "entries": self.backend.size() if self.backend else 0
+        }
+
+response_cache = ResponseCache()
+
+def invalidate_books(*book_ids):
+    """
+    Invalidate cached book responses after a write: every listing (featured, search)
+    plus the single-book responses of book_ids.
+    """
+    response_cache.invalidate('books', *[f'book:{book_id}' for book_id in book_ids])
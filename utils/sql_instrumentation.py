@@ -0,0 +1,163 @@
+"""
+Per-request SQL instrumentation.
+
+Every statement executed while a request is handled is counted and timed (on the
+primary and the replica engines alike). After the request:
+
+- the totals go out as a Server-Timing header (db;dur=<ms>;desc="<n> queries"),
+  so they show up in the browser devtools next to the response;
+- one JSON log line per request is written to the "sql" logger (INFO);
+- a statement run more than SQL_REPEAT_THRESHOLD times with different parameters
+  - the usual N+1 loop - is logged as a WARNING and listed in /debug/sql, and
+  with SQL_REPEAT_FAIL (or app.testing) the request fails with RepeatedQueryError
+  so a test suite catches it before production does.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('sql')
+
+# "IN (?, ?, ?)" from expanding parameters - same statement whatever the list length
+_PLACEHOLDER_LIST = re.compile(r'\((?:\?|%s|:\w+|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|:\w+|%\(\w+\)s))+\)')
+
+def statement_shape(statement):
+    """The statement with placeholder lists collapsed and whitespace normalized"""
+    return ' '.join(_PLACEHOLDER_LIST.sub('(...)', statement).split())
+
+class RepeatedQueryError(Exception):
+    """A request ran the same statement more than SQL_REPEAT_THRESHOLD times"""
+    def __init__(self, endpoint, repeats):
+        self.endpoint = endpoint
+        self.repeats = repeats
+        shape, count = repeats[0]
+        super().__init__(f"{endpoint} ran the same statement {count} times (N+1?): {shape}")
+
+class RequestQueries:
+    """Statements of one request"""
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Raw statement text -> executions; shapes are only worked out once, after the request
+        self.statements = Counter()
+
+    def repeats(self, threshold):
+        """[(shape, executions)] of the statements run more than threshold times, most repeated first"""
+        shapes = Counter()
+        for statement, count in self.statements.items():
+            shapes[statement_shape(statement)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count > threshold]
+
+class SQLInstrumentation:
+    """Flask extension recording the SQL each request runs"""
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 10
+        self._lock = threading.Lock()
+        self._listening = False
+        self.reset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SQL_INSTRUMENTATION', True)
+        self.threshold = app.config.get('SQL_REPEAT_THRESHOLD', 10)
+        app.extensions['sql_instrumentation'] = self
+        if not self.enabled:
+            return
+        if not self._listening:
+            # On the Engine class, so replica binds are covered too
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'sql_queries' in g:
+            conn.info.setdefault('sql_started_at', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('sql_started_at')
+        if not started or not has_request_context():
+            return
+        queries = g.get('sql_queries')
+        if queries is None:
+            return
+        queries.duration += time.perf_counter() - started.pop()
+        queries.count += 1
+        queries.statements[statement] += 1
+
+    def _start_request(self):
+        g.sql_queries = RequestQueries()
+
+    def _finish_request(self, response):
+        queries = g.pop('sql_queries', None)
+        if queries is None:
+            return response
+        duration_ms = queries.duration * 1000
+        response.headers.add('Server-Timing', f'db;dur={duration_ms:.2f};desc="{queries.count} queries"')
+        repeats = queries.repeats(self.threshold)
+
+        with self._lock:
+            self.requests += 1
+            self.queries += queries.count
+            self.duration += queries.duration
+            if repeats:
+                self.flagged += 1
+                self.recent.append({
+                    "endpoint": request.endpoint,
+                    "path": request.path,
+                    "statement": repeats[0][0],
+                    "count": repeats[0][1]
+                })
+
+        # Built only when someone listens - the record is not free
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "queries": queries.count,
+                "db_ms": round(duration_ms, 2),
+                "repeated": [{"statement": shape, "count": count} for shape, count in repeats]
+            }))
+        if repeats:
+            logger.warning(
+                "%s ran the same statement %d times (N+1?): %s", request.endpoint, repeats[0][1], repeats[0][0]
+            )
+            if current_app.config.get('SQL_REPEAT_FAIL') or current_app.testing:
+                raise RepeatedQueryError(request.endpoint, repeats)
+        return response
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.queries = 0
+            self.duration = 0.0
+            self.flagged = 0
+            # Last flagged requests, newest last
+            self.recent = deque(maxlen=50)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "repeat_threshold": self.threshold,
+            "requests": self.requests,
+            "queries": self.queries,
+            "queries_avg": self.queries / self.requests if self.requests else 0.0,
+            "db_ms_avg": self.duration * 1000 / self.requests if self.requests else 0.0,
+            "flagged": self.flagged,
+            "recent": list(self.recent)
+        }
+
+sql_instrumentation = SQLInstrumentation()